@@ -0,0 +1,77 @@
+import argparse
+import contextlib
+import io
+from time import time as t
+
+from thesis.nets import LC_SNN, C_SNN, FC_SNN
+
+"""
+Run this script to time the expensive parts of the networks, e.g.
+
+    python benchmark.py startup normalize --n_filters 25 100 400
+"""
+
+
+def best_time(f, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t_start = t()
+        f()
+        best = min(best, t() - t_start)
+    return best
+
+
+def print_table(title, n_filters, rows):
+    print(title)
+    print(f'{"n_filters":<10}' + ''.join(f'{n:>10}' for n in n_filters))
+    for name, times in rows:
+        print(f'{name:<10}' + ''.join(f'{time:>10.4f}' for time in times))
+    print()
+
+
+def startup(n_filters, repeat):
+    rows = []
+    for network_type in [LC_SNN, C_SNN, FC_SNN]:
+        times = []
+        for n in n_filters:
+            # Networks print their parameters when created
+            with contextlib.redirect_stdout(io.StringIO()):
+                times.append(best_time(lambda: network_type(n_filters=n), repeat))
+        rows.append((network_type.__name__, times))
+
+    print_table('Network construction [s]', n_filters, rows)
+
+
+def normalize(n_filters, repeat, calls=100):
+    rows = []
+    for network_type in [LC_SNN, C_SNN, FC_SNN]:
+        times = []
+        for n in n_filters:
+            with contextlib.redirect_stdout(io.StringIO()):
+                net = network_type(n_filters=n)
+            connection = net.network.connections[('X', 'Y')]
+
+            def f():
+                for _ in range(calls):
+                    connection.normalize()
+
+            times.append(best_time(f, repeat) / calls * 1000)
+        rows.append((network_type.__name__, times))
+
+    print_table('XY weight normalization [ms]', n_filters, rows)
+
+
+benchmarks = {
+    'startup': startup,
+    'normalize': normalize,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('benchmarks', nargs='*', help=f'any of {list(benchmarks)}, all by default')
+    parser.add_argument('--n_filters', type=int, nargs='+', default=[25, 100, 400])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for name in args.benchmarks or benchmarks:
+        benchmarks[name](args.n_filters, args.repeat)
@@ -284,7 +284,7 @@ def plot_locally_connected_weights(
     Plot a connection weight matrix of a :code:`Connection` with `locally connected structure
     <http://yann.lecun.com/exdb/publis/pdf/gregor-nips-11.pdf>_.
 
-    :param weights: Weight matrix of Conv2dConnection object.
+    :param weights: Weights of LocalConnection object, of shape ``[n_filters, conv_prod, kernel_prod]``.
     :param n_filters: No. of convolution kernels in use.
     :param kernel_size: Side length(s) of 2D convolution kernels.
     :param conv_size: Side length(s) of 2D convolution population.
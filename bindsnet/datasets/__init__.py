@@ -1,9 +1,10 @@
 from .torchvision_wrapper import create_torchvision_dataset_wrapper
 from .spoken_mnist import SpokenMNIST
 from .davis import Davis
+from .encoded import EncodedDataset
 
 from .collate import time_aware_collate
-from .dataloader import DataLoader
+from .dataloader import DataLoader, PrefetchLoader
 
 
 CIFAR10 = create_torchvision_dataset_wrapper("CIFAR10")
@@ -1,3 +1,5 @@
+import os
+
 import torch
 
 from .collate import time_aware_collate
@@ -17,6 +19,7 @@ class DataLoader(torch.utils.data.DataLoader):
         drop_last=False,
         timeout=0,
         worker_init_fn=None,
+        **kwargs
     ):
         super().__init__(
             dataset,
@@ -30,4 +33,74 @@ class DataLoader(torch.utils.data.DataLoader):
             worker_init_fn=worker_init_fn,
             batch_sampler=batch_sampler,
             collate_fn=collate_fn,
+            **kwargs
         )
+
+
+class PrefetchLoader(DataLoader):
+    # language=rst
+    """
+    Loads the inputs of a network in worker processes, so that encoding runs in parallel with the simulation. Workers
+    collate their batches with ``time_aware_collate`` directly into shared memory, and keep at most
+    ``prefetch_factor`` batches each ready ahead of the consumer. They persist across iterations of the loader.
+
+    Iterating yields pairs of ``inpts``, ready for ``Network.run`` as ``{layer: [time, batch_size, n_0, ...]}``, and
+    the whole collated batch (e.g. for its labels).
+    """
+
+    # Number of worker processes of loaders created without ``num_workers``; ``None`` is two, or as many as there are
+    # CPUs besides the one of the simulation if fewer. Processes that already share the CPUs with others, e.g. in a
+    # pool of experiments, opt out with ``0``.
+    default_num_workers = None
+
+    def __init__(
+        self,
+        dataset,
+        inputs=None,
+        batch_size=1,
+        shuffle=False,
+        num_workers=None,
+        prefetch_factor=2,
+        persistent_workers=True,
+        **kwargs
+    ):
+        # language=rst
+        """
+        :param dataset: Dataset of dictionaries, e.g. a torchvision dataset wrapper with an image encoder.
+        :param inputs: Mapping from input layer names to the fields of the samples they are fed. Defaults to
+            ``{"X": "encoded_image"}``.
+        :param batch_size: Number of samples per batch.
+        :param shuffle: Whether to shuffle the samples.
+        :param num_workers: Number of worker processes; ``0`` loads in the main process. Defaults to
+            ``default_num_workers``.
+        :param prefetch_factor: Number of batches each worker keeps ready ahead of the consumer.
+        :param persistent_workers: Whether workers are kept alive between iterations over the loader.
+        :param kwargs: Other keyword arguments of ``DataLoader``.
+        """
+        if inputs is None:
+            inputs = {"X": "encoded_image"}
+
+        if num_workers is None:
+            num_workers = self.default_num_workers
+        if num_workers is None:
+            num_workers = min(2, max((os.cpu_count() or 1) - 1, 0))
+
+        # Only loaders with workers take these options.
+        if num_workers > 0:
+            kwargs.update(
+                prefetch_factor=prefetch_factor, persistent_workers=persistent_workers
+            )
+
+        super().__init__(
+            dataset,
+            batch_size=batch_size,
+            shuffle=shuffle,
+            num_workers=num_workers,
+            **kwargs
+        )
+
+        self.inputs = inputs
+
+    def __iter__(self):
+        for batch in super().__iter__():
+            yield {layer: batch[key] for layer, key in self.inputs.items()}, batch
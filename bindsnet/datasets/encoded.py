@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import torch
+
+
+class EncodedDataset(torch.utils.data.Dataset):
+    # language=rst
+    """
+    Caches the encoded samples of a dataset on disk, bit-packed in memory-mapped files, so that each sample is encoded
+    only once however many times (and by however many processes) it is read.
+
+    A sample is encoded on first access, or in advance with ``encode``, under the random seed ``seed + index``. The
+    cache contents therefore do not depend on the order in which samples are requested.
+    """
+
+    def __init__(
+        self, dataset: torch.utils.data.Dataset, path: str, seed: int = 0
+    ) -> None:
+        # language=rst
+        """
+        Opens the cache in ``path``, creating it if it does not exist.
+
+        :param dataset: Dataset whose samples are dictionaries with ``"encoded_image"`` and ``"label"`` entries, e.g.
+            a torchvision dataset wrapper with an image encoder. Only used to encode samples missing from the cache.
+        :param path: Directory of the cache files. The caller is responsible for using one directory per dataset and
+            encoding parameters.
+        :param seed: Base random seed of the encodings.
+        """
+        self.dataset = dataset
+        self.path = path
+        self.seed = seed
+
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            self._create()
+        if not os.path.exists(meta_path):
+            raise FileExistsError(f"{path} exists but is not an encoded dataset cache")
+
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+
+        self.shape = tuple(meta["shape"])
+        self.n_spikes = int(np.prod(self.shape))
+        self.spikes, self.labels, self.encoded = self._open(path, "r+", meta["n"])
+
+    def _open(
+        self, path: str, mode: str, n: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # language=rst
+        """
+        Memory-maps the files of a cache.
+
+        :param path: Directory of the cache files.
+        :param mode: ``"w+"`` to create the files, ``"r+"`` to open existing ones.
+        :param n: Number of samples.
+        :return: The packed spikes, labels and ``encoded`` flags of the samples.
+        """
+        spikes = np.lib.format.open_memmap(
+            os.path.join(path, "spikes.npy"),
+            mode=mode,
+            dtype=np.uint8,
+            shape=(n, (self.n_spikes + 7) // 8),
+        )
+        labels = np.lib.format.open_memmap(
+            os.path.join(path, "labels.npy"), mode=mode, dtype=np.int64, shape=(n,)
+        )
+        encoded = np.lib.format.open_memmap(
+            os.path.join(path, "encoded.npy"), mode=mode, dtype=np.bool_, shape=(n,)
+        )
+        return spikes, labels, encoded
+
+    def _create(self) -> None:
+        # language=rst
+        """
+        Creates the cache files. They are written in a temporary directory next to ``path`` and renamed into place,
+        so that processes creating the same cache at once never map files that another one truncates; the processes
+        that lose the race discard their copy.
+        """
+        parent = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=os.path.basename(self.path) + ".", dir=parent)
+        try:
+            sample = self._encode(0)
+            meta = {
+                "n": len(self.dataset),
+                "shape": list(sample["encoded_image"].shape),
+                "seed": self.seed,
+            }
+            self.shape = tuple(meta["shape"])
+            self.n_spikes = int(np.prod(self.shape))
+            self.spikes, self.labels, self.encoded = self._open(tmp, "w+", meta["n"])
+            self._store(0, sample)
+            for array in (self.spikes, self.labels, self.encoded):
+                array.flush()
+            del self.spikes, self.labels, self.encoded
+
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump(meta, f)
+
+            try:
+                os.rename(tmp, self.path)
+            except OSError:
+                # Another process created the cache first.
+                pass
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _encode(self, index: int) -> Dict[str, torch.Tensor]:
+        # language=rst
+        """
+        Encodes a sample of the underlying dataset under the random seed ``seed + index``.
+
+        :param index: Index of the sample.
+        """
+        with torch.random.fork_rng(devices=[]):
+            torch.manual_seed(self.seed + index)
+            return self.dataset[index]
+
+    def _store(self, index: int, sample: Dict[str, torch.Tensor]) -> None:
+        # language=rst
+        """
+        Writes an encoded sample to the cache.
+
+        :param index: Index of the sample.
+        :param sample: Encoded sample, as returned by the underlying dataset.
+        """
+        spikes = sample["encoded_image"].cpu().numpy().reshape(-1) != 0
+        self.spikes[index] = np.packbits(spikes)
+        self.labels[index] = int(sample["label"])
+        self.encoded[index] = True
+
+    def encode(self, indices: Optional[Iterable[int]] = None) -> None:
+        # language=rst
+        """
+        Encodes the samples missing from the cache.
+
+        :param indices: Indices of the samples to encode. Defaults to the whole dataset.
+        """
+        if indices is None:
+            indices = range(len(self))
+
+        for index in indices:
+            index = int(index)
+            if not self.encoded[index]:
+                self._store(index, self._encode(index))
+
+        self.spikes.flush()
+        self.labels.flush()
+        self.encoded.flush()
+
+    def __getitem__(self, ind: Union[int, slice]) -> Dict[str, torch.Tensor]:
+        # language=rst
+        """
+        Reads a sample, or a batch of samples given a slice, from the cache. The packed spikes are read straight from
+        the memory map; unpacking them is the only copy made.
+
+        :param ind: Index of the sample, or slice of indices.
+        :return: Dictionary with the ``"encoded_image"`` of shape ``[*shape]`` (``[batch_size, *shape]`` for a
+            slice) and the ``"label"``.
+        """
+        if isinstance(ind, slice):
+            indices = range(len(self))[ind]
+            self.encode(index for index in indices if not self.encoded[index])
+
+            spikes = np.unpackbits(self.spikes[ind], axis=1, count=self.n_spikes)
+            return {
+                "encoded_image": torch.from_numpy(spikes).view(-1, *self.shape),
+                "label": torch.from_numpy(np.array(self.labels[ind])),
+            }
+
+        ind = int(ind)
+        if not self.encoded[ind]:
+            self._store(ind, self._encode(ind))
+
+        spikes = np.unpackbits(self.spikes[ind], count=self.n_spikes)
+        return {
+            "encoded_image": torch.from_numpy(spikes).view(*self.shape),
+            "label": int(self.labels[ind]),
+        }
+
+    def __len__(self) -> int:
+        return len(self.labels)
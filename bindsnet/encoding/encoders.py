@@ -7,6 +7,9 @@ class Encoder:
 
     - Calls self.enc from the subclass and passes whatever arguments were
       provided. self.enc must be callable with torch.Tensor, *args, **kwargs
+    - The Bernoulli, Poisson and rank order encoders also encode batches of
+      shape [batch_size, n_1, ..., n_k] into spikes of shape
+      [time, batch_size, n_1, ..., n_k] (see their batch keyword argument).
     """
 
     def __init__(self, *args, **kwargs) -> None:
@@ -73,6 +76,8 @@ class BernoulliEncoder(Encoder):
         Keyword arguments:
 
         :param float max_prob: Maximum probability of spike per Bernoulli trial.
+        :param bool batch: Whether inputs are batches, whose samples are
+            normalized separately.
         """
         super().__init__(time, dt=dt, **kwargs)
 
@@ -87,6 +92,13 @@ class PoissonEncoder(Encoder):
 
         :param time: Length of Poisson spike train per input variable.
         :param dt: Simulation time step.
+
+        Inputs are encoded independently, so batches need no keyword argument.
+
+        Keyword arguments:
+
+        :param bool per_step: Whether to draw the spikes of each time step as
+            Bernoulli trials instead of sampling inter-spike intervals.
         """
         super().__init__(time, dt=dt, **kwargs)
 
@@ -101,6 +113,11 @@ class RankOrderEncoder(Encoder):
 
         :param time: Length of RankOrder spike train per input variable.
         :param dt: Simulation time step.
+
+        Keyword arguments:
+
+        :param bool batch: Whether inputs are batches, whose samples are
+            ordered separately.
         """
         super().__init__(time, dt=dt, **kwargs)
 
@@ -5,14 +5,13 @@ import torch
 from torch.nn import Parameter
 import numpy as np
 
-from scipy.sparse import bsr_matrix
-
 from ..network.nodes import SRM0Nodes
 from ..network.topology import (
     AbstractConnection,
     Connection,
     Conv2dConnection,
     LocalConnection,
+    CompetitionConnection,
     SparseConnection
 )
 from ..utils import im2col_indices
@@ -71,15 +70,57 @@ class LearningRule(ABC):
         """
         Abstract method for a learning rule update.
         """
+        # Sparse weights are modified through their values; the sparsity pattern is fixed.
+        w = self.connection.w
+        if w.is_sparse:
+            w = w._values()
+
         # Implement weight decay.
         if self.weight_decay:
-            self.connection.w -= self.weight_decay * self.connection.w
+            w -= self.weight_decay * w
 
         # Bound weights.
         if (
             self.connection.wmin != -np.inf or self.connection.wmax != np.inf
         ) and not isinstance(self, NoOp):
-            self.connection.w.clamp_(self.connection.wmin, self.connection.wmax)
+            w.clamp_(self.connection.wmin, self.connection.wmax)
+
+    def _receptive_fields(self, x: torch.Tensor) -> torch.Tensor:
+        # language=rst
+        """
+        Gathers the pre-synaptic values of every receptive field of a ``LocalConnection``.
+
+        :param x: Values of the pre-synaptic neurons, of shape ``[batch_size, *source.shape]``.
+        :return: Values of shape ``[batch_size, conv_prod, kernel_prod]``.
+        """
+        batch_size = x.size(0)
+        return (
+            x.reshape(batch_size, -1)
+            .index_select(1, self.connection.locations.t().reshape(-1))
+            .view(batch_size, *self.connection.w.shape[1:])
+        )
+
+    def _local_outer_product(
+        self, target: torch.Tensor, source: torch.Tensor
+    ) -> torch.Tensor:
+        # language=rst
+        """
+        Reduces the outer products of post- and pre-synaptic values of a ``LocalConnection`` along the minibatch
+        dimension, inside of the receptive fields only.
+
+        :param target: Post-synaptic values of shape ``[batch_size, n_filters, conv_prod]``.
+        :param source: Pre-synaptic values of shape ``[batch_size, conv_prod, kernel_prod]``.
+        :return: Reduced outer products of shape ``[n_filters, conv_prod, kernel_prod]``.
+        """
+        # Linear reductions are computed as contractions instead of reducing full outer products.
+        if self.reduction in (torch.mean, torch.sum):
+            update = torch.einsum("bfc,bck->fck", target, source)
+            if self.reduction is torch.mean and target.size(0) != 1:
+                update /= target.size(0)
+
+            return update
+
+        return self.reduction(target.unsqueeze(3) * source.unsqueeze(1), dim=0)
 
 
 class NoOp(LearningRule):
@@ -157,8 +198,12 @@ class PostPre(LearningRule):
             self.source.traces and self.target.traces
         ), "Both pre- and post-synaptic nodes must record spike traces."
 
-        if isinstance(connection, (Connection, LocalConnection)):
+        if isinstance(connection, Connection):
             self.update = self._connection_update
+        elif isinstance(connection, LocalConnection):
+            self.update = self._local_connection_update
+        elif isinstance(connection, CompetitionConnection):
+            self.update = self._competition_connection_update
         elif isinstance(connection, Conv2dConnection):
             self.update = self._conv2d_connection_update
         elif isinstance(connection, SparseConnection):
@@ -193,48 +238,111 @@ class PostPre(LearningRule):
 
         super().update()
 
-    def _sparse_connection_update(self, **kwargs) -> None:  # EDITED: added this
+    def _local_connection_update(self, **kwargs) -> None:
         # language=rst
         """
-        Post-pre learning rule for ``Connection`` subclass of ``AbstractConnection`` class.
+        Post-pre learning rule for ``LocalConnection`` subclass of ``AbstractConnection`` class. Updates are only
+        computed for the weights inside the receptive fields, and skipped if no pre- or post-synaptic neuron spiked.
+        With a ``torch.mean`` or ``torch.sum`` reduction, the post-synaptic update only touches the receptive fields of
+        the neurons that spiked.
         """
         batch_size = self.source.batch_size
-        source_x = self.source.x.view(batch_size, -1).unsqueeze(2)
-        target_s = self.target.s.view(batch_size, -1).unsqueeze(1).float()
+        n_filters, conv_prod, kernel_prod = self.connection.w.size()
+
+        # Pre-synaptic spikes of each receptive field, [batch_size, conv_prod, kernel_prod].
+        source_s = self._receptive_fields(self.source.s)
+        target_s = self.target.s.view(batch_size, n_filters, conv_prod)
 
-        size = self.source.s.float().view(self.source.s.size(0), -1).size()[1]
-        weights = self.connection.w.view(size, size)
+        # Pre-synaptic update.
+        if self.nu[0] and source_s.any():
+            target_x = self.target.x.view(batch_size, n_filters, conv_prod)
+            update = self._local_outer_product(target_x, source_s.float())
+            self.connection.w -= self.nu[0] * update
+
+        # Post-synaptic update.
+        if self.nu[1] and target_s.any():
+            source_x = self._receptive_fields(self.source.x)
+            if self.reduction in (torch.mean, torch.sum):
+                batch, fltr, patch = target_s.nonzero(as_tuple=True)
+                update = source_x[batch, patch] * target_s[
+                    batch, fltr, patch
+                ].float().unsqueeze(1)
+                if batch_size > 1:
+                    # Sum over the minibatch before updating the weights, in the order of the reduction.
+                    fields, inverse = (fltr * conv_prod + patch).unique(
+                        return_inverse=True
+                    )
+                    update = update.new_zeros(fields.size(0), kernel_prod).index_add_(
+                        0, inverse, update
+                    )
+                    fltr, patch = fields // conv_prod, fields % conv_prod
+
+                if self.reduction is torch.mean and batch_size != 1:
+                    update /= batch_size
+
+                self.connection.w.index_put_(
+                    (fltr, patch), self.nu[1] * update, accumulate=True
+                )
+            else:
+                update = self.reduction(
+                    target_s.float().unsqueeze(3) * source_x.unsqueeze(1), dim=0
+                )
+                self.connection.w += self.nu[1] * update
 
+        super().update()
+
+    def _competition_connection_update(self, **kwargs) -> None:
+        # language=rst
+        """
+        Post-pre learning rule for ``CompetitionConnection`` subclass of ``AbstractConnection`` class. Updates are only
+        computed between filters at the same location.
+        """
+        batch_size = self.source.batch_size
+        n_locations, n_filters, _ = self.connection.w.size()
+
+        # Spikes and traces of each location, [batch_size, n_locations, n_filters].
+        source_s = self.source.s.view(batch_size, n_filters, n_locations).transpose(1, 2).float()
+        source_x = self.source.x.view(batch_size, n_filters, n_locations).transpose(1, 2)
+        target_s = self.target.s.view(batch_size, n_filters, n_locations).transpose(1, 2).float()
+        target_x = self.target.x.view(batch_size, n_filters, n_locations).transpose(1, 2)
+
+        # Pre-synaptic update.
+        if self.nu[0]:
+            update = self.reduction(source_s.unsqueeze(3) * target_x.unsqueeze(2), dim=0)
+            self.connection.w -= self.nu[0] * update
+
+        # Post-synaptic update.
+        if self.nu[1]:
+            update = self.reduction(source_x.unsqueeze(3) * target_s.unsqueeze(2), dim=0)
+            self.connection.w += self.nu[1] * update
+
+        super().update()
+
+    def _sparse_connection_update(self, **kwargs) -> None:
+        # language=rst
+        """
+        Post-pre learning rule for ``SparseConnection`` subclass of ``AbstractConnection`` class. Only the existing
+        synapses are updated, in place.
+        """
+        batch_size = self.source.batch_size
+        rows, cols = self.connection.w._indices()
+        values = self.connection.w._values()
 
         # Pre-synaptic update.
         if self.nu[0]:
             source_s = self.source.s.view(batch_size, -1).float()
-            sparse_source_s = bsr_matrix(source_s)
-            target_x = self.target.x.view(batch_size, -1)
-            sparse_target_x = bsr_matrix(target_x)
-            update = (sparse_source_s.T @ sparse_target_x)
-            sparse_weights = bsr_matrix(weights)
-            sparse_weights -= self.nu[0] * update
-            w = torch.FloatTensor(sparse_weights.toarray())
-            self.connection.w = Parameter(w, False)
-            # update2 = self.reduction(torch.bmm(target_x.unsqueeze(2), source_s.unsqueeze(1)), dim=0)
-
-            #print((update == update2.numpy()).sum())
+            if source_s.any():
+                target_x = self.target.x.view(batch_size, -1)
+                update = self.reduction(source_s[:, rows] * target_x[:, cols], dim=0)
+                values -= self.nu[0] * update
 
         # Post-synaptic update.
         if self.nu[1]:
             target_s = self.target.s.view(batch_size, -1).float()
-            sparse_target_s = bsr_matrix(target_s)
-            source_x = self.source.x.view(batch_size, -1)
-            sparse_source_x = bsr_matrix(source_x)
-            update = (sparse_source_x.T @ sparse_target_s)
-            sparse_weights = bsr_matrix(weights)
-            sparse_weights += self.nu[1] * update
-            w = torch.FloatTensor(sparse_weights.toarray())
-            self.connection.w = Parameter(w, False)
-
-            #update = self.reduction(torch.bmm(source_x, target_s), dim=0)
-            #self.connection.w += self.nu[1] * update.reshape(self.connection.w.shape) # EDITED (self.connection.w -= self.nu[0] * update)
+            if target_s.any():
+                source_x = self.source.x.view(batch_size, -1)
+                update = self.reduction(source_x[:, rows] * target_s[:, cols], dim=0)
+                values += self.nu[1] * update
 
         super().update()
 
@@ -320,8 +428,10 @@ class WeightDependentPostPre(LearningRule):
         self.wmin = connection.wmin
         self.wmax = connection.wmax
 
-        if isinstance(connection, (Connection, LocalConnection)):
+        if isinstance(connection, Connection):
             self.update = self._connection_update
+        elif isinstance(connection, LocalConnection):
+            self.update = self._local_connection_update
         elif isinstance(connection, Conv2dConnection):
             self.update = self._conv2d_connection_update
         else:
@@ -357,6 +467,37 @@ class WeightDependentPostPre(LearningRule):
 
         super().update()
 
+    def _local_connection_update(self, **kwargs) -> None:
+        # language=rst
+        """
+        Post-pre learning rule for ``LocalConnection`` subclass of ``AbstractConnection`` class. Updates are only
+        computed for the weights inside the receptive fields.
+        """
+        batch_size = self.source.batch_size
+        n_filters, conv_prod, _ = self.connection.w.size()
+
+        update = 0
+
+        # Pre-synaptic update.
+        if self.nu[0]:
+            outer_product = self._local_outer_product(
+                self.target.x.view(batch_size, n_filters, conv_prod),
+                self._receptive_fields(self.source.s).float(),
+            )
+            update -= self.nu[0] * outer_product * (self.connection.w - self.wmin)
+
+        # Post-synaptic update.
+        if self.nu[1]:
+            outer_product = self._local_outer_product(
+                self.target.s.view(batch_size, n_filters, conv_prod).float(),
+                self._receptive_fields(self.source.x),
+            )
+            update += self.nu[1] * outer_product * (self.wmax - self.connection.w)
+
+        self.connection.w += update
+
+        super().update()
+
     def _conv2d_connection_update(self, **kwargs) -> None:
         # language=rst
         """
@@ -450,8 +591,10 @@ class Hebbian(LearningRule):
             self.source.traces and self.target.traces
         ), "Both pre- and post-synaptic nodes must record spike traces."
 
-        if isinstance(connection, (Connection, LocalConnection)):
+        if isinstance(connection, Connection):
             self.update = self._connection_update
+        elif isinstance(connection, LocalConnection):
+            self.update = self._local_connection_update
         elif isinstance(connection, Conv2dConnection):
             self.update = self._conv2d_connection_update
         else:
@@ -481,6 +624,30 @@ class Hebbian(LearningRule):
 
         super().update()
 
+    def _local_connection_update(self, **kwargs) -> None:
+        # language=rst
+        """
+        Hebbian learning rule for ``LocalConnection`` subclass of ``AbstractConnection`` class. Updates are only
+        computed for the weights inside the receptive fields.
+        """
+        batch_size = self.source.batch_size
+        n_filters, conv_prod, _ = self.connection.w.size()
+
+        source_s = self._receptive_fields(self.source.s).float()
+        source_x = self._receptive_fields(self.source.x)
+        target_s = self.target.s.view(batch_size, n_filters, conv_prod).float()
+        target_x = self.target.x.view(batch_size, n_filters, conv_prod)
+
+        # Pre-synaptic update.
+        update = self._local_outer_product(target_x, source_s)
+        self.connection.w += self.nu[0] * update
+
+        # Post-synaptic update.
+        update = self._local_outer_product(target_s, source_x)
+        self.connection.w += self.nu[1] * update
+
+        super().update()
+
     def _conv2d_connection_update(self, **kwargs) -> None:
         # language=rst
         """
@@ -551,8 +718,10 @@ class MSTDP(LearningRule):
             **kwargs
         )
 
-        if isinstance(connection, (Connection, LocalConnection)):
+        if isinstance(connection, Connection):
             self.update = self._connection_update
+        elif isinstance(connection, LocalConnection):
+            self.update = self._local_connection_update
         elif isinstance(connection, Conv2dConnection):
             self.update = self._conv2d_connection_update
         else:
@@ -610,6 +779,57 @@ class MSTDP(LearningRule):
 
         super().update()
 
+    def _local_connection_update(self, **kwargs) -> None:
+        # language=rst
+        """
+        MSTDP learning rule for ``LocalConnection`` subclass of ``AbstractConnection`` class. The eligibility is only
+        kept for the weights inside the receptive fields.
+
+        Keyword arguments:
+
+        :param Union[float, torch.Tensor] reward: Reward signal from reinforcement learning task.
+        :param float a_plus: Learning rate (post-synaptic).
+        :param float a_minus: Learning rate (pre-synaptic).
+        """
+        batch_size = self.source.batch_size
+        n_filters, conv_prod, _ = self.connection.w.size()
+
+        # Initialize eligibility, P^+, and P^-.
+        if not hasattr(self, "p_plus"):
+            self.p_plus = torch.zeros(batch_size, *self.source.shape)
+        if not hasattr(self, "p_minus"):
+            self.p_minus = torch.zeros(batch_size, *self.target.shape)
+        if not hasattr(self, "eligibility"):
+            self.eligibility = torch.zeros(batch_size, *self.connection.w.shape)
+
+        # Reshape pre- and post-synaptic spikes.
+        source_s = self.source.s.view(batch_size, -1).float()
+        target_s = self.target.s.view(batch_size, -1).float()
+
+        # Parse keyword arguments.
+        reward = kwargs["reward"]
+        a_plus = torch.tensor(kwargs.get("a_plus", 1.0))
+        a_minus = torch.tensor(kwargs.get("a_minus", -1.0))
+
+        # Compute weight update based on the point eligibility value of the past timestep.
+        update = reward * self.eligibility
+        self.connection.w += self.nu[0] * self.reduction(update, dim=0)
+
+        # Update P^+ and P^- values.
+        self.p_plus *= torch.exp(-self.connection.dt / self.tc_plus)
+        self.p_plus += a_plus * source_s.view_as(self.p_plus)
+        self.p_minus *= torch.exp(-self.connection.dt / self.tc_minus)
+        self.p_minus += a_minus * target_s.view_as(self.p_minus)
+
+        # Calculate point eligibility value, [batch_size, n_filters, conv_prod, kernel_prod].
+        p_plus = self._receptive_fields(self.p_plus).unsqueeze(1)
+        source_s = self._receptive_fields(source_s).unsqueeze(1)
+        target_s = target_s.view(batch_size, n_filters, conv_prod, 1)
+        p_minus = self.p_minus.view(batch_size, n_filters, conv_prod, 1)
+        self.eligibility = p_plus * target_s + source_s * p_minus
+
+        super().update()
+
     def _conv2d_connection_update(self, **kwargs) -> None:
         # language=rst
         """
@@ -714,8 +934,10 @@ class MSTDPET(LearningRule):
             **kwargs
         )
 
-        if isinstance(connection, (Connection, LocalConnection)):
+        if isinstance(connection, Connection):
             self.update = self._connection_update
+        elif isinstance(connection, LocalConnection):
+            self.update = self._local_connection_update
         elif isinstance(connection, Conv2dConnection):
             self.update = self._conv2d_connection_update
         else:
@@ -779,6 +1001,63 @@ class MSTDPET(LearningRule):
 
         super().update()
 
+    def _local_connection_update(self, **kwargs) -> None:
+        # language=rst
+        """
+        MSTDPET learning rule for ``LocalConnection`` subclass of ``AbstractConnection`` class. The eligibility and its
+        trace are only kept for the weights inside the receptive fields.
+
+        Keyword arguments:
+
+        :param Union[float, torch.Tensor] reward: Reward signal from reinforcement learning task.
+        :param float a_plus: Learning rate (post-synaptic).
+        :param float a_minus: Learning rate (pre-synaptic).
+        """
+        n_filters, conv_prod, _ = self.connection.w.size()
+
+        # Initialize eligibility, eligibility trace, P^+, and P^-.
+        if not hasattr(self, "p_plus"):
+            self.p_plus = torch.zeros(self.source.n)
+        if not hasattr(self, "p_minus"):
+            self.p_minus = torch.zeros(self.target.n)
+        if not hasattr(self, "eligibility"):
+            self.eligibility = torch.zeros(*self.connection.w.shape)
+        if not hasattr(self, "eligibility_trace"):
+            self.eligibility_trace = torch.zeros(*self.connection.w.shape)
+
+        # Reshape pre- and post-synaptic spikes.
+        source_s = self.source.s.view(-1).float()
+        target_s = self.target.s.view(-1).float()
+
+        # Parse keyword arguments.
+        reward = kwargs["reward"]
+        a_plus = torch.tensor(kwargs.get("a_plus", 1.0))
+        a_minus = torch.tensor(kwargs.get("a_minus", -1.0))
+
+        # Calculate value of eligibility trace based on the value of the point eligibility value of the past timestep.
+        self.eligibility_trace *= torch.exp(-self.connection.dt / self.tc_e_trace)
+        self.eligibility_trace += self.eligibility / self.tc_e_trace
+
+        # Compute weight update.
+        self.connection.w += (
+            self.nu[0] * self.connection.dt * reward * self.eligibility_trace
+        )
+
+        # Update P^+ and P^- values.
+        self.p_plus *= torch.exp(-self.connection.dt / self.tc_plus)
+        self.p_plus += a_plus * source_s
+        self.p_minus *= torch.exp(-self.connection.dt / self.tc_minus)
+        self.p_minus += a_minus * target_s
+
+        # Calculate point eligibility value, [n_filters, conv_prod, kernel_prod].
+        p_plus = self._receptive_fields(self.p_plus.unsqueeze(0))
+        source_s = self._receptive_fields(source_s.unsqueeze(0))
+        target_s = target_s.view(n_filters, conv_prod, 1)
+        p_minus = self.p_minus.view(n_filters, conv_prod, 1)
+        self.eligibility = p_plus * target_s + source_s * p_minus
+
+        super().update()
+
     def _conv2d_connection_update(self, **kwargs) -> None:
         # language=rst
         """
@@ -897,8 +1176,10 @@ class Rmax(LearningRule):
             self.target, SRM0Nodes
         ), "R-max needs stochastically firing neurons, use SRM0Nodes."
 
-        if isinstance(connection, (Connection, LocalConnection)):
+        if isinstance(connection, Connection):
             self.update = self._connection_update
+        elif isinstance(connection, LocalConnection):
+            self.update = self._local_connection_update
         else:
             raise NotImplementedError(
                 "This learning rule is not supported for this Connection type."
@@ -941,3 +1222,39 @@ class Rmax(LearningRule):
         self.connection.w += self.nu[0] * reward * self.eligibility_trace
 
         super().update()
+
+    def _local_connection_update(self, **kwargs) -> None:
+        # language=rst
+        """
+        R-max learning rule for ``LocalConnection`` subclass of ``AbstractConnection`` class. The eligibility trace is
+        only kept for the weights inside the receptive fields.
+
+        Keyword arguments:
+
+        :param Union[float, torch.Tensor] reward: Reward signal from reinforcement learning task.
+        """
+        n_filters, conv_prod, _ = self.connection.w.size()
+
+        # Initialize eligibility trace.
+        if not hasattr(self, "eligibility_trace"):
+            self.eligibility_trace = torch.zeros(*self.connection.w.shape)
+
+        # Reshape variables.
+        target_s = self.target.s.view(-1).float()
+        target_s_prob = self.target.s_prob.view(-1)
+        source_x = self._receptive_fields(self.source.x.view(1, -1))
+
+        # Parse keyword arguments.
+        reward = kwargs["reward"]
+
+        # New eligibility trace.
+        self.eligibility_trace *= 1 - self.connection.dt / self.tc_e_trace
+        self.eligibility_trace += (
+            target_s
+            - (target_s_prob / (1.0 + self.tc_c / self.connection.dt * target_s_prob))
+        ).view(n_filters, conv_prod, 1) * source_x
+
+        # Compute weight update.
+        self.connection.w += self.nu[0] * reward * self.eligibility_trace
+
+        super().update()
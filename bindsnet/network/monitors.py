@@ -1,20 +1,204 @@
 import os
+import shutil
+import tempfile
 import torch
+import torch.nn.functional as F
 import numpy as np
 
 from abc import ABC, abstractmethod
-from typing import Union, Optional, Iterable, Dict
+from typing import Union, Optional, Iterable, Dict, Tuple, Sequence
 
 from .nodes import Nodes
 from .topology import AbstractConnection
 
 
+_shifts_cache = {}
+
+
+def _shifts(device: torch.device) -> torch.Tensor:
+    # language=rst
+    """
+    Returns the bit positions ``0, ..., 7`` of the spikes packed into a byte.
+    """
+    shifts = _shifts_cache.get(device)
+    if shifts is None:
+        shifts = _shifts_cache[device] = torch.arange(8, dtype=torch.uint8, device=device)
+
+    return shifts
+
+
+def _pack(s: torch.Tensor, start_dim: int = 1) -> torch.Tensor:
+    # language=rst
+    """
+    Packs the spikes of the dimensions of ``s`` from ``start_dim`` on into bytes, see ``PackedSpikes``.
+
+    :param s: Spikes; every non-zero entry is a spike.
+    :param start_dim: First neuron dimension of ``s``. The dimensions before it are kept.
+    :return: ``uint8`` tensor of shape ``[*s.shape[:start_dim], ceil(n / 8)]``.
+    """
+    leading_shape = s.shape[:start_dim]
+    bits = s.reshape(*leading_shape, -1)
+    bits = (bits if bits.dtype == torch.bool else bits != 0).to(torch.uint8)
+
+    n = bits.size(-1)
+    if n % 8:
+        bits = F.pad(bits, (0, 8 - n % 8))
+
+    return (bits.view(*leading_shape, -1, 8) << _shifts(s.device)).sum(-1, dtype=torch.uint8)
+
+
+class PackedSpikes:
+    # language=rst
+    """
+    Spike tensor stored bit-packed, eight spikes per byte. The trailing (neuron) dimensions are flattened and packed,
+    while the leading dimensions (e.g., time and batch) are kept and can be indexed, sliced and summed over without
+    unpacking.
+    """
+
+    def __init__(self, packed: torch.Tensor, shape: Sequence[int]) -> None:
+        # language=rst
+        """
+        Wraps already packed spikes.
+
+        :param packed: ``uint8`` tensor of shape ``[*leading_shape, ceil(n / 8)]``, where bit ``i % 8`` of byte
+            ``i // 8`` is the spike of neuron ``i``.
+        :param shape: Shape of the neuron dimensions, with ``n`` elements.
+        """
+        self.packed = packed
+        self.neuron_shape = torch.Size(shape)
+        self.n = self.neuron_shape.numel()
+
+    @staticmethod
+    def pack(s: torch.Tensor, start_dim: int = 1) -> "PackedSpikes":
+        # language=rst
+        """
+        Packs a spike tensor.
+
+        :param s: Spikes; every non-zero entry is a spike.
+        :param start_dim: First neuron dimension of ``s``. The dimensions before it are kept.
+        """
+        return PackedSpikes(_pack(s, start_dim), s.shape[start_dim:])
+
+    @property
+    def shape(self) -> torch.Size:
+        # language=rst
+        """
+        Shape of the unpacked spikes, ``[*leading_shape, *neuron_shape]``.
+        """
+        return self.packed.shape[:-1] + self.neuron_shape
+
+    def __len__(self) -> int:
+        return self.packed.size(0)
+
+    def __repr__(self) -> str:
+        return "PackedSpikes(shape=%s)" % list(self.shape)
+
+    def __getitem__(self, item) -> "PackedSpikes":
+        # language=rst
+        """
+        Indexes the leading dimensions without unpacking.
+
+        :param item: Index of the leading dimensions, e.g. a time slice.
+        """
+        if not isinstance(item, tuple):
+            item = (item,)
+
+        assert (
+            len(item) < self.packed.dim() and Ellipsis not in item
+        ), "Only the leading dimensions of packed spikes can be indexed"
+
+        return PackedSpikes(self.packed[item], self.neuron_shape)
+
+    def view(self, *shape: int) -> "PackedSpikes":
+        # language=rst
+        """
+        Reshapes the spikes without unpacking, as long as the neuron dimensions stay trailing and whole, e.g.
+        ``view(time, -1)`` for spikes of shape ``[time, 1, *neuron_shape]``.
+
+        :param shape: New shape; may contain one ``-1``.
+        """
+        shape = list(shape)
+        if -1 in shape:
+            known = int(np.prod([d for d in shape if d != -1]))
+            shape[shape.index(-1)] = int(np.prod(self.shape)) // known
+
+        # Find the trailing dimensions holding exactly the packed neurons.
+        k, n = len(shape), 1
+        while k > 0 and n < self.n:
+            k -= 1
+            n *= shape[k]
+
+        if n != self.n or np.prod(shape[:k]) != np.prod(self.packed.shape[:-1]):
+            raise ValueError(
+                "Cannot view packed spikes of shape %s as %s" % (list(self.shape), shape)
+            )
+
+        return PackedSpikes(self.packed.reshape(*shape[:k], -1), shape[k:])
+
+    def unpack(self) -> torch.Tensor:
+        # language=rst
+        """
+        Returns the spikes as a dense ``bool`` tensor.
+        """
+        bits = (self.packed.unsqueeze(-1) >> _shifts(self.packed.device)) & 1
+        bits = bits.view(*self.packed.shape[:-1], -1)[..., : self.n]
+        return bits.to(torch.bool).reshape(self.shape)
+
+    def sum(self, dim: int = 0) -> torch.Tensor:
+        # language=rst
+        """
+        Counts the spikes along a leading dimension, e.g. over time.
+
+        :param dim: Leading dimension to sum over.
+        :return: Spike counts of shape ``[*leading_shape without dim, *neuron_shape]``.
+        """
+        assert 0 <= dim < self.packed.dim() - 1, "Can only sum over a leading dimension"
+
+        counts = torch.stack([((self.packed >> b) & 1).sum(dim) for b in range(8)], -1)
+        counts = counts.view(*counts.shape[:-2], -1)[..., : self.n]
+        return counts.reshape(*counts.shape[:-1], *self.neuron_shape)
+
+    def window_sum(self, window: int) -> torch.Tensor:
+        # language=rst
+        """
+        Counts the spikes in consecutive windows along the first dimension (e.g., time).
+
+        :param window: Number of steps per window. The last window may be shorter.
+        :return: Spike counts of shape ``[ceil(len / window), *leading_shape[1:], *neuron_shape]``.
+        """
+        packed = self.packed
+        pad = -len(self) % window
+        if pad:
+            packed = torch.cat((packed, packed.new_zeros(pad, *packed.shape[1:])), 0)
+
+        return PackedSpikes(
+            packed.view(-1, window, *packed.shape[1:]), self.neuron_shape
+        ).sum(1)
+
+    def clone(self) -> "PackedSpikes":
+        return PackedSpikes(self.packed.clone(), self.neuron_shape)
+
+    def to(self, *args, **kwargs) -> "PackedSpikes":
+        # language=rst
+        """
+        Moves the packed spikes to another device, see ``torch.Tensor.to``.
+        """
+        return PackedSpikes(self.packed.to(*args, **kwargs), self.neuron_shape)
+
+
 class AbstractMonitor(ABC):
     # language=rst
     """
     Abstract base class for state variable monitors.
     """
 
+    def end_run(self) -> None:
+        # language=rst
+        """
+        Called by ``Network.run`` once the simulation of the given time has finished. Does nothing by default.
+        """
+        pass
+
 
 class Monitor(AbstractMonitor):
     # language=rst
@@ -28,6 +212,7 @@ class Monitor(AbstractMonitor):
         state_vars: Iterable[str],
         time: Optional[int] = None,
         batch_size: int = 1,
+        pack_spikes: bool = False,
     ):
         # language=rst
         """
@@ -35,7 +220,10 @@ class Monitor(AbstractMonitor):
 
         :param obj: An object to record state variables from during network simulation.
         :param state_vars: Iterable of strings indicating names of state variables to record.
-        :param time: If not ``None``, pre-allocate memory for state variable recording.
+        :param time: If not ``None``, pre-allocate memory for state variable recording. The recording is then a ring
+                     buffer holding the last ``time`` values.
+        :param pack_spikes: Whether to store the recording of spikes (``"s"``) bit-packed, which takes 8 times less
+                            memory than ``bool`` spikes. ``get("s")`` then returns ``PackedSpikes``.
         """
         super().__init__()
 
@@ -43,35 +231,74 @@ class Monitor(AbstractMonitor):
         self.state_vars = state_vars
         self.time = time
         self.batch_size = batch_size
+        self.pack_spikes = pack_spikes
 
-        # If no simulation time is specified, specify 0-dimensional recordings.
-        if self.time is None:
-            self.recording = {
-                v: torch.tensor([], dtype=getattr(self.obj, v).dtype)
-                for v in self.state_vars
-            }
+        # Ring buffer cursor: index of the slot written by the next call to ``record``.
+        self.i = 0
 
-        # If simulation time is specified, pre-allocate recordings in memory for speed.
-        else:
-            self.recording = {
-                v: torch.zeros(
-                    self.time,
-                    *getattr(self.obj, v).size(),
-                    dtype=getattr(self.obj, v).dtype
-                )
-                for v in self.state_vars
-            }
+        self.recording = {}
+        self._allocate()
+
+    def _packed(self, v: str) -> bool:
+        # language=rst
+        """
+        Whether the recording of state variable ``v`` is bit-packed.
+        """
+        return v == "s" and getattr(self, "pack_spikes", False)
+
+    def _data(self, v: str) -> torch.Tensor:
+        # language=rst
+        """
+        Returns the current value of state variable ``v`` as stored in the recording.
+        """
+        data = getattr(self.obj, v)
+        return _pack(data) if self._packed(v) else data
+
+    def _allocate(self) -> None:
+        # language=rst
+        """
+        Creates empty recordings, or zeroes the pre-allocated ones in place unless the shape of the recorded state
+        variable changed.
+        """
+        for v in self.state_vars:
+            data = self._data(v)
+
+            # If no simulation time is specified, specify 0-dimensional recordings.
+            if self.time is None:
+                if self._packed(v):
+                    self.recording[v] = data.new_zeros(0, *data.size())
+                else:
+                    self.recording[v] = torch.tensor([], dtype=data.dtype)
+
+            # If simulation time is specified, pre-allocate recordings in memory for speed.
+            elif v in self.recording and self.recording[v].size()[1:] == data.size():
+                self.recording[v].zero_()
+            else:
+                self.recording[v] = torch.zeros(self.time, *data.size(), dtype=data.dtype)
 
     def get(self, var: str) -> torch.Tensor:
         # language=rst
         """
         Return recording to user.
 
+        With pre-allocated recordings, a time-ordered copy of the ring buffer is returned, so that later recordings
+        do not overwrite it. Slots that were not written since the last reset are zeros and come first.
+
         :param var: State variable recording to return.
-        :return: Tensor of shape ``[time, n_1, ..., n_k]``, where ``[n_1, ..., n_k]`` is the shape of the recorded
-                 state variable.
+        :return: Tensor (``PackedSpikes`` for packed spikes) of shape ``[time, n_1, ..., n_k]``, where
+                 ``[n_1, ..., n_k]`` is the shape of the recorded state variable.
         """
-        return self.recording[var]
+        recording = self.recording[var]
+        if self.time is not None:
+            if self.i != 0:
+                recording = torch.cat((recording[self.i :], recording[: self.i]), 0)
+            else:
+                recording = recording.clone()
+
+        if self._packed(var):
+            return PackedSpikes(recording, getattr(self.obj, var).shape[1:])
+
+        return recording
 
     def record(self) -> None:
         # language=rst
@@ -80,40 +307,30 @@ class Monitor(AbstractMonitor):
         """
         if self.time is None:
             for v in self.state_vars:
-                data = getattr(self.obj, v).unsqueeze(0)
+                data = self._data(v).unsqueeze(0)
                 self.recording[v] = torch.cat(
                     (self.recording[v].type(data.type()), data), 0
                 )
         else:
             for v in self.state_vars:
-                # Remove the oldest data and concatenate new data
-                data = getattr(self.obj, v).unsqueeze(0)
-                self.recording[v] = torch.cat(
-                    (self.recording[v][1:].type(data.type()), data), 0
-                )
+                # Overwrite the oldest slot of the ring buffer.
+                data = self._data(v)
+                recording = self.recording[v]
+                if recording.dtype != data.dtype or recording.device != data.device:
+                    recording = self.recording[v] = recording.to(data)
+
+                recording[self.i] = data
+
+            self.i = (self.i + 1) % self.time
 
     def reset_(self) -> None:
         # language=rst
         """
-        Resets recordings to empty ``torch.Tensor``s.
+        Resets recordings to empty ``torch.Tensor``s. Pre-allocated recordings are zeroed in place unless the shape
+        of the recorded state variable changed (e.g., a new batch size).
         """
-        # If no simulation time is specified, specify 0-dimensional recordings.
-        if self.time is None:
-            self.recording = {
-                v: torch.tensor([], dtype=getattr(self.obj, v).dtype)
-                for v in self.state_vars
-            }
-
-        # If simulation time is specified, pre-allocate recordings in memory for speed.
-        else:
-            self.recording = {
-                v: torch.zeros(
-                    self.time,
-                    *getattr(self.obj, v).size(),
-                    dtype=getattr(self.obj, v).dtype
-                )
-                for v in self.state_vars
-            }
+        self.i = 0
+        self._allocate()
 
 
 class NetworkMonitor(AbstractMonitor):
@@ -129,6 +346,10 @@ class NetworkMonitor(AbstractMonitor):
         connections: Optional[Iterable[str]] = None,
         state_vars: Optional[Iterable[str]] = None,
         time: Optional[int] = None,
+        schedule: Optional[Dict[str, Union[int, str]]] = None,
+        max_size: Optional[int] = None,
+        spill_path: Optional[str] = None,
+        pack_spikes: bool = False,
     ):
         # language=rst
         """
@@ -139,6 +360,15 @@ class NetworkMonitor(AbstractMonitor):
         :param connections: Connections to record state variables from.
         :param state_vars: List of strings indicating names of state variables to record.
         :param time: If not ``None``, pre-allocate memory for state variable recording.
+        :param schedule: Mapping of state variable names to recording schedules: an ``int`` ``k`` records every
+                         ``k``-th simulation step, ``"run"`` records once at the end of each ``Network.run`` call and
+                         ``"save"`` records only when ``save`` is called. Unlisted variables are recorded every step.
+        :param max_size: If not ``None`` (and ``time`` is ``None``), maximum number of bytes of recording kept in
+                         memory; beyond it, the recording is spilled to disk.
+        :param spill_path: Directory to spill recordings to. Defaults to a new temporary directory, which is removed
+                           with the spilled recordings on ``reset_`` or when the monitor is garbage collected.
+        :param pack_spikes: Whether to store the recordings of layer spikes (``"s"``) bit-packed instead of as
+                            ``float``; ``get`` then returns them as ``PackedSpikes``.
         """
         super().__init__()
 
@@ -151,156 +381,241 @@ class NetworkMonitor(AbstractMonitor):
         )
         self.state_vars = state_vars if state_vars is not None else ("v", "s", "w")
         self.time = time
+        self.schedule = schedule if schedule is not None else {}
+        self.max_size = max_size
+        self.spill_path = spill_path
+        self.pack_spikes = pack_spikes
 
-        if self.time is not None:
-            self.i = 0
+        for v, every in self.schedule.items():
+            assert every in ("run", "save") or (
+                isinstance(every, int) and every > 0
+            ), 'Schedule of "%s" must be a positive int, "run" or "save"' % v
 
-        # Initialize empty recording.
-        self.recording = {k: {} for k in self.layers + self.connections}
+        self.spilled = []
+        self._spill_dir = None
+        self.reset_()
 
-        # If no simulation time is specified, specify 0-dimensional recordings.
+    def __setstate__(self, state: dict) -> None:
+        # language=rst
+        """
+        Restores a pickled monitor, which does not own the temporary spill directory of the original.
+        """
+        self.__dict__.update(state)
+        self._spill_dir = None
+
+    def __del__(self) -> None:
+        self._remove_spilled()
+
+    def _objects(
+        self, v: str, copy: bool = True
+    ) -> Iterable[Tuple[Union[str, Tuple[str, str]], torch.Tensor]]:
+        # language=rst
+        """
+        Yields the names of all monitored layers and connections having state variable ``v`` together with its
+        current value.
+
+        :param v: Name of the state variable.
+        :param copy: Whether to yield copies of the values (layer values are cast to ``float``, or bit-packed for
+                     packed spikes) or the values themselves.
+        """
+        pack = v == "s" and getattr(self, "pack_spikes", False)
+        for l in self.layers:
+            if hasattr(self.network.layers[l], v):
+                data = getattr(self.network.layers[l], v)
+                if copy:
+                    data = _pack(data) if pack else data.to(torch.float, copy=True)
+
+                yield l, data
+
+        for c in self.connections:
+            if hasattr(self.network.connections[c], v):
+                data = getattr(self.network.connections[c], v)
+                yield c, data.detach().clone() if copy else data
+
+    def _record_var(self, v: str) -> None:
+        # language=rst
+        """
+        Appends the current value of state variable ``v`` of all monitored objects to the recording.
+
+        :param v: Name of the state variable.
+        """
         if self.time is None:
-            for v in self.state_vars:
-                for l in self.layers:
-                    if hasattr(self.network.layers[l], v):
-                        self.recording[l][v] = torch.Tensor()
+            for o, data in self._objects(v):
+                self.recording[o][v].append(data.unsqueeze(0))
+                self.size += data.numel() * data.element_size()
 
-                for c in self.connections:
-                    if hasattr(self.network.connections[c], v):
-                        self.recording[c][v] = torch.Tensor()
+            if self.max_size is not None and self.size > self.max_size:
+                self._spill()
 
-        # If simulation time is specified, pre-allocate recordings in memory for speed.
         else:
-            for v in self.state_vars:
-                for l in self.layers:
-                    if hasattr(self.network.layers[l], v):
-                        self.recording[l][v] = torch.zeros(
-                            self.time, *getattr(self.network.layers[l], v).size()
-                        )
-
-                for c in self.connections:
-                    if hasattr(self.network.connections[c], v):
-                        self.recording[c][v] = torch.zeros(
-                            self.time, *getattr(self.network.connections[c], v).size()
-                        )
+            # Overwrite the oldest slot of the variable's ring buffer.
+            for o, data in self._objects(v):
+                self.recording[o][v][self.cursors[v]] = data
+
+            self.cursors[v] = (self.cursors[v] + 1) % self.time
+
+    def _spill(self) -> None:
+        # language=rst
+        """
+        Writes the in-memory recording to a new file in ``self.spill_path`` and clears it from memory.
+        """
+        if self.spill_path is None:
+            self.spill_path = self._spill_dir = tempfile.mkdtemp(prefix="network_monitor_")
+
+        os.makedirs(self.spill_path, exist_ok=True)
+
+        path = os.path.join(self.spill_path, "%d.pt" % len(self.spilled))
+        torch.save(
+            {
+                o: {v: torch.cat(chunks, 0) for v, chunks in self.recording[o].items() if chunks}
+                for o in self.recording
+            },
+            path,
+        )
+        self.spilled.append(path)
+
+        for o in self.recording:
+            for v in self.recording[o]:
+                self.recording[o][v] = []
+
+        self.size = 0
+
+    def _remove_spilled(self) -> None:
+        # language=rst
+        """
+        Removes the spilled recordings from disk, together with the temporary directory created for them.
+        """
+        for path in getattr(self, "spilled", []):
+            if os.path.exists(path):
+                os.remove(path)
+
+        self.spilled = []
+
+        if getattr(self, "_spill_dir", None) is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self.spill_path = self._spill_dir = None
 
     def get(self) -> Dict[str, Dict[str, Union[Nodes, AbstractConnection]]]:
         # language=rst
         """
-        Return entire recording to user.
+        Return entire recording to user. Spilled recordings are read back from disk.
 
         :return: Dictionary of dictionary of all layers' and connections' recorded state variables.
         """
-        return self.recording
+        if self.time is not None:
+            recording = {
+                o: {
+                    v: torch.cat((r[self.cursors[v] :], r[: self.cursors[v]]), 0)
+                    for v, r in self.recording[o].items()
+                }
+                for o in self.recording
+            }
+        else:
+            spilled = [torch.load(path) for path in self.spilled]
+
+            recording = {}
+            for o in self.recording:
+                recording[o] = {}
+                for v in self.recording[o]:
+                    chunks = [s[o][v] for s in spilled if v in s[o]] + self.recording[o][v]
+                    recording[o][v] = torch.cat(chunks, 0) if chunks else torch.Tensor()
+
+        if getattr(self, "pack_spikes", False):
+            for l in self.layers:
+                if "s" in recording[l] and recording[l]["s"].numel():
+                    shape = self.network.layers[l].s.shape[1:]
+                    recording[l]["s"] = PackedSpikes(recording[l]["s"], shape)
+
+        return recording
 
     def record(self) -> None:
         # language=rst
         """
-        Appends the current value of the recorded state variables to the recording.
+        Appends the current value of the state variables scheduled for this simulation step to the recording.
         """
-        if self.time is None:
-            for v in self.state_vars:
-                for l in self.layers:
-                    if hasattr(self.network.layers[l], v):
-                        data = getattr(self.network.layers[l], v).unsqueeze(0).float()
-                        self.recording[l][v] = torch.cat(
-                            (self.recording[l][v], data), 0
-                        )
-
-                for c in self.connections:
-                    if hasattr(self.network.connections[c], v):
-                        data = getattr(self.network.connections[c], v).unsqueeze(0)
-                        self.recording[c][v] = torch.cat(
-                            (self.recording[c][v], data), 0
-                        )
+        self.i += 1
+        for v in self.state_vars:
+            every = self.schedule.get(v, 1)
+            if isinstance(every, int) and self.i % every == 0:
+                self._record_var(v)
 
-        else:
-            for v in self.state_vars:
-                for l in self.layers:
-                    if hasattr(self.network.layers[l], v):
-                        data = getattr(self.network.layers[l], v).float().unsqueeze(0)
-                        self.recording[l][v] = torch.cat(
-                            (self.recording[l][v][1:].type(data.type()), data), 0
-                        )
-
-                for c in self.connections:
-                    if hasattr(self.network.connections[c], v):
-                        data = getattr(self.network.connections[c], v).unsqueeze(0)
-                        self.recording[c][v] = torch.cat(
-                            (self.recording[c][v][1:].type(data.type()), data), 0
-                        )
-
-            self.i += 1
+    def end_run(self) -> None:
+        # language=rst
+        """
+        Records the state variables scheduled at the end of each run.
+        """
+        for v in self.state_vars:
+            if self.schedule.get(v, 1) == "run":
+                self._record_var(v)
 
     def save(self, path: str, fmt: str = "npz") -> None:
         # language=rst
         """
-        Write the recording dictionary out to file.
+        Write the recording dictionary out to file. State variables scheduled on ``"save"`` are recorded first.
 
         :param path: The directory to which to write the monitor's recording.
         :param fmt: Type of file to write to disk. One of ``"pickle"`` or ``"npz"``.
         """
+        for v in self.state_vars:
+            if self.schedule.get(v, 1) == "save":
+                self._record_var(v)
+
         if not os.path.exists(os.path.dirname(path)):
             os.makedirs(os.path.dirname(path))
 
+        recording = self.get()
+
         if fmt == "npz":
+            for o in recording:
+                for v in recording[o]:
+                    if isinstance(recording[o][v], PackedSpikes):
+                        recording[o][v] = recording[o][v].unpack()
+
             # Build a list of arrays to write to disk.
             arrays = {}
-            for o in self.recording:
+            for o in recording:
                 if type(o) == tuple:
                     arrays.update(
                         {
-                            "_".join(["-".join(o), v]): self.recording[o][v]
-                            for v in self.recording[o]
+                            "_".join(["-".join(o), v]): recording[o][v]
+                            for v in recording[o]
                         }
                     )
                 elif type(o) == str:
                     arrays.update(
-                        {
-                            "_".join([o, v]): self.recording[o][v]
-                            for v in self.recording[o]
-                        }
+                        {"_".join([o, v]): recording[o][v] for v in recording[o]}
                     )
 
             np.savez_compressed(path, **arrays)
 
         elif fmt == "pickle":
             with open(path, "wb") as f:
-                torch.save(self.recording, f)
+                torch.save(recording, f)
 
     def reset_(self) -> None:
         # language=rst
         """
-        Resets recordings to empty ``torch.Tensors``.
+        Resets recordings to empty ``torch.Tensors`` and removes spilled recordings from disk.
         """
+        self.i = 0
+        self.size = 0
+        self.cursors = {v: 0 for v in self.state_vars}
+        self._remove_spilled()
+
         # Reset to empty recordings
         self.recording = {k: {} for k in self.layers + self.connections}
 
-        if self.time is not None:
-            self.i = 0
-
-        # If no simulation time is specified, specify 0-dimensional recordings.
+        # If no simulation time is specified, collect recorded steps in lists.
         if self.time is None:
             for v in self.state_vars:
-                for l in self.layers:
-                    if hasattr(self.network.layers[l], v):
-                        self.recording[l][v] = torch.Tensor()
-
-                for c in self.connections:
-                    if hasattr(self.network.connections[c], v):
-                        self.recording[c][v] = torch.Tensor()
+                for o, _ in self._objects(v, copy=False):
+                    self.recording[o][v] = []
 
         # If simulation time is specified, pre-allocate recordings in memory for speed.
         else:
             for v in self.state_vars:
-                for l in self.layers:
-                    if hasattr(self.network.layers[l], v):
-                        self.recording[l][v] = torch.zeros(
-                            self.time, *getattr(self.network.layers[l], v).size()
-                        )
-
-                for c in self.connections:
-                    if hasattr(self.network.connections[c], v):
-                        self.recording[c][v] = torch.zeros(
-                            self.time, *getattr(self.network.layers[c], v).size()
-                        )
+                pack = v == "s" and getattr(self, "pack_spikes", False)
+                for o, data in self._objects(v, copy=pack):
+                    self.recording[o][v] = torch.zeros(
+                        self.time, *data.size(), dtype=data.dtype if pack else None
+                    )
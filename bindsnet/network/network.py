@@ -1,5 +1,5 @@
 import tempfile
-from typing import Dict, Optional, Type
+from typing import Dict, Optional, Type, Union
 
 import torch
 
@@ -103,6 +103,8 @@ class Network(torch.nn.Module):
         self.layers = {}
         self.connections = {}
         self.monitors = {}
+        self._plan = None
+        self.last_timesteps = 0
         self.train(learning)
 
         if reward_fn is not None:
@@ -120,6 +122,7 @@ class Network(torch.nn.Module):
         """
         self.layers[name] = layer
         self.add_module(name, layer)
+        self._plan = None
 
         layer.train(self.learning)
         layer.compute_decays(self.dt)
@@ -138,6 +141,7 @@ class Network(torch.nn.Module):
         """
         self.connections[(source, target)] = connection
         self.add_module(source + "_to_" + target, connection)
+        self._plan = None
 
         connection.dt = self.dt
         connection.train(self.learning)
@@ -153,6 +157,7 @@ class Network(torch.nn.Module):
         self.monitors[name] = monitor
         monitor.network = self
         monitor.dt = self.dt
+        self._plan = None
 
     def save(self, file_name: str) -> None:
         # language=rst
@@ -201,30 +206,65 @@ class Network(torch.nn.Module):
         virtual_file.seek(0)
         return torch.load(virtual_file)
 
-    def _get_inputs(self) -> Dict[str, torch.Tensor]:
+    def _build_plan(self) -> Dict[str, Union[list, Dict[str, torch.Tensor]]]:
         # language=rst
         """
-        Fetches outputs from network layers to use as input to downstream layers.
+        Compiles the network topology into an execution plan: ordered lists of layers, connections and monitors with
+        direct object references, and one pre-allocated input accumulator per target layer.
 
-        :return: Inputs to all layers for the current iteration.
+        :return: Execution plan used by ``run`` and ``_get_inputs``.
         """
         inpts = {}
-
-        # Loop over network connections.
-        for c in self.connections:
-            # Fetch source and target populations.
-            source = self.connections[c].source
-            target = self.connections[c].target
-
-            if not c[1] in inpts:
+        connections = []
+        for c, connection in self.connections.items():
+            target = connection.target
+            if c[1] not in inpts:
                 inpts[c[1]] = torch.zeros(
                     self.batch_size, *target.shape, device=target.s.device
                 )
 
-            # Add to input: source's spikes multiplied by connection weights.
-            inpts[c[1]] += self.connections[c].compute(source.s).view(inpts[c[1]].shape) #EDITED
+            connections.append((c, connection, connection.source, inpts[c[1]]))
+
+        return {
+            "layers": [
+                (l, layer, isinstance(layer, AbstractInput))
+                for l, layer in self.layers.items()
+            ],
+            "connections": connections,
+            "monitors": list(self.monitors.values()),
+            "inputs": inpts,
+        }
+
+    def _get_plan(self) -> Dict[str, Union[list, Dict[str, torch.Tensor]]]:
+        # language=rst
+        """
+        Returns the execution plan, compiling it if the topology or batch size changed since it was last built.
+
+        :return: Execution plan used by ``run`` and ``_get_inputs``.
+        """
+        if getattr(self, "_plan", None) is None:
+            self._plan = self._build_plan()
+
+        return self._plan
+
+    def _get_inputs(self) -> Dict[str, torch.Tensor]:
+        # language=rst
+        """
+        Fetches outputs from network layers to use as input to downstream layers. The returned tensors are the plan's
+        accumulators and are overwritten in place on the next call.
+
+        :return: Inputs to all layers for the current iteration.
+        """
+        plan = self._get_plan()
+
+        for inpt in plan["inputs"].values():
+            inpt.zero_()
+
+        # Add to input: source's spikes multiplied by connection weights.
+        for _, connection, source, inpt in plan["connections"]:
+            inpt += connection.compute(source.s).view(inpt.shape)
 
-        return inpts
+        return plan["inputs"]
 
     def run(self, inpts: Dict[str, torch.Tensor], time: int, **kwargs) -> None:
         # language=rst
@@ -246,6 +286,13 @@ class Network(torch.nn.Module):
         :param Union[float, torch.Tensor] reward: Scalar value used in reward-modulated learning.
         :param Dict[Tuple[str], torch.Tensor] masks: Mapping of connection names to boolean masks determining which
                                                      weights to clamp to zero.
+        :param Callable stop_criterion: Called with a mapping of layer names to the spike counts of shape
+            ``[batch_size, *layer_shape]`` accumulated since the start of the run; the simulation ends early once it
+            returns ``True`` (or a tensor of all ``True``, e.g. one entry per sample). The number of simulated
+            timesteps is stored in ``last_timesteps``.
+        :param int stop_interval: Number of timesteps between evaluations of ``stop_criterion``. Defaults to ``1``.
+        :param Iterable[str] stop_layers: Names of the layers whose spikes are counted for ``stop_criterion``.
+            Defaults to all non-input layers.
 
         **Example:**
 
@@ -282,6 +329,9 @@ class Network(torch.nn.Module):
         unclamps = kwargs.get("unclamp", {})
         masks = kwargs.get("masks", {})
         injects_v = kwargs.get("injects_v", {})
+        stop_criterion = kwargs.get("stop_criterion", None)
+        stop_interval = kwargs.get("stop_interval", 1)
+        stop_layers = kwargs.get("stop_layers", None)
 
         # Compute reward.
         if self.reward_fn is not None:
@@ -305,6 +355,7 @@ class Network(torch.nn.Module):
                 # batch dimension is 1, grab this and use for batch size
                 if inpts[key].size(1) != self.batch_size:
                     self.batch_size = inpts[key].size(1)
+                    self._plan = None
 
                     for l in self.layers:
                         self.layers[l].set_batch_size(self.batch_size)
@@ -318,43 +369,54 @@ class Network(torch.nn.Module):
         timesteps = int(time / self.dt)
 
         # Get input to all layers.
+        plan = self._get_plan()
         inpts.update(self._get_inputs())
 
+        # Running spike counts for the stopping criterion.
+        if stop_criterion is not None:
+            if stop_layers is None:
+                stop_layers = [l for l, _, is_input in plan["layers"] if not is_input]
+
+            counts = {
+                l: torch.zeros(self.layers[l].s.shape, device=self.layers[l].s.device)
+                for l in stop_layers
+            }
+
         # Simulate network activity for `time` timesteps.
+        self.last_timesteps = timesteps
         for t in range(timesteps):
-            for l in self.layers:
+            for l, layer, is_input in plan["layers"]:
                 # Update each layer of nodes.
-                if isinstance(self.layers[l], AbstractInput):
+                if is_input:
                     # shape is [time, batch, n_0, ...]
-                    #inpts[l] = inpts[l].squeeze(0)  # EDITED
-                    self.layers[l].forward(x=inpts[l][t, ...])
+                    layer.forward(x=inpts[l][t, ...])
                 else:
-                    self.layers[l].forward(x=inpts[l])
+                    layer.forward(x=inpts[l])
 
                 # Clamp neurons to spike.
                 clamp = clamps.get(l, None)
                 if clamp is not None:
                     if clamp.ndimension() == 1:
-                        self.layers[l].s[:, clamp] = 1
+                        layer.s[:, clamp] = 1
                     else:
-                        self.layers[l].s[:, clamp[t]] = 1
+                        layer.s[:, clamp[t]] = 1
 
                 # Clamp neurons not to spike.
                 unclamp = unclamps.get(l, None)
                 if unclamp is not None:
                     if unclamp.ndimension() == 1:
-                        self.layers[l].s[unclamp] = 0
+                        layer.s[unclamp] = 0
                     else:
-                        self.layers[l].s[unclamp[t]] = 0
+                        layer.s[unclamp[t]] = 0
 
                 # Inject voltage to neurons.
                 inject_v = injects_v.get(l, None)
                 if inject_v is not None:
-                    self.layers[l].v += inject_v
+                    layer.v += inject_v
 
             # Run synapse updates.
-            for c in self.connections:
-                self.connections[c].update(
+            for c, connection, _, _ in plan["connections"]:
+                connection.update(
                     mask=masks.get(c, None), learning=self.learning, **kwargs
                 )
 
@@ -362,12 +424,37 @@ class Network(torch.nn.Module):
             inpts.update(self._get_inputs())
 
             # Record state variables of interest.
-            for m in self.monitors:
-                self.monitors[m].record()
+            for monitor in plan["monitors"]:
+                monitor.record()
+
+            # End the simulation early once the stopping criterion is met.
+            if stop_criterion is not None:
+                for l in counts:
+                    counts[l] += self.layers[l].s
+
+                if (t + 1) % stop_interval == 0 and bool(
+                    torch.as_tensor(stop_criterion(counts)).all()
+                ):
+                    self.last_timesteps = t + 1
+                    break
+
+        for monitor in plan["monitors"]:
+            monitor.end_run()
 
         # Re-normalize connections.
+        self.normalize_connections()
+
+    def normalize_connections(self) -> None:
+        # language=rst
+        """
+        Normalizes the connections whose weights changed since their last normalization. Unchanged weights are left
+        as they are, so that running a network without learning does not alter them.
+        """
         for c in self.connections:
-            self.connections[c].normalize()
+            connection = self.connections[c]
+            if connection.normalized_version != connection.version:
+                connection.normalize()
+                connection.normalized_version = connection.version
 
     def reset_(self) -> None:
         # language=rst
@@ -383,6 +470,24 @@ class Network(torch.nn.Module):
         for monitor in self.monitors:
             self.monitors[monitor].reset_()
 
+    def _apply(self, fn, *args, **kwargs) -> "torch.nn.Module":
+        # language=rst
+        """
+        Drops the execution plan when the network is moved between devices or dtypes, so that the input accumulators
+        are re-allocated alongside the layers.
+        """
+        self._plan = None
+        return super()._apply(fn, *args, **kwargs)
+
+    def __getstate__(self) -> dict:
+        # language=rst
+        """
+        Excludes the execution plan from serialization; it is rebuilt lazily after loading.
+        """
+        state = self.__dict__.copy()
+        state["_plan"] = None
+        return state
+
     def train(self, mode: bool = True) -> "torch.nn.Module":
         # language=rst
         """Sets the node in training mode.
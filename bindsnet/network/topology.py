@@ -10,6 +10,68 @@ from torch.nn.modules.utils import _pair
 from .nodes import Nodes
 
 
+def _propagate(s: torch.Tensor, w: torch.Tensor, threshold: float) -> torch.Tensor:
+    # language=rst
+    """
+    Multiplies a minibatch of spike vectors by a weight matrix, switching between a dense product and event-driven
+    propagation according to the spike density of the source.
+
+    Below a density of ``threshold``, the rows of ``w`` of the spiking neurons are gathered and summed into the
+    targets of their minibatch samples. If nothing spiked, no weights are touched at all.
+
+    :param s: Incoming spikes of shape ``[batch_size, n_source]``.
+    :param w: Weight matrix of shape ``[n_source, n_target]``.
+    :param threshold: Spike density below which event-driven propagation is used. ``0`` multiplies densely whenever
+                      any neuron spiked.
+    :return: Tensor of shape ``[batch_size, n_target]``.
+    """
+    n_active = int(s.count_nonzero())
+    if n_active == 0:
+        return w.new_zeros(s.size(0), w.size(1))
+
+    if n_active >= threshold * s.numel():
+        return s.to(w.dtype) @ w
+
+    batch, source = s.nonzero().unbind(1)
+    rows = w.index_select(0, source)
+    if s.dtype != torch.bool:
+        rows = rows * s[batch, source].to(w.dtype).unsqueeze(1)
+
+    if s.size(0) == 1:
+        return rows.sum(0, keepdim=True)
+
+    return w.new_zeros(s.size(0), w.size(1)).index_add_(0, batch, rows)
+
+
+def _normalize(
+    w: torch.Tensor,
+    norm: Union[float, torch.Tensor],
+    dim: Union[int, Tuple[int, ...]],
+    absolute: bool = False,
+) -> None:
+    # language=rst
+    """
+    Scales weights in place so that their sums over ``dim`` equal ``norm``. Slices summing to zero are left as they
+    are instead of being divided by zero.
+
+    :param w: Weights to normalize.
+    :param norm: Normalization constant. A tensor holds either one constant per sum (e.g., per target neuron) or one
+                 per index along the first dimension of ``w`` (e.g., per filter).
+    :param dim: Dimension(s) to sum over.
+    :param absolute: Whether to sum the absolute values of the weights.
+    """
+    w_sum = (w.abs() if absolute else w).sum(dim, keepdim=True)
+    w_sum.masked_fill_(w_sum == 0, 1.0)
+
+    if isinstance(norm, torch.Tensor):
+        if norm.numel() == w_sum.numel():
+            norm = norm.view(w_sum.shape)
+        else:
+            norm = norm.view(-1, *[1] * (w.dim() - 1))
+
+    w *= norm / w_sum
+
+
 class AbstractConnection(ABC, Module):
     # language=rst
     """
@@ -40,7 +102,7 @@ class AbstractConnection(ABC, Module):
         :param LearningRule update_rule: Modifies connection parameters according to some rule.
         :param float wmin: The minimum value on the connection weights.
         :param float wmax: The maximum value on the connection weights.
-        :param float norm: Total weight per target neuron normalization.
+        :param Union[float, torch.Tensor] norm: Total weight per target neuron normalization.
         :param ByteTensor norm_by_max: Normalize the weight of a neuron by its max weight.
         :param ByteTensor norm_by_max_with_shadow_weights: Normalize the weight of a neuron by its max weight by
                                                                 original weights
@@ -57,12 +119,22 @@ class AbstractConnection(ABC, Module):
         self.weight_decay = weight_decay
         self.reduction = reduction
 
+        # Assignments of new weights and calls of touch, see version.
+        self._touches = 0
+        self.normalized_version = None
+
         from ..learning import NoOp
 
         self.update_rule = kwargs.get("update_rule", NoOp)
         self.wmin = kwargs.get("wmin", -np.inf)
         self.wmax = kwargs.get("wmax", np.inf)
-        self.norm = kwargs.get("norm", None)
+
+        norm = kwargs.get("norm", None)
+        if isinstance(norm, torch.Tensor):
+            self.register_buffer("norm", norm)
+        else:
+            self.norm = norm
+
         self.decay = kwargs.get("decay", None)
         self.norm_by_max = kwargs.get("norm_by_max", False)
         self.norm_by_max_from_shadow_weights = kwargs.get(
@@ -80,6 +152,43 @@ class AbstractConnection(ABC, Module):
             **kwargs
         )
 
+    def __setattr__(self, name: str, value) -> None:
+        # language=rst
+        """
+        Counts assignments of new weights as changes of the weights.
+        """
+        super().__setattr__(name, value)
+        if name == "w":
+            self._touches = getattr(self, "_touches", 0) + 1
+
+    def __setstate__(self, state: dict) -> None:
+        # language=rst
+        """
+        Restores a pickled connection, counting the weights of connections saved without a version as unnormalized.
+        """
+        super().__setstate__(state)
+        self.__dict__.setdefault("_touches", 0)
+        self.__dict__.setdefault("normalized_version", None)
+
+    @property
+    def version(self) -> Tuple[int, Optional[int]]:
+        # language=rst
+        """
+        Identifies the state of the weights, so that unchanged weights are neither normalized again nor rehashed. It
+        changes with every in-place modification of ``w``, which torch counts, with every assignment of new weights,
+        and with every call of ``touch``.
+        """
+        w = getattr(self, "w", None)
+        return self._touches, None if w is None else w._version
+
+    def touch(self) -> None:
+        # language=rst
+        """
+        Marks the weights as changed. Only needed after modifications that torch does not count, i.e. through
+        ``w.data`` or a NumPy view of ``w``.
+        """
+        self._touches += 1
+
     @abstractmethod
     def compute(self, s: torch.Tensor) -> None:
         # language=rst
@@ -151,13 +260,18 @@ class Connection(AbstractConnection):
         :param torch.Tensor b: Target population bias.
         :param float wmin: Minimum allowed value on the connection weights.
         :param float wmax: Maximum allowed value on the connection weights.
-        :param float norm: Total weight per target neuron normalization constant.
+        :param Union[float, torch.Tensor] norm: Total weight per target neuron normalization constant, or a tensor
+            of one constant per target neuron.
         :param ByteTensor norm_by_max: Normalize the weight of a neuron by its max weight.
         :param ByteTensor norm_by_max_with_shadow_weights: Normalize the weight of a neuron by its max weight by
                                                            original weights.
+        :param float event_threshold: Source spike density below which spikes are propagated event-driven rather
+                                      than by a dense product (default ``0.1``; ``0`` to only skip steps without spikes).
         """
         super().__init__(source, target, nu, reduction, weight_decay, **kwargs)
 
+        self.event_threshold = kwargs.get("event_threshold", 0.1)
+
         w = kwargs.get("w", None)
         if w is None:
             if self.wmin == -np.inf or self.wmax == np.inf:
@@ -185,8 +299,13 @@ class Connection(AbstractConnection):
                  decaying spike activation).
         """
         # Compute multiplication of spike activations by weights and add bias.
-        size = s.float().view(s.size(0), -1).size()[1]
-        post = s.float().view(s.size(0), -1) @ self.w.view(size, size) + self.b  # EDITED
+        s = s.view(s.size(0), -1)
+        post = (
+            _propagate(
+                s, self.w.view(s.size(1), -1), getattr(self, "event_threshold", 0.1)
+            )
+            + self.b
+        )
         return post.view(s.size(0), *self.target.shape)
 
     def update(self, **kwargs) -> None:
@@ -203,9 +322,7 @@ class Connection(AbstractConnection):
         ``self.norm``.
         """
         if self.norm is not None:
-            w_abs_sum = self.w.abs().sum(0).unsqueeze(0)
-            w_abs_sum[w_abs_sum == 0] = 1.0
-            self.w *= self.norm / w_abs_sum
+            _normalize(self.w, self.norm, 0, absolute=True)
 
     def normalize_by_max(self) -> None:
         # language=rst
@@ -278,7 +395,8 @@ class Conv2dConnection(AbstractConnection):
         :param torch.Tensor b: Target population bias.
         :param float wmin: Minimum allowed value on the connection weights.
         :param float wmax: Maximum allowed value on the connection weights.
-        :param float norm: Total weight per target neuron normalization constant.
+        :param Union[float, torch.Tensor] norm: Total weight per kernel normalization constant, or a tensor of one
+            constant per filter.
         """
         super().__init__(source, target, nu, reduction, weight_decay, **kwargs)
 
@@ -365,16 +483,11 @@ class Conv2dConnection(AbstractConnection):
     def normalize(self) -> None:
         # language=rst
         """
-        Normalize weights along the first axis according to total weight per target neuron.
+        Normalize weights so each kernel (filter and input channel) has sum of connection weights equal to
+        ``self.norm``.
         """
         if self.norm is not None:
-            # get a view and modify in place
-            w = self.w.view(
-                self.w.size(0) * self.w.size(1), self.w.size(2) * self.w.size(3)
-            )
-
-            for fltr in range(w.size(0)):
-                w[fltr] *= self.norm / w[fltr].sum(0)
+            _normalize(self.w, self.norm, (2, 3))
 
     def reset_(self) -> None:
         # language=rst
@@ -497,6 +610,11 @@ class LocalConnection(AbstractConnection):
         in each post-synaptic patch, then the first ``n_conv`` neurons in the post-synaptic population correspond to the
         first receptive field, the second ``n_conv`` to the second receptive field, and so on.
 
+        Only the weights inside the receptive fields are stored: ``w`` has shape ``[n_filters, conv_prod,
+        kernel_prod]``, where ``w[f, c, k]`` connects source neuron ``locations[k, c]`` to target neuron
+        ``f * conv_prod + c``. Use ``to_dense`` and ``from_dense`` to convert from and to a ``[source.n, target.n]``
+        weight matrix.
+
         :param source: A layer of nodes from which the connection originates.
         :param target: A layer of nodes to which the connection connects.
         :param kernel_size: Horizontal and vertical size of convolutional kernels.
@@ -509,15 +627,22 @@ class LocalConnection(AbstractConnection):
         Keyword arguments:
 
         :param LearningRule update_rule: Modifies connection parameters according to some rule.
-        :param torch.Tensor w: Strengths of synapses.
+        :param torch.Tensor w: Strengths of synapses, either of shape ``[n_filters, conv_prod, kernel_prod]`` or a
+                               dense ``[source.n, target.n]`` matrix.
         :param torch.Tensor b: Target population bias.
         :param float wmin: Minimum allowed value on the connection weights.
         :param float wmax: Maximum allowed value on the connection weights.
-        :param float norm: Total weight per target neuron normalization constant.
+        :param Union[float, torch.Tensor] norm: Total weight per target neuron normalization constant, or a tensor
+            of one constant per target neuron or per filter.
         :param Tuple[int, int] input_shape: Shape of input population if it's not ``[sqrt, sqrt]``.
+        :param float event_threshold: Source spike density below which spikes are propagated event-driven rather
+                                      than by contracting every receptive field (default ``0.01``; ``0`` to only
+                                      skip steps without spikes).
         """
         super().__init__(source, target, nu, reduction, weight_decay, **kwargs)
 
+        self.event_threshold = kwargs.get("event_threshold", 0.01)
+
         kernel_size = _pair(kernel_size)
         stride = _pair(stride)
 
@@ -547,45 +672,33 @@ class LocalConnection(AbstractConnection):
             target.n == n_filters * conv_prod
         ), "Target layer size must be n_filters * (kernel_size ** 2)."
 
-        locations = torch.zeros(
-            kernel_size[0], kernel_size[1], conv_size[0], conv_size[1]
-        ).long()
-        for c1 in range(conv_size[0]):
-            for c2 in range(conv_size[1]):
-                for k1 in range(kernel_size[0]):
-                    for k2 in range(kernel_size[1]):
-                        location = (
-                            c1 * stride[0] * shape[1]
-                            + c2 * stride[1]
-                            + k1 * shape[0]
-                            + k2
-                        )
-                        locations[k1, k2, c1, c2] = location
+        # Source index of kernel position (k1, k2) of the receptive field at (c1, c2), [k1, k2, c1, c2].
+        locations = (
+            torch.arange(conv_size[0]).view(1, 1, -1, 1) * stride[0] * shape[1]
+            + torch.arange(conv_size[1]).view(1, 1, 1, -1) * stride[1]
+            + torch.arange(kernel_size[0]).view(-1, 1, 1, 1) * shape[0]
+            + torch.arange(kernel_size[1]).view(1, -1, 1, 1)
+        )
 
         self.register_buffer("locations", locations.view(kernel_prod, conv_prod))
         w = kwargs.get("w", None)
 
         if w is None:
-            w = torch.zeros(source.n, target.n)
-            for f in range(n_filters):
-                for c in range(conv_prod):
-                    for k in range(kernel_prod):
-                        if self.wmin == -np.inf or self.wmax == np.inf:
-                            w[self.locations[k, c], f * conv_prod + c] = np.clip(
-                                np.random.rand(), self.wmin, self.wmax
-                            )
-                        else:
-                            w[
-                                self.locations[k, c], f * conv_prod + c
-                            ] = self.wmin + np.random.rand() * (self.wmax - self.wmin)
+            # Same draws as filling the receptive fields filter by filter, patch by patch.
+            w = torch.from_numpy(np.random.rand(n_filters, conv_prod, kernel_prod)).float()
+            if self.wmin == -np.inf or self.wmax == np.inf:
+                w = torch.clamp(w, self.wmin, self.wmax)
+            else:
+                w = self.wmin + w * (self.wmax - self.wmin)
         else:
+            if w.dim() == 2:
+                w = self.from_dense(w)
+
             if self.wmin != -np.inf or self.wmax != np.inf:
                 w = torch.clamp(w, self.wmin, self.wmax)
 
         self.w = Parameter(w, False)
 
-        self.register_buffer("mask", self.w == 0)
-
         self.b = Parameter(kwargs.get("b", torch.zeros(target.n)), False)
 
     def compute(self, s: torch.Tensor) -> torch.Tensor:
@@ -596,39 +709,311 @@ class LocalConnection(AbstractConnection):
         :param s: Incoming spikes.
         :return: Incoming spikes multiplied by synaptic weights (with or without decaying spike activation).
         """
-        # Compute multiplication of pre-activations by connection weights.
-        if self.w.shape[0] == self.source.n and self.w.shape[1] == self.target.n:
-            return s.float().view(s.size(0), -1) @ self.w + self.b
-        else:
-            a_post = (
-                s.float().view(s.size(0), -1)
-                @ self.w.view(self.source.n, self.target.n)
-                + self.b
-            )
-            return a_post.view(*self.target.shape)
+        batch_size = s.size(0)
+        n_active = int(s.count_nonzero())
+        if n_active == 0:
+            return self.b.expand(batch_size, -1).clone()
+
+        if n_active < getattr(self, "event_threshold", 0.01) * s.numel():
+            return self._compute_events(s)
+
+        # Unfold the receptive fields of the input, [conv_prod, batch_size, kernel_prod].
+        patches = (
+            s.view(batch_size, -1)
+            .index_select(1, self.locations.t().reshape(-1))
+            .to(self.w.dtype)
+            .view(batch_size, *self.w.shape[1:])
+            .transpose(0, 1)
+        )
+
+        # Contract each receptive field with its filters, [conv_prod, batch_size, n_filters].
+        a_post = torch.bmm(patches, self.w.permute(1, 2, 0))
+        return a_post.permute(1, 2, 0).reshape(batch_size, -1) + self.b
+
+    def _compute_events(self, s: torch.Tensor) -> torch.Tensor:
+        # language=rst
+        """
+        Compute pre-activations event-driven: the weights of the receptive field entries of every spiking source
+        neuron are gathered and summed into their target neurons.
+
+        :param s: Incoming spikes.
+        :return: Incoming spikes multiplied by synaptic weights.
+        """
+        batch_size = s.size(0)
+        n_filters, conv_prod, kernel_prod = self.w.shape
+        order, offsets, counts = self._source_fields()
+
+        s = s.view(batch_size, -1)
+        batch, source = s.nonzero().unbind(1)
+
+        # Receptive field entries c * kernel_prod + k of every spike.
+        n_fields = counts[source]
+        spike = torch.arange(source.size(0), device=s.device).repeat_interleave(n_fields)
+        first = torch.cumsum(n_fields, 0) - n_fields
+        position = torch.arange(spike.size(0), device=s.device) - first[spike]
+        fields = order[offsets[source][spike] + position]
+
+        rows = self.w.view(n_filters, -1)[:, fields].t()
+        if s.dtype != torch.bool:
+            rows = rows * s[batch, source].to(self.w.dtype)[spike].unsqueeze(1)
+
+        # Sum into [batch_size * conv_prod, n_filters], i.e. per sample and receptive field.
+        targets = batch[spike] * conv_prod + fields // kernel_prod
+        a_post = self.w.new_zeros(batch_size * conv_prod, n_filters).index_add_(
+            0, targets, rows
+        )
+        return (
+            a_post.view(batch_size, conv_prod, n_filters)
+            .transpose(1, 2)
+            .reshape(batch_size, -1)
+            + self.b
+        )
+
+    def _source_fields(self) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        # language=rst
+        """
+        Returns the receptive field entries of the source neurons: the flat indices ``c * kernel_prod + k`` of the
+        weights ``w[:, c, k]`` ordered by source neuron, and the offset and number of the entries of every source
+        neuron in that order. Computed once per device.
+        """
+        fields = getattr(self, "_fields", None)
+        if fields is None or fields[0].device != self.locations.device:
+            sources = self.locations.t().reshape(-1)
+            counts = torch.bincount(sources, minlength=self.source.n)
+            fields = (torch.argsort(sources), torch.cumsum(counts, 0) - counts, counts)
+            self._fields = fields
+
+        return fields
 
     def update(self, **kwargs) -> None:
         # language=rst
         """
         Compute connection's update rule.
+        """
+        super().update(**kwargs)
+
+    def normalize(self) -> None:
+        # language=rst
+        """
+        Normalize weights so each target neuron has sum of connection weights equal to ``self.norm``.
+        """
+        if self.norm is not None:
+            _normalize(self.w, self.norm, 2)
+
+    def _dense_indices(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        # language=rst
+        """
+        Returns the source and target neuron indices of all locally connected weights, each of shape
+        ``[n_filters, conv_prod, kernel_prod]``.
+        """
+        conv_prod, kernel_prod = self.locations.t().shape
+        shape = (self.n_filters, conv_prod, kernel_prod)
+        rows = self.locations.t().expand(*shape)
+        cols = (
+            torch.arange(self.n_filters, device=self.locations.device).view(-1, 1, 1)
+            * conv_prod
+            + torch.arange(conv_prod, device=self.locations.device).view(1, -1, 1)
+        ).expand(*shape)
+        return rows, cols
+
+    def to_dense(self, w: Optional[torch.Tensor] = None) -> torch.Tensor:
+        # language=rst
+        """
+        Converts locally connected weights to a dense weight matrix.
+
+        :param w: Weights of shape ``[n_filters, conv_prod, kernel_prod]``. Defaults to ``self.w``.
+        :return: Weight matrix of shape ``[source.n, target.n]``, zero outside of the receptive fields.
+        """
+        if w is None:
+            w = self.w
+
+        rows, cols = self._dense_indices()
+        dense = w.new_zeros(self.source.n, self.target.n)
+        dense[rows, cols] = w
+        return dense
+
+    def from_dense(self, w: torch.Tensor) -> torch.Tensor:
+        # language=rst
+        """
+        Extracts the receptive field weights of a dense weight matrix.
+
+        :param w: Weight matrix of shape ``[source.n, target.n]``.
+        :return: Weights of shape ``[n_filters, conv_prod, kernel_prod]``.
+        """
+        rows, cols = self._dense_indices()
+        return w.view(self.source.n, self.target.n)[rows, cols]
+
+    def __setstate__(self, state: dict) -> None:
+        # language=rst
+        """
+        Restores a pickled connection, converting dense weights of connections saved before the compact layout.
+        """
+        super().__setstate__(state)
+
+        if self.w.dim() == 2:
+            self.w = Parameter(self.from_dense(self.w), False)
+            self._buffers.pop("mask", None)
+
+            # The pickled learning rule is still bound to its dense update.
+            update = getattr(self.update_rule, "_local_connection_update", None)
+            if update is not None:
+                self.update_rule.update = update
+
+    def reset_(self) -> None:
+        # language=rst
+        """
+        Contains resetting logic for the connection.
+        """
+        super().reset_()
+
+
+class CompetitionConnection(AbstractConnection):
+    # language=rst
+    """
+    Specifies recurrent connections between the filters of a locally connected population that share a location.
+    """
+
+    def __init__(
+        self,
+        source: Nodes,
+        target: Nodes,
+        n_filters: int,
+        nu: Optional[Union[float, Sequence[float]]] = None,
+        reduction: Optional[callable] = None,
+        weight_decay: float = 0.0,
+        **kwargs
+    ) -> None:
+        # language=rst
+        """
+        Instantiates a ``CompetitionConnection`` object.
+
+        Both populations are ordered like the targets of a ``LocalConnection``: neuron ``f * n_locations + c`` belongs
+        to filter ``f`` at location ``c``. Only connections between different filters at the same location are
+        stored: ``w`` has shape ``[n_locations, n_filters, n_filters]``, where ``w[c, f1, f2]`` connects source neuron
+        ``f1 * n_locations + c`` to target neuron ``f2 * n_locations + c``, and its diagonals are kept at zero.
+
+        :param source: A layer of nodes from which the connection originates.
+        :param target: A layer of nodes to which the connection connects.
+        :param n_filters: Number of filters per location.
+        :param nu: Learning rate for both pre- and post-synaptic events.
+        :param reduction: Method for reducing parameter updates along the minibatch dimension.
+        :param weight_decay: Constant multiple to decay weights by on each iteration.
 
         Keyword arguments:
 
-        :param ByteTensor mask: Boolean mask determining which weights to clamp to zero.
+        :param LearningRule update_rule: Modifies connection parameters according to some rule.
+        :param torch.Tensor w: Strengths of synapses, either of shape ``[n_locations, n_filters, n_filters]`` or a
+                               dense ``[source.n, target.n]`` matrix.
+        :param torch.Tensor b: Target population bias.
+        :param float wmin: Minimum allowed value on the connection weights.
+        :param float wmax: Maximum allowed value on the connection weights.
+        :param float norm: Total weight per target neuron normalization constant.
         """
-        if kwargs["mask"] is None:
-            kwargs["mask"] = self.mask
+        super().__init__(source, target, nu, reduction, weight_decay, **kwargs)
+
+        assert (
+            source.n == target.n and source.n % n_filters == 0
+        ), "Source and target layer sizes must both be n_filters * n_locations."
+
+        self.n_filters = n_filters
+        self.n_locations = source.n // n_filters
 
+        w = kwargs.get("w", None)
+        if w is None:
+            shape = (self.n_locations, n_filters, n_filters)
+            if self.wmin == -np.inf or self.wmax == np.inf:
+                w = torch.clamp(torch.rand(*shape), self.wmin, self.wmax)
+            else:
+                w = self.wmin + torch.rand(*shape) * (self.wmax - self.wmin)
+        else:
+            if w.dim() != 3:
+                w = self.from_dense(w)
+
+            if self.wmin != -np.inf or self.wmax != np.inf:
+                w = torch.clamp(w, self.wmin, self.wmax)
+
+        self.w = Parameter(w, False)
+        self.w.diagonal(dim1=1, dim2=2).fill_(0)
+
+        self.b = Parameter(kwargs.get("b", torch.zeros(target.n)), False)
+
+    def compute(self, s: torch.Tensor) -> torch.Tensor:
+        # language=rst
+        """
+        Compute pre-activations given spikes using connection weights.
+
+        :param s: Incoming spikes.
+        :return: Incoming spikes multiplied by synaptic weights (with or without decaying spike activation).
+        """
+        batch_size = s.size(0)
+        if not s.any():
+            return self.b.expand(batch_size, -1).clone()
+
+        # Spikes of each location, [n_locations, batch_size, n_filters].
+        s = s.view(batch_size, self.n_filters, self.n_locations).permute(2, 0, 1)
+
+        a_post = torch.bmm(s.to(self.w.dtype), self.w)
+        return a_post.permute(1, 2, 0).reshape(batch_size, -1) + self.b
+
+    def update(self, **kwargs) -> None:
+        # language=rst
+        """
+        Compute connection's update rule.
+        """
         super().update(**kwargs)
 
+        if kwargs.get("learning", True):
+            self.w.diagonal(dim1=1, dim2=2).fill_(0)
+
     def normalize(self) -> None:
         # language=rst
         """
         Normalize weights so each target neuron has sum of connection weights equal to ``self.norm``.
         """
         if self.norm is not None:
-            w = self.w.view(self.source.n, self.target.n)
-            w *= self.norm / self.w.sum(0).view(1, -1)
+            _normalize(self.w, self.norm, 1, absolute=True)
+
+    def _dense_indices(self, device: torch.device) -> Tuple[torch.Tensor, torch.Tensor]:
+        # language=rst
+        """
+        Returns the source and target neuron indices of all stored weights, each of shape
+        ``[n_locations, n_filters, n_filters]``.
+
+        :param device: Device to create the indices on.
+        """
+        neurons = torch.arange(self.n_filters, device=device).view(
+            1, -1
+        ) * self.n_locations + torch.arange(self.n_locations, device=device).view(-1, 1)
+        shape = (self.n_locations, self.n_filters, self.n_filters)
+        return neurons.unsqueeze(2).expand(*shape), neurons.unsqueeze(1).expand(*shape)
+
+    def to_dense(self, w: Optional[torch.Tensor] = None) -> torch.Tensor:
+        # language=rst
+        """
+        Converts the connection weights to a dense weight matrix.
+
+        :param w: Weights of shape ``[n_locations, n_filters, n_filters]``. Defaults to ``self.w``.
+        :return: Weight matrix of shape ``[source.n, target.n]``, zero between different locations.
+        """
+        if w is None:
+            w = self.w
+
+        rows, cols = self._dense_indices(w.device)
+        dense = w.new_zeros(self.source.n, self.target.n)
+        dense[rows, cols] = w
+        return dense
+
+    def from_dense(self, w: torch.Tensor) -> torch.Tensor:
+        # language=rst
+        """
+        Extracts the weights between filters at the same location from a dense weight matrix.
+
+        :param w: Weight matrix with ``source.n * target.n`` elements, e.g. of shape ``[source.n, target.n]`` or
+                  ``[n_filters, *conv_size, n_filters, *conv_size]``.
+        :return: Weights of shape ``[n_locations, n_filters, n_filters]``.
+        """
+        rows, cols = self._dense_indices(w.device)
+        return w.reshape(self.source.n, self.target.n)[rows, cols]
 
     def reset_(self) -> None:
         # language=rst
@@ -743,8 +1128,10 @@ class SparseConnection(AbstractConnection):
 
         Keyword arguments:
 
-        :param torch.Tensor w: Strengths of synapses.
-        :param float sparsity: Fraction of sparse connections to use.
+        :param torch.Tensor w: Strengths of synapses, of shape ``(source.n, target.n)``. A dense tensor is converted
+            to the sparse format, its non-zero entries being the synapses.
+        :param float sparsity: Fraction of the ``source.n * target.n`` possible synapses to leave out; the synapses
+            are drawn at random.
         :param LearningRule update_rule: Modifies connection parameters according to some rule.
         :param float wmin: Minimum allowed value on the connection weights.
         :param float wmax: Maximum allowed value on the connection weights.
@@ -762,27 +1149,74 @@ class SparseConnection(AbstractConnection):
             and self.sparsity is not None
         ), 'Only one of "weights" or "sparsity" must be specified'
 
-        self.w = Parameter(w, False)
+        # The weights are a coalesced COO tensor whose sparsity pattern is fixed here; learning rules only modify
+        # its values in place.
+        if w is None:
+            indices = (torch.rand(source.n, target.n) >= self.sparsity).nonzero().t()
+            if self.wmin == -np.inf or self.wmax == np.inf:
+                values = torch.clamp(torch.rand(indices.size(1)), self.wmin, self.wmax)
+            else:
+                values = self.wmin + torch.rand(indices.size(1)) * (self.wmax - self.wmin)
+
+            w = torch.sparse_coo_tensor(indices, values, (source.n, target.n))
+        else:
+            if not w.is_sparse:
+                w = w.reshape(source.n, target.n).to_sparse()
+
+            w = w.coalesce()
+            if self.wmin != -np.inf or self.wmax != np.inf:
+                w._values().clamp_(self.wmin, self.wmax)
+
+        self.w = Parameter(w.coalesce(), False)
 
     def compute(self, s: torch.Tensor) -> torch.Tensor:
         # language=rst
         """
-        Compute convolutional pre-activations given spikes using layer weights.
+        Compute pre-activations given spikes using the sparse connection weights.
 
         :param s: Incoming spikes.
         :return: Incoming spikes multiplied by synaptic weights (with or without decaying spike activation).
         """
-        size = s.float().view(s.size(0), -1).size()[1]
-        post = s.float().view(s.size(0), -1) @ self.w.view(size, size)
-        return post.view(s.size(0), *self.target.shape)  # TODO: Use scipy sparse
+        post = torch.sparse.mm(
+            self._transposed_weights(), s.float().view(s.size(0), -1).t()
+        ).t()
+        return post.view(s.size(0), *self.target.shape)
+
+    def _transposed_weights(self) -> torch.Tensor:
+        # language=rst
+        """
+        Returns the transposed weights in CSR format, which multiplies the incoming spikes much faster than the COO
+        weights. The copy is rebuilt only when ``version`` changes or the weights move to another device.
+        """
+        cached = getattr(self, "_w_t", None)
+        version = self.version
+        if cached is None or cached[0] != version or cached[1].device != self.w.device:
+            cached = self._w_t = (version, self.w.detach().t().to_sparse_csr())
+
+        return cached[1]
 
     def update(self, **kwargs) -> None:
         # language=rst
         """
-        Compute connection's update rule.
+        Compute connection's update rule. A ``mask`` zeroes the masked synapses without changing the sparsity
+        pattern.
         """
+        mask = kwargs.pop("mask", None)
         super().update(**kwargs)
 
+        if mask is not None:
+            rows, cols = self.w._indices()
+            self.w._values().masked_fill_(mask.view(self.source.n, self.target.n)[rows, cols], 0)
+
+    def __setstate__(self, state: dict) -> None:
+        # language=rst
+        """
+        Restores a pickled connection without its copy of the transposed weights, whose version cannot be compared
+        with the counters of the restored weights.
+        """
+        state.pop("_w_t", None)
+        super().__setstate__(state)
+
     def normalize(self) -> None:
         # language=rst
         """
@@ -122,11 +122,12 @@ def reshape_locally_connected_weights(
     """
     Get the weights from a locally connected layer and reshape them to be two-dimensional and square.
 
-    :param w: Weights from a locally connected layer.
+    :param w: Weights from a locally connected layer, of shape ``[n_filters, conv_prod, kernel_prod]``.
     :param n_filters: No. of neuron filters.
     :param kernel_size: Side length(s) of convolutional kernel.
     :param conv_size: Side length(s) of convolution population.
-    :param locations: Binary mask indicating receptive fields of convolution population neurons.
+    :param locations: Indices of input receptive fields for convolution population neurons (not needed to reshape
+                      weights of shape ``[n_filters, conv_prod, kernel_prod]``).
     :param input_sqrt: Sides length(s) of input neurons.
     :return: Locally connected weights reshaped as a collection of spatially ordered square grids.
     """
@@ -137,22 +138,10 @@ def reshape_locally_connected_weights(
     k1, k2 = kernel_size
     c1, c2 = conv_size
     i1, i2 = input_sqrt
-    c1sqrt, c2sqrt = int(math.ceil(math.sqrt(c1))), int(math.ceil(math.sqrt(c2)))
     fs = int(math.ceil(math.sqrt(n_filters)))
 
-    w_ = torch.zeros((n_filters * k1, k2 * c1 * c2))
-
-    for n1 in range(c1):
-        for n2 in range(c2):
-            for feature in range(n_filters):
-                n = n1 * c2 + n2
-                filter_ = w[
-                    locations[:, n],
-                    feature * (c1 * c2) + (n // c2sqrt) * c2sqrt + (n % c2sqrt),
-                ].view(k1, k2)
-                w_[feature * k1 : (feature + 1) * k1, n * k2 : (n + 1) * k2] = filter_
-
     if c1 == 1 and c2 == 1:
+        w_ = w.view(n_filters * k1, k2)
         square = torch.zeros((i1 * fs, i2 * fs))
 
         for n in range(n_filters):
@@ -163,22 +152,15 @@ def reshape_locally_connected_weights(
 
         return square
     else:
-        square = torch.zeros((k1 * fs * c1, k2 * fs * c2))
-
-        for n1 in range(c1):
-            for n2 in range(c2):
-                for f1 in range(fs):
-                    for f2 in range(fs):
-                        if f1 * fs + f2 < n_filters:
-                            square[
-                                k1 * (n1 * fs + f1) : k1 * (n1 * fs + f1 + 1),
-                                k2 * (n2 * fs + f2) : k2 * (n2 * fs + f2 + 1),
-                            ] = w_[
-                                (f1 * fs + f2) * k1 : (f1 * fs + f2 + 1) * k1,
-                                (n1 * c2 + n2) * k2 : (n1 * c2 + n2 + 1) * k2,
-                            ]
-
-        return square
+        # Filters of each receptive field on an fs x fs grid, receptive fields on a c1 x c2 grid.
+        square = torch.zeros((fs * fs, c1, c2, k1, k2))
+        square[:n_filters] = w.view(n_filters, c1, c2, k1, k2)
+
+        return (
+            square.view(fs, fs, c1, c2, k1, k2)
+            .permute(2, 0, 4, 3, 1, 5)
+            .reshape(k1 * fs * c1, k2 * fs * c2)
+        )
 
 
 def reshape_conv2d_weights(weights: torch.Tensor) -> torch.Tensor:
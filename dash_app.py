@@ -7,11 +7,9 @@ import dash_table
 import dash_core_components as dcc
 import dash_html_components as html
 import torch
-from torchvision.transforms import transforms
 from tqdm import tqdm
 
-from bindsnet.datasets import MNIST
-from bindsnet.encoding import PoissonEncoder
+from bindsnet.datasets import PrefetchLoader
 from thesis.utils import view_database, load_network
 from thesis.nets import LC_SNN
 from dash.dependencies import Input, Output, State
@@ -39,31 +37,20 @@ competition_hist = go.Figure(go.Histogram()).update_layout(height=600, width=600
 class LC_SNN_app(LC_SNN):
     def train(self, n_iter=100., vis_interval=10.):
         global training
-        train_dataset = MNIST(
-            PoissonEncoder(time=self.time_max, dt=self.dt),
-            None,
-            ".//MNIST",
-            download=False,
-            train=True,
-            transform=transforms.Compose([
-                transforms.CenterCrop(self.crop),
-                transforms.ToTensor(),
-                transforms.Lambda(lambda x: x * self.intensity)
-                ])
-            )
+        train_dataset = self.mnist_dataset('full_train')
         self.n_iter_state = 0
         if n_iter is None:
             n_iter = self.n_iter
         self.network.train(True)
         print('Training network...')
-        train_dataloader = torch.utils.data.DataLoader(
+        train_dataloader = PrefetchLoader(
             train_dataset, batch_size=1, shuffle=True)
         cnt = 0
         global total_iterations
         total_iterations = n_iter
         global sum_iterations
         t_start = t()
-        for i, batch in tqdm(list(zip(range(n_iter), train_dataloader)), ncols=100):
+        for i, (inpts, _) in tqdm(zip(range(n_iter), train_dataloader), total=n_iter, ncols=100):
             if training:
                 global current_iteration
                 current_iteration = i + 1
@@ -75,13 +62,9 @@ class LC_SNN_app(LC_SNN):
                 time_from_start = str(datetime.timedelta(seconds=(int(t_now - t_start))))
                 speed = (i + 1) / (t_now - t_start)
                 time_left = str(datetime.timedelta(seconds=int((n_iter - i) / speed)))
-                inpts = {"X": batch["encoded_image"].transpose(0, 1)}
                 self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
 
-                self._spikes = {
-                    "X": self.spikes["X"].get("s").view(self.time_max, -1),
-                    "Y": self.spikes["Y"].get("s").view(self.time_max, -1),
-                    }
+                self._record_spikes()
 
                 if (t_now - t_start) / vis_interval > cnt:
                     global weights_XY
@@ -1,14 +1,36 @@
-from thesis.nets import C_SNN
+from thesis.jobs import JobQueue
 import numpy as np
 import torch
 
-accs = torch.zeros(np.arange(-200., 0., 10.).shape[0], np.arange(1, 101, 10).shape[0])
-for i, c_w in enumerate(np.arange(-200., 0., 10.)):
-    for j, norm in enumerate(np.arange(1, 101, 10)):
-        net = C_SNN(c_w=c_w, norm=norm, n_iter=10000)
-        net.train(10000)
-        net.calibrate(10000)
-        net.calculate_accuracy(1000)
-        net.save()
-        accs[i, j] = net.accuracy
-torch.save(accs, 'accs')
\ No newline at end of file
+# C_SNN sets the norm of the XY weights to mean_weight * kernel_size ** 2
+kernel_size = 12
+c_ws = np.arange(-200., 0., 10.)
+norms = np.arange(1, 101, 10)
+
+if __name__ == '__main__':
+    queue = JobQueue()
+    grid = {}
+    for i, c_w in enumerate(c_ws):
+        for j, norm in enumerate(norms):
+            job = {
+                'type': 'C_SNN',
+                'parameters': {'c_w': float(c_w), 'mean_weight': float(norm) / kernel_size ** 2,
+                               'kernel_size': kernel_size, 'n_iter': 10000},
+                'n_train': 10000,
+                'n_calibrate': 10000,
+                'n_test': 1000,
+                }
+            grid[queue.enqueue(job)] = (i, j)
+
+    # Results are stored as they arrive, so that an interrupted search resumes from the missing points
+    accs = torch.full((c_ws.shape[0], norms.shape[0]), float('nan'))
+    for job in queue.run():
+        if job['id'] not in grid:
+            continue
+        i, j = grid[job['id']]
+        if job['status'] == 'done':
+            accs[i, j] = job['result']['accuracy']
+            print(f'c_w={c_ws[i]}, norm={norms[j]}: accuracy {job["result"]["accuracy"]}')
+        else:
+            print(f'c_w={c_ws[i]}, norm={norms[j]} failed:\n{job["error"]}')
+        torch.save(accs, 'accs')
@@ -0,0 +1,43 @@
+import torch
+
+from bindsnet.datasets import PrefetchLoader
+
+
+class Samples(torch.utils.data.Dataset):
+    def __getitem__(self, index):
+        return {"encoded_image": torch.full((4, 1, 2), index), "label": index}
+
+    def __len__(self):
+        return 6
+
+
+class TestPrefetchLoader:
+    """
+    Tests the loader of network inputs.
+    """
+
+    def test_default_workers(self, monkeypatch):
+        # Workers by default, one less than the CPUs up to two.
+        for cpus, expected in [(1, 0), (2, 1), (8, 2), (None, 0)]:
+            monkeypatch.setattr("os.cpu_count", lambda: cpus)
+            loader = PrefetchLoader(Samples())
+            assert loader.num_workers == expected
+            if expected:
+                assert loader.prefetch_factor == 2 and loader.persistent_workers
+
+        # Loading in the main process is opted into.
+        monkeypatch.setattr(PrefetchLoader, "default_num_workers", 0)
+        loader = PrefetchLoader(Samples())
+        assert loader.num_workers == 0 and not loader.persistent_workers
+        assert PrefetchLoader(Samples(), num_workers=2).num_workers == 2
+
+    def test_inputs(self):
+        for num_workers in [0, 1]:
+            loader = PrefetchLoader(Samples(), batch_size=4, num_workers=num_workers)
+            batches = list(loader)
+            assert [batch["label"].tolist() for _, batch in batches] == [[0, 1, 2, 3], [4, 5]]
+
+            # Time comes first in the inputs of a network.
+            inpts, _ = batches[0]
+            assert inpts["X"].shape == (4, 4, 1, 2)
+            assert torch.equal(inpts["X"][0, :, 0, 0], torch.arange(4))
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import torch
+
+from bindsnet.datasets import EncodedDataset
+
+
+class RandomSpikes(torch.utils.data.Dataset):
+    """
+    Bernoulli spike trains with random labels, drawn from the global random state like an encoder.
+    """
+
+    def __init__(self, n=20, shape=(10, 1, 3, 3), delays=(0.0, 0.0)):
+        self.n = n
+        self.shape = shape
+        self.delays = delays
+
+    def __getitem__(self, index):
+        time.sleep(self.delays[0] if index == 0 else self.delays[1])
+        return {
+            "encoded_image": torch.bernoulli(0.3 * torch.ones(self.shape)).byte(),
+            "label": int(torch.randint(10, ())),
+        }
+
+    def __len__(self):
+        return self.n
+
+
+def expected(dataset, index, seed=0):
+    with torch.random.fork_rng(devices=[]):
+        torch.manual_seed(seed + index)
+        return dataset[index]
+
+
+def create(path, delays, check_after):
+    cache = EncodedDataset(RandomSpikes(delays=delays), path)
+    cache.encode()
+    time.sleep(check_after)
+    assert cache.encoded.all()
+
+
+class TestEncodedDataset:
+    """
+    Tests the on-disk cache of encoded samples.
+    """
+
+    def test_round_trip(self, tmp_path):
+        dataset = RandomSpikes()
+        cache = EncodedDataset(dataset, str(tmp_path / "cache"), seed=3)
+
+        # Samples are encoded under seed + index, whatever the access order.
+        for index in [7, 0, 19, 7]:
+            sample = cache[index]
+            reference = expected(dataset, index, seed=3)
+            assert torch.equal(sample["encoded_image"], reference["encoded_image"])
+            assert sample["label"] == reference["label"]
+
+        batch = cache[2:6]
+        assert batch["encoded_image"].shape == (4, 10, 1, 3, 3)
+        for i, index in enumerate(range(2, 6)):
+            assert torch.equal(
+                batch["encoded_image"][i],
+                expected(dataset, index, seed=3)["encoded_image"],
+            )
+
+    def test_reopen(self, tmp_path):
+        path = str(tmp_path / "cache")
+        cache = EncodedDataset(RandomSpikes(), path)
+        cache.encode(range(5))
+
+        reopened = EncodedDataset(RandomSpikes(), path)
+        assert len(reopened) == 20
+        assert reopened.encoded[:5].all() and not reopened.encoded[5:].any()
+        assert torch.equal(
+            reopened[3]["encoded_image"], expected(RandomSpikes(), 3)["encoded_image"]
+        )
+
+    def test_concurrent_creation(self, tmp_path):
+        path = str(tmp_path / "cache")
+        context = multiprocessing.get_context("fork")
+
+        # Both processes miss the cache; the first one creates and fills it, and checks its samples while the slower
+        # second one finishes creating its own copy.
+        processes = [
+            context.Process(target=create, args=(path, (0.2, 0.0), 0.8)),
+            context.Process(target=create, args=(path, (0.5, 0.05), 0.0)),
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert [process.exitcode for process in processes] == [0, 0]
+
+        # Only the cache itself is left, complete and with every sample encoded.
+        assert os.listdir(str(tmp_path)) == ["cache"]
+        cache = EncodedDataset(RandomSpikes(), path)
+        assert cache.encoded.all()
+        for index in range(20):
+            assert np.array_equal(
+                cache[index]["encoded_image"].numpy(),
+                expected(RandomSpikes(), index)["encoded_image"].numpy(),
+            )
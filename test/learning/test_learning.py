@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+import torch
+
+from bindsnet.learning import (
+    Hebbian,
+    MSTDP,
+    MSTDPET,
+    PostPre,
+    Rmax,
+    WeightDependentPostPre,
+)
+from bindsnet.network import Network
+from bindsnet.network.nodes import Input, LIFNodes, SRM0Nodes
+from bindsnet.network.topology import Connection, LocalConnection
+
+# MSTDPET and R-max only support a batch size of 1.
+rules = [
+    (PostPre, LIFNodes, {}, 2),
+    (WeightDependentPostPre, LIFNodes, {}, 2),
+    (Hebbian, LIFNodes, {}, 2),
+    (MSTDP, LIFNodes, {"reward": 1.0}, 2),
+    (MSTDPET, LIFNodes, {"reward": 1.0}, 1),
+    (Rmax, SRM0Nodes, {"reward": 1.0}, 1),
+]
+
+
+def networks(rule, target_type, batch_size):
+    """
+    Builds a network with a ``LocalConnection`` learning with ``rule``, and the same network with the equivalent dense
+    ``Connection``.
+    """
+    np.random.seed(0)
+    torch.manual_seed(0)
+
+    local_network, dense_network = Network(), Network()
+    for network in (local_network, dense_network):
+        network.add_layer(
+            Input(n=64, traces=True, traces_additive=rule is Rmax), name="X"
+        )
+        network.add_layer(target_type(n=3 * 9, traces=True, thresh=-63.0), name="Y")
+
+    local = LocalConnection(
+        local_network.layers["X"],
+        local_network.layers["Y"],
+        kernel_size=4,
+        stride=2,
+        n_filters=3,
+        update_rule=rule,
+        nu=(1e-2, 1e-2),
+        wmin=0.0,
+        wmax=1.0,
+    )
+    dense = Connection(
+        dense_network.layers["X"],
+        dense_network.layers["Y"],
+        w=local.to_dense(),
+        update_rule=rule,
+        nu=(1e-2, 1e-2),
+        wmin=0.0,
+        wmax=1.0,
+    )
+    local_network.add_connection(local, source="X", target="Y")
+    dense_network.add_connection(dense, source="X", target="Y")
+
+    # Weights outside of the receptive fields stay zero.
+    mask = local.to_dense(torch.ones_like(local.w)) == 0
+
+    spikes = torch.bernoulli(0.3 * torch.ones(20, batch_size, 64)).byte()
+    return local_network, dense_network, mask, spikes
+
+
+class TestLocalConnectionLearning:
+    """
+    Tests learning rules on locally connected weights against dense weights masked to the receptive fields.
+    """
+
+    @pytest.mark.parametrize("rule, target_type, kwargs, max_batch_size", rules)
+    def test_rule(self, rule, target_type, kwargs, max_batch_size):
+        for batch_size in range(1, max_batch_size + 1):
+            self.check_rule(rule, target_type, kwargs, batch_size)
+
+    @pytest.mark.parametrize("rule", [PostPre, WeightDependentPostPre, Hebbian, MSTDP])
+    def test_reduction(self, rule):
+        # Non-linear reductions reduce the outer products of every receptive field.
+        def reduction(x, dim):
+            return x.max(dim=dim).values
+
+        kwargs = {"reward": 1.0} if rule is MSTDP else {}
+        self.check_rule(rule, LIFNodes, kwargs, 3, reduction)
+
+    @pytest.mark.parametrize("rule, target_type, kwargs, max_batch_size", rules)
+    def test_compact(self, rule, target_type, kwargs, max_batch_size, monkeypatch):
+        """
+        The weights of a ``LocalConnection`` are learned without building the dense weight matrix.
+        """
+        local_network, _, _, spikes = networks(rule, target_type, max_batch_size)
+
+        def to_dense(*args, **kwargs):
+            raise AssertionError("Dense weights built during learning.")
+
+        monkeypatch.setattr(LocalConnection, "to_dense", to_dense)
+        monkeypatch.setattr(LocalConnection, "from_dense", to_dense)
+        local_network.run(inpts={"X": spikes}, time=20, **kwargs)
+
+    def check_rule(self, rule, target_type, kwargs, batch_size, reduction=None):
+        local_network, dense_network, mask, spikes = networks(
+            rule, target_type, batch_size
+        )
+        local = local_network.connections[("X", "Y")]
+        dense = dense_network.connections[("X", "Y")]
+        if reduction is not None:
+            local.update_rule.reduction = dense.update_rule.reduction = reduction
+        w = local.w.clone()
+
+        for _ in range(3):
+            # Both networks draw the same random numbers, e.g. for stochastic nodes.
+            torch.manual_seed(1)
+            local_network.run(inpts={"X": spikes.clone()}, time=20, **kwargs)
+            torch.manual_seed(1)
+            dense_network.run(
+                inpts={"X": spikes.clone()},
+                time=20,
+                masks={("X", "Y"): mask},
+                **kwargs
+            )
+
+        assert not torch.equal(local.w, w)
+        assert torch.allclose(local.to_dense(), dense.w, atol=1e-5)
+
+    @pytest.mark.parametrize("batch_size", [1, 2, 5])
+    @pytest.mark.parametrize("reduction", [torch.sum, torch.mean])
+    def test_restricted_post_pre(self, batch_size, reduction):
+        """
+        The restricted ``PostPre`` update of ``LocalConnection`` matches the update of all receptive fields, computed
+        from full outer products by an equivalent non-linear reduction, bit for bit.
+        """
+        weights = []
+        for r in (reduction, lambda x, dim: reduction(x, dim=dim)):
+            local_network, _, _, spikes = networks(PostPre, LIFNodes, batch_size)
+            local = local_network.connections[("X", "Y")]
+            local.update_rule.reduction = r
+            for _ in range(3):
+                local_network.run(inpts={"X": spikes.clone()}, time=20)
+            weights.append(local.w)
+
+        assert torch.equal(weights[0], weights[1])
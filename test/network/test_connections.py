@@ -0,0 +1,336 @@
+import numpy as np
+import pytest
+import torch
+
+from bindsnet.learning import PostPre
+from bindsnet.network import Network
+from bindsnet.network.nodes import Input, LIFNodes
+from bindsnet.network.topology import (
+    CompetitionConnection,
+    Connection,
+    Conv2dConnection,
+    LocalConnection,
+    SparseConnection,
+)
+
+
+class TestConnection:
+    """
+    Tests event-driven propagation of sparse spikes through ``Connection``.
+    """
+
+    @pytest.mark.parametrize("batch_size", [1, 3])
+    @pytest.mark.parametrize("dtype", [torch.bool, torch.float])
+    @pytest.mark.parametrize("density", [0.0, 0.01, 0.05, 0.5])
+    def test_compute(self, batch_size, dtype, density):
+        torch.manual_seed(0)
+        connection = Connection(Input(n=200), LIFNodes(n=30), b=torch.rand(30))
+        s = torch.rand(batch_size, 200) < density
+        if dtype == torch.float:
+            # Graded inputs are weighted by their values.
+            s = s * torch.rand(batch_size, 200)
+        expected = s.float() @ connection.w + connection.b
+
+        for event_threshold in (0.0, 1.0):
+            connection.event_threshold = event_threshold
+            assert torch.allclose(connection.compute(s), expected, atol=1e-5)
+
+    def test_single_spike(self):
+        torch.manual_seed(0)
+        connection = Connection(Input(n=200), LIFNodes(n=30), b=torch.rand(30))
+        s = torch.zeros(2, 200, dtype=torch.bool)
+        s[1, 17] = True
+
+        # Only the weights of the spiking neuron are gathered, without rounding.
+        post = connection.compute(s)
+        assert torch.equal(post[0], connection.b)
+        assert torch.equal(post[1], connection.w[17] + connection.b)
+
+
+def local_connection(side=12, kernel_size=4, stride=2, n_filters=3, **kwargs):
+    np.random.seed(0)
+    conv_prod = ((side - kernel_size) // stride + 1) ** 2
+    return LocalConnection(
+        Input(n=side * side),
+        LIFNodes(n=n_filters * conv_prod),
+        kernel_size=kernel_size,
+        stride=stride,
+        n_filters=n_filters,
+        **kwargs
+    )
+
+
+class TestLocalConnection:
+    """
+    Tests the compact receptive-field layout of ``LocalConnection``.
+    """
+
+    def test_dense_round_trip(self):
+        connection = local_connection()
+        dense = connection.to_dense()
+        assert dense.shape == (144, 75)
+        assert torch.equal(connection.from_dense(dense), connection.w)
+
+        # Every target neuron sees exactly one kernel of source neurons.
+        assert torch.equal((dense != 0).sum(0), torch.full((75,), 16))
+
+    @pytest.mark.parametrize("batch_size", [1, 3])
+    @pytest.mark.parametrize("dtype", [torch.bool, torch.float])
+    @pytest.mark.parametrize("density", [0.0, 0.005, 0.05, 0.5])
+    def test_compute(self, batch_size, dtype, density):
+        connection = local_connection(b=torch.rand(75))
+        torch.manual_seed(0)
+        s = (torch.rand(batch_size, 144) < density).to(dtype)
+        expected = s.float() @ connection.to_dense() + connection.b
+
+        # Contraction of the receptive fields and event-driven propagation.
+        for event_threshold in (0.0, 1.0):
+            connection.event_threshold = event_threshold
+            assert torch.allclose(connection.compute(s), expected, atol=1e-5)
+
+    def test_single_spike(self):
+        connection = local_connection(b=torch.rand(75))
+        s = torch.zeros(2, 144, dtype=torch.bool)
+        s[1, 40] = True
+
+        # The weights of the spiking neuron are gathered from the compact layout without rounding.
+        post = connection.compute(s)
+        assert torch.equal(post[0], connection.b)
+        assert torch.equal(post[1], connection.to_dense()[40] + connection.b)
+
+
+def competition_networks(**kwargs):
+    torch.manual_seed(0)
+    w = torch.rand(6, 4, 4) - 0.5
+    networks = []
+    for dense in (False, True):
+        network = Network()
+        network.add_layer(Input(n=24, traces=True), name="X")
+        network.add_layer(LIFNodes(n=24, traces=True, thresh=-64.0), name="Y")
+        source, target = network.layers["X"], network.layers["Y"]
+        connection = CompetitionConnection(source, target, n_filters=4, w=w.clone(), **kwargs)
+        if dense:
+            connection = Connection(source, target, w=connection.to_dense(), **kwargs)
+        network.add_connection(connection, source="X", target="Y")
+        networks.append(network)
+    return networks
+
+
+class TestCompetitionConnection:
+    """
+    Tests ``CompetitionConnection`` against a dense ``Connection`` with the same synapses.
+    """
+
+    def test_dense_round_trip(self):
+        connection = competition_networks()[0].connections[("X", "Y")]
+        dense = connection.to_dense()
+        assert torch.equal(connection.from_dense(dense), connection.w)
+
+        # Each neuron only connects to the other filters at its location.
+        assert torch.equal((dense != 0).sum(0), torch.full((24,), 3))
+        assert torch.equal(dense.view(4, 6, 4, 6)[:, 0, :, 1], torch.zeros(4, 4))
+
+    def test_compute(self):
+        networks = competition_networks(b=torch.rand(24))
+        competition, dense = [n.connections[("X", "Y")] for n in networks]
+        for density in (0.0, 0.2, 1.0):
+            s = torch.rand(3, 24) < density
+            assert torch.allclose(competition.compute(s), dense.compute(s), atol=1e-6)
+
+    def test_normalize(self):
+        networks = competition_networks(norm=1.5)
+        competition, dense = [n.connections[("X", "Y")] for n in networks]
+        competition.normalize()
+        dense.normalize()
+        assert torch.allclose(competition.to_dense(), dense.w, atol=1e-6)
+
+    def test_post_pre(self):
+        networks = competition_networks(update_rule=PostPre, nu=(1e-2, 1e-2))
+        competition, dense = [n.connections[("X", "Y")] for n in networks]
+        mask = competition.to_dense(torch.ones_like(competition.w)) == 0
+        mask |= torch.eye(24, dtype=torch.bool)
+        w = dense.w.clone()
+
+        for network, kwargs in zip(networks, [{}, {"masks": {("X", "Y"): mask}}]):
+            torch.manual_seed(1)
+            network.run(inpts={"X": torch.rand(20, 1, 24) < 0.4}, time=20, **kwargs)
+
+        assert not torch.equal(dense.w, w)
+        assert torch.equal(competition.w.diagonal(dim1=1, dim2=2), torch.zeros(6, 4))
+        assert torch.allclose(competition.to_dense(), dense.w, atol=1e-6)
+
+
+def sparse_networks():
+    torch.manual_seed(0)
+    w = torch.rand(30, 12) * (torch.rand(30, 12) < 0.3)
+    networks = []
+    for connection_type in (SparseConnection, Connection):
+        network = Network()
+        network.add_layer(Input(n=30, traces=True), name="X")
+        network.add_layer(LIFNodes(n=12, traces=True, thresh=-64.0), name="Y")
+        network.add_connection(
+            connection_type(
+                network.layers["X"],
+                network.layers["Y"],
+                w=w.clone(),
+                update_rule=PostPre,
+                nu=(1e-2, 1e-2),
+            ),
+            source="X",
+            target="Y",
+        )
+        networks.append(network)
+    return networks
+
+
+class TestSparseConnection:
+    """
+    Tests ``SparseConnection`` against a dense ``Connection`` with the same synapses.
+    """
+
+    def test_compute(self):
+        sparse, dense = [n.connections[("X", "Y")] for n in sparse_networks()]
+        s = torch.rand(4, 30) < 0.3
+        assert torch.allclose(sparse.compute(s), dense.compute(s), atol=1e-6)
+
+        # In-place changes of the weights reach the cached transposed copy.
+        sparse.w._values().mul_(2)
+        dense.w *= 2
+        assert torch.allclose(sparse.compute(s), dense.compute(s), atol=1e-6)
+        sparse.w._values()[0] += 1
+        dense.w[tuple(sparse.w._indices()[:, 0])] += 1
+        assert torch.allclose(sparse.compute(s), dense.compute(s), atol=1e-6)
+
+    def test_post_pre(self):
+        sparse_network, dense_network = sparse_networks()
+        sparse = sparse_network.connections[("X", "Y")]
+        dense = dense_network.connections[("X", "Y")]
+        indices = sparse.w._indices().clone()
+        mask = dense.w == 0
+        w = dense.w.clone()
+
+        for network, kwargs in [
+            (sparse_network, {}),
+            (dense_network, {"masks": {("X", "Y"): mask}}),
+        ]:
+            torch.manual_seed(1)
+            spikes = torch.rand(20, 1, 30) < 0.4
+            network.run(inpts={"X": spikes}, time=20, **kwargs)
+
+        # Only the existing synapses learn, exactly as the dense rule does outside of the mask.
+        assert torch.equal(sparse.w._indices(), indices)
+        assert not torch.equal(dense.w, w)
+        assert torch.allclose(sparse.w.to_dense(), dense.w, atol=1e-6)
+
+
+class TestNormalize:
+    """
+    Tests the shared weight normalization against the per-connection normalizations it replaced.
+    """
+
+    @pytest.mark.parametrize("norm", [3.0, torch.linspace(1.0, 2.0, 10)])
+    def test_connection(self, norm):
+        torch.manual_seed(0)
+        connection = Connection(Input(n=20), LIFNodes(n=10), norm=norm)
+        connection.w[:, 3] = 0
+        w = connection.w.clone()
+        connection.normalize()
+
+        w_abs_sum = w.abs().sum(0).unsqueeze(0)
+        w_abs_sum[w_abs_sum == 0] = 1.0
+        w *= norm / w_abs_sum
+        assert torch.equal(connection.w, w)
+
+    @pytest.mark.parametrize("norm", [3.0, torch.linspace(1.0, 2.0, 4)])
+    def test_conv2d(self, norm):
+        torch.manual_seed(0)
+        connection = Conv2dConnection(
+            Input(shape=[2, 8, 8]),
+            LIFNodes(shape=[4, 5, 5]),
+            kernel_size=4,
+            norm=norm,
+        )
+        w = connection.w.clone()
+        connection.normalize()
+
+        w = w.view(8, 16)
+        norms = norm.repeat_interleave(2) if isinstance(norm, torch.Tensor) else [norm] * 8
+        for fltr in range(8):
+            w[fltr] *= norms[fltr] / w[fltr].sum(0)
+        assert torch.equal(connection.w, w.view(4, 2, 4, 4))
+
+    @pytest.mark.parametrize("norm", [3.0, torch.linspace(1.0, 2.0, 75)])
+    def test_local(self, norm):
+        connection = local_connection(norm=norm)
+        dense = connection.to_dense()
+        connection.normalize()
+
+        dense *= norm / dense.sum(0).view(1, -1)
+        assert torch.allclose(connection.to_dense(), dense, atol=1e-6)
+        assert torch.allclose(connection.to_dense().sum(0), torch.ones(75) * norm)
+
+
+def normalized_network(**kwargs):
+    torch.manual_seed(0)
+    network = Network()
+    network.add_layer(Input(n=20, traces=True), name="X")
+    network.add_layer(LIFNodes(n=10, traces=True), name="Y")
+    network.add_connection(
+        Connection(network.layers["X"], network.layers["Y"], norm=2.0, **kwargs),
+        source="X",
+        target="Y",
+    )
+    return network, network.connections[("X", "Y")]
+
+
+def run(network, learning=True):
+    network.learning = learning
+    spikes = torch.bernoulli(0.5 * torch.ones(10, 20)).byte()
+    network.run(inpts={"X": spikes}, time=10)
+    network.reset_()
+
+
+class TestVersion:
+    """
+    Tests that connections are normalized again exactly when their weights changed.
+    """
+
+    def test_unchanged(self):
+        network, connection = normalized_network()
+        run(network)
+        w = connection.w.clone()
+        version = connection.version
+
+        # The default learning rule does not modify the weights, so they are left bit for bit as they are.
+        for learning in (True, False):
+            run(network, learning)
+            assert connection.version == version
+            assert torch.equal(connection.w, w)
+
+    def test_learning(self):
+        network, connection = normalized_network(update_rule=PostPre, nu=(0.1, 0.1))
+        run(network)
+        version = connection.version
+
+        run(network)
+        assert connection.version != version
+        assert torch.allclose(connection.w.abs().sum(0), torch.full((10,), 2.0))
+
+    @pytest.mark.parametrize(
+        "edit",
+        [
+            lambda c: c.w.fill_(1.0),
+            lambda c: c.w.__setitem__((0, 0), 5.0),
+            lambda c: setattr(c, "w", torch.nn.Parameter(torch.ones(20, 10), False)),
+            lambda c: (c.w.data.fill_(1.0), c.touch()),
+        ],
+    )
+    def test_edit(self, edit):
+        network, connection = normalized_network()
+        run(network)
+        version = connection.version
+
+        edit(connection)
+        assert connection.version != version
+        run(network, learning=False)
+        assert torch.allclose(connection.w.abs().sum(0), torch.full((10,), 2.0))
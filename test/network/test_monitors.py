@@ -0,0 +1,175 @@
+import gc
+import os
+
+import pytest
+import torch
+
+from bindsnet.network import Network
+from bindsnet.network.monitors import Monitor, NetworkMonitor, PackedSpikes
+from bindsnet.network.nodes import Input, LIFNodes
+from bindsnet.network.topology import Connection
+
+
+def spikes(*shape, p=0.3, seed=0):
+    return torch.rand(*shape, generator=torch.Generator().manual_seed(seed)) < p
+
+
+class TestPackedSpikes:
+    """
+    Tests bit-packed spike tensors against the dense spikes they hold.
+    """
+
+    @pytest.mark.parametrize("shape", [(7, 1, 3, 5), (4, 2, 8), (3, 1, 1)])
+    def test_round_trip(self, shape):
+        s = spikes(*shape)
+        packed = PackedSpikes.pack(s)
+        assert packed.shape == s.shape
+        assert packed.packed.dtype == torch.uint8
+        assert packed.packed.shape == (shape[0], -(-s[0].numel() // 8))
+        assert torch.equal(packed.unpack(), s)
+
+        # Any non-zero entry is a spike.
+        assert torch.equal(PackedSpikes.pack(s.float() * 2).unpack(), s)
+        assert torch.equal(PackedSpikes.pack(s, start_dim=2).unpack(), s)
+
+    def test_leading_dimensions(self):
+        s = spikes(10, 2, 3, 3)
+        packed = PackedSpikes.pack(s, start_dim=2)
+        assert torch.equal(packed[2:5].unpack(), s[2:5])
+        assert torch.equal(packed[:, 1].unpack(), s[:, 1])
+        assert torch.equal(packed.sum(0), s.sum(0))
+        assert torch.equal(packed.sum(1), s.sum(1))
+
+        flat = PackedSpikes.pack(s[:, :1]).view(10, -1)
+        assert flat.shape == (10, 9)
+        assert torch.equal(flat.unpack(), s[:, 0].reshape(10, 9))
+        with pytest.raises(ValueError):
+            flat.view(5, 18)
+
+    @pytest.mark.parametrize("window", [1, 3, 4, 10, 12])
+    def test_window_sum(self, window):
+        s = spikes(10, 1, 11)
+        counts = PackedSpikes.pack(s).window_sum(window)
+        expected = torch.stack(
+            [s[i : i + window].sum(0) for i in range(0, 10, window)]
+        )
+        assert torch.equal(counts, expected)
+
+
+def input_network(**kwargs):
+    network = Network()
+    network.add_layer(Input(n=6), name="X")
+    monitor = Monitor(network.layers["X"], state_vars=["s"], **kwargs)
+    network.add_monitor(monitor, name="X")
+    return network, monitor
+
+
+class TestMonitor:
+    """
+    Tests the ring buffer of pre-allocated recordings.
+    """
+
+    @pytest.mark.parametrize("pack_spikes", [False, True])
+    def test_order(self, pack_spikes):
+        network, monitor = input_network(time=5, pack_spikes=pack_spikes)
+        s = spikes(7, 1, 6)
+
+        # The last time steps come in order, after zeros for the ones not simulated since the last reset.
+        for steps, expected in [
+            (7, s[2:]),
+            (5, s[:5]),
+            (3, torch.cat((torch.zeros(2, 1, 6, dtype=torch.bool), s[:3]))),
+        ]:
+            network.run(inpts={"X": s[:steps]}, time=steps)
+            recording = monitor.get("s")
+            if pack_spikes:
+                recording = recording.unpack()
+            assert torch.equal(recording, expected)
+            network.reset_()
+
+    def test_copy(self):
+        network, monitor = input_network(time=5)
+        s = spikes(10, 1, 6)
+        for steps in (5, 3):
+            network.run(inpts={"X": s[:steps]}, time=steps)
+            recording = monitor.get("s")
+            expected = recording.clone()
+
+            # Recording more steps leaves the returned tensor as it was.
+            network.run(inpts={"X": s[steps:]}, time=10 - steps)
+            assert torch.equal(recording, expected)
+            network.reset_()
+
+    def test_unbounded(self):
+        network, monitor = input_network()
+        s = spikes(7, 1, 6)
+        network.run(inpts={"X": s}, time=7)
+        assert torch.equal(monitor.get("s"), s)
+
+
+def monitored_network(**kwargs):
+    torch.manual_seed(0)
+    network = Network()
+    network.add_layer(Input(n=8), name="X")
+    network.add_layer(LIFNodes(n=4, thresh=-64.0), name="Y")
+    network.add_connection(
+        Connection(network.layers["X"], network.layers["Y"]), source="X", target="Y"
+    )
+    monitor = NetworkMonitor(network, state_vars=["s", "v"], **kwargs)
+    network.add_monitor(monitor, name="all")
+    return network, monitor
+
+
+def run(network):
+    network.run(inpts={"X": spikes(10, 1, 8)}, time=10)
+
+
+class TestNetworkMonitor:
+    """
+    Tests spilling recordings to disk.
+    """
+
+    @pytest.mark.parametrize("pack_spikes", [False, True])
+    def test_spill(self, pack_spikes):
+        network, monitor = monitored_network(pack_spikes=pack_spikes)
+        run(network)
+        expected = monitor.get()
+
+        network, monitor = monitored_network(max_size=20, pack_spikes=pack_spikes)
+        run(network)
+        assert len(monitor.spilled) > 1
+        recording = monitor.get()
+        for o in expected:
+            for v in expected[o]:
+                a, b = recording[o][v], expected[o][v]
+                if pack_spikes and v == "s" and o in ("X", "Y"):
+                    a, b = a.unpack(), b.unpack()
+                assert torch.equal(a, b)
+
+    def test_temporary_directory(self):
+        network, monitor = monitored_network(max_size=20)
+        run(network)
+        path = monitor.spill_path
+        assert os.listdir(path)
+
+        # The temporary directory goes with the spilled recordings, and a new one is made for the next ones.
+        monitor.reset_()
+        assert not os.path.exists(path)
+        run(network)
+        path = monitor.spill_path
+        assert os.listdir(path)
+
+        del network, monitor
+        gc.collect()
+        assert not os.path.exists(path)
+
+    def test_spill_path(self, tmp_path):
+        path = str(tmp_path / "spill")
+        network, monitor = monitored_network(max_size=20, spill_path=path)
+        run(network)
+        assert os.listdir(path)
+
+        # Only the spilled recordings are removed from a given directory.
+        monitor.reset_()
+        assert os.listdir(path) == []
+        assert monitor.spill_path == path
@@ -0,0 +1,92 @@
+import torch
+
+from bindsnet.network import Network
+from bindsnet.network.monitors import Monitor
+from bindsnet.network.nodes import Input, LIFNodes
+from bindsnet.network.topology import Connection
+
+
+def network():
+    torch.manual_seed(0)
+    network = Network()
+    network.add_layer(Input(n=20), name="X")
+    network.add_layer(LIFNodes(n=10, thresh=-60.0), name="Y")
+    network.add_connection(
+        Connection(network.layers["X"], network.layers["Y"], w=torch.rand(20, 10)),
+        source="X",
+        target="Y",
+    )
+    network.add_monitor(
+        Monitor(network.layers["Y"], state_vars=["s"], time=50), name="Y"
+    )
+    return network
+
+
+def spikes(batch_size=2):
+    return torch.rand(50, batch_size, 20, generator=torch.Generator().manual_seed(1)) < 0.3
+
+
+def y_spikes(network):
+    return network.monitors["Y"].get("s").sum(0)
+
+
+class TestStopCriterion:
+    """
+    Tests ending ``Network.run`` early with a stopping criterion.
+    """
+
+    def test_stop(self):
+        stopped = network()
+        calls = []
+
+        def criterion(counts):
+            calls.append(counts["Y"].clone())
+            return counts["Y"].sum(1) >= 5
+
+        stopped.run(inpts={"X": spikes()}, time=50, stop_criterion=criterion)
+        steps = stopped.last_timesteps
+        assert 1 < steps < 50 and len(calls) == steps
+
+        # Counts are the spikes since the start of the run, and the run ends once every sample met the criterion.
+        assert torch.equal(calls[-1], y_spikes(stopped))
+        assert (calls[-1].sum(1) >= 5).all() and not (calls[-2].sum(1) >= 5).all()
+
+        # The state is the one of a run of exactly as many steps.
+        full = network()
+        full.run(inpts={"X": spikes()[:steps]}, time=steps)
+        assert full.last_timesteps == steps
+        assert torch.equal(y_spikes(stopped), y_spikes(full))
+        assert torch.equal(stopped.layers["Y"].v, full.layers["Y"].v)
+
+    def test_interval(self):
+        stopped = network()
+        stopped.run(
+            inpts={"X": spikes()},
+            time=50,
+            stop_criterion=lambda counts: counts["Y"].sum() >= 5,
+            stop_interval=7,
+        )
+        assert stopped.last_timesteps % 7 == 0
+
+        never = network()
+        never.run(inpts={"X": spikes()}, time=50, stop_criterion=lambda counts: False)
+        assert never.last_timesteps == 50
+
+    def test_stop_layers(self):
+        stopped = network()
+        layers = []
+
+        def criterion(counts):
+            layers.append(sorted(counts))
+            return True
+
+        stopped.run(inpts={"X": spikes()}, time=50, stop_criterion=criterion)
+        assert stopped.last_timesteps == 1 and layers == [["Y"]]
+
+        stopped.run(
+            inpts={"X": spikes()},
+            time=50,
+            stop_criterion=criterion,
+            stop_layers=["X", "Y"],
+        )
+        assert layers[-1] == ["X", "Y"]
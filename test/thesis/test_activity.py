@@ -0,0 +1,71 @@
+import json
+import os
+
+import torch
+
+from thesis.activity import ActivityStore
+
+
+def batch(start, size, n_output=5):
+    outputs = torch.arange(start * n_output, (start + size) * n_output).view(size, n_output)
+    return outputs, torch.arange(start, start + size) % 10, torch.arange(start, start + size) + 100
+
+
+class TestActivityStore:
+    """
+    Tests the append-only store of network activity.
+    """
+
+    def test_append_read(self, tmp_path):
+        store = ActivityStore(str(tmp_path / "store"), 5)
+        assert len(store) == 0
+        assert store.read()["outputs"].shape == (0, 5)
+
+        for start, size in [(0, 3), (3, 4), (7, 1)]:
+            store.append(*batch(start, size))
+        assert len(store) == 8
+
+        outputs, labels, indices = batch(0, 8)
+        data = store.read()
+        assert torch.equal(data["outputs"], outputs)
+        assert torch.equal(data["labels"], labels)
+        assert torch.equal(data["indices"], indices)
+        assert torch.equal(store.read(5)["outputs"], outputs[:5])
+        assert torch.equal(store.read(100)["indices"], indices)
+
+    def test_reopen(self, tmp_path):
+        path = str(tmp_path / "store")
+        ActivityStore(path, 5, dtype="int32").append(*batch(0, 4))
+
+        store = ActivityStore(path, 5)
+        assert len(store) == 4
+        store.append(*batch(4, 2))
+        store = ActivityStore(path, 5)
+        assert len(store) == 6
+        assert torch.equal(store.read()["outputs"], batch(0, 6)[0])
+
+    def test_interrupted_append(self, tmp_path):
+        path = str(tmp_path / "store")
+        store = ActivityStore(path, 5)
+        store.append(*batch(0, 3))
+
+        # Rows written after the last published header, as left by a crash before it is replaced, are ignored and
+        # overwritten by the next append.
+        for column, values in zip(ActivityStore.columns, batch(50, 2)):
+            with open(os.path.join(path, f"{column}.bin"), "ab") as f:
+                f.write(values.numpy().astype(store._dtype(column)).tobytes())
+        store = ActivityStore(path, 5)
+        assert len(store) == 3
+        assert torch.equal(store.read()["outputs"], batch(0, 3)[0])
+
+        store.append(*batch(3, 1))
+        assert torch.equal(ActivityStore(path, 5).read()["labels"], batch(0, 4)[1])
+        assert os.path.getsize(os.path.join(path, "indices.bin")) == 4 * 8
+        assert sorted(os.listdir(path)) == [
+            "header.json",
+            "indices.bin",
+            "labels.bin",
+            "outputs.bin",
+        ]
+        with open(os.path.join(path, "header.json")) as f:
+            assert json.load(f)["n"] == 4
@@ -0,0 +1,82 @@
+import sqlite3
+import time
+
+from thesis.jobs import JobQueue
+
+
+def job(i):
+    return {"type": "C_SNN", "parameters": {"c_w": float(i)}, "n_train": 1}
+
+
+class TestJobQueue:
+    """
+    Tests claiming, leasing and requeueing jobs.
+    """
+
+    def test_claim(self, tmp_path):
+        queue = JobQueue(str(tmp_path / "jobs.db"))
+        ids = [queue.enqueue(job(i)) for i in range(2)]
+        assert queue.enqueue(job(0)) == ids[0]
+        assert len(queue.jobs()) == 2
+
+        claimed = [queue.claim(), queue.claim()]
+        assert [c["id"] for c in claimed] == ids
+        assert claimed[1]["job"] == job(1)
+        assert queue.claim() is None
+
+        queue.finish(ids[0], {"accuracy": 0.5})
+        queue.fail(ids[1], "error")
+        assert [j["result"] for j in queue.jobs("done")] == [{"accuracy": 0.5}]
+        assert queue.claim() is None
+        queue.requeue(failed=True)
+        assert queue.claim()["id"] == ids[1]
+
+    def test_lease(self, tmp_path):
+        path = str(tmp_path / "jobs.db")
+        queue = JobQueue(path, lease=0.4)
+        id_ = queue.enqueue(job(0))
+        assert queue.claim()["id"] == id_
+
+        # The heartbeat keeps the job leased for longer than the lease.
+        with queue.heartbeat(id_):
+            time.sleep(1.0)
+            assert JobQueue(path, lease=0.4).claim() is None
+
+        # Without it, the job goes to the next worker once the lease expired.
+        time.sleep(0.5)
+        assert JobQueue(path, lease=0.4).claim()["id"] == id_
+
+    def test_requeue(self, tmp_path):
+        queue = JobQueue(str(tmp_path / "jobs.db"), lease=0.2)
+        ids = [queue.enqueue(job(i)) for i in range(3)]
+        for _ in ids:
+            queue.claim()
+
+        queue.requeue()
+        assert not queue.jobs("pending")
+        time.sleep(0.3)
+        queue.requeue()
+        assert [j["id"] for j in queue.jobs("pending")] == ids
+
+        # Jobs of given processes are put back whatever their lease.
+        queue.lease = 60
+        for _ in ids:
+            queue.claim()
+        with sqlite3.connect(queue.path) as conn:
+            conn.execute("UPDATE jobs SET pid = 1 WHERE id = ?", (ids[1],))
+        queue.requeue(pids=[1])
+        assert [j["id"] for j in queue.jobs("pending")] == [ids[1]]
+
+    def test_upgrade(self, tmp_path):
+        path = str(tmp_path / "jobs.db")
+        with sqlite3.connect(path) as conn:
+            conn.execute(
+                "CREATE TABLE jobs(id TEXT PRIMARY KEY, job TEXT, status TEXT, pid INT, result TEXT, error TEXT, "
+                "started REAL, finished REAL)"
+            )
+            conn.execute(
+                "INSERT INTO jobs (id, job, status, pid) VALUES ('a', '{}', 'running', 1)"
+            )
+
+        # Running jobs of queues without leases were claimed by workers that are gone.
+        assert JobQueue(path).claim()["id"] == "a"
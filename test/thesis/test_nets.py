@@ -0,0 +1,156 @@
+import types
+
+import pytest
+import torch
+
+from bindsnet.network import Network
+from thesis.nets import AbstractSNN, VoteDecoder, sample_order, stratified_choice, stratified_prefix
+
+
+class TestStratifiedSampling:
+    """
+    Tests the per-class sampling of stored activity.
+    """
+
+    def test_choice(self):
+        targets = torch.tensor([3, 1, 3, 3, 0, 1, 3, 3, 1])
+        choice = stratified_choice(targets, 2, n_classes=4)
+
+        # Distinct indices, n per class or all of a rarer class, grouped by class.
+        assert choice.unique().numel() == choice.numel()
+        assert targets[choice].tolist() == [0, 1, 1, 3, 3]
+
+        everything = stratified_choice(targets, 100, n_classes=4)
+        assert sorted(everything.tolist()) == list(range(9))
+
+    def test_prefix(self):
+        targets = torch.tensor([3, 1, 3, 3, 0, 1, 3, 3, 1])
+        assert stratified_prefix(targets, 1, n_classes=4) == 5
+        assert stratified_prefix(targets, 2, n_classes=4) == 6
+        assert stratified_prefix(targets, 3, n_classes=4) == 9
+        assert stratified_prefix(targets[:0], 3, n_classes=4) == 0
+
+        targets = targets[sample_order(len(targets))]
+        prefix = stratified_prefix(targets, 2, n_classes=4)
+        assert targets[stratified_choice(targets[:prefix], 2, n_classes=4)].tolist() == [0, 1, 1, 3, 3]
+
+    def test_order(self):
+        assert torch.equal(sample_order(100), sample_order(100))
+        assert sorted(sample_order(100).tolist()) == list(range(100))
+
+
+def reference_top_n_votes(votes, top_n):
+    args = votes.argsort(axis=0, descending=True)[0:top_n, :]
+    top_n_votes = torch.zeros(votes.shape)
+    for i, top_i in enumerate(args):
+        for j, label in enumerate(top_i):
+            top_n_votes[label, j] = votes[label, j]
+    return top_n_votes
+
+
+def reference_patch_scores(votes, spikes, n_filters, n_patches, top_n):
+    # Per-sample patch voting of the networks before VoteDecoder
+    top_n_votes = reference_top_n_votes(votes, top_n)
+    best_patches_max = spikes.view(n_filters, n_patches).max(0)
+    patch_votes = torch.zeros(10, n_patches)
+    sum_spikes = torch.zeros(n_patches)
+    for patch_number, filter_number in zip(range(n_patches), best_patches_max.indices):
+        patch_votes[:, patch_number] = top_n_votes[:, filter_number * n_patches + patch_number]
+        sum_spikes[patch_number] = spikes.view(n_filters, n_patches)[filter_number, patch_number]
+    return patch_votes @ sum_spikes
+
+
+class TestVoteDecoder:
+    """
+    Tests batched vote decoding against the per-sample decoding it replaced.
+    """
+
+    n_filters, n_patches = 5, 9
+
+    def data(self):
+        generator = torch.Generator().manual_seed(0)
+        # Votes on a grid of 1 / 64, so that sums are exact whatever their order
+        votes = torch.randint(0, 256, (10, self.n_filters * self.n_patches), generator=generator).float() / 64
+        spikes = torch.randint(0, 6, (30, self.n_filters * self.n_patches), generator=generator)
+        spikes[3] = 0
+        return votes, spikes
+
+    @pytest.mark.parametrize("top_n", [1, 3, 10])
+    def test_patch_voting(self, top_n):
+        votes, spikes = self.data()
+        decoder = VoteDecoder(votes, self.n_filters, self.n_patches)
+        assert torch.equal(decoder.top_n_votes(top_n), reference_top_n_votes(votes, top_n))
+
+        scores = decoder.scores(spikes, top_n)
+        for i in range(spikes.size(0)):
+            expected = reference_patch_scores(votes, spikes[i].float(), self.n_filters, self.n_patches, top_n)
+            assert torch.equal(scores[i], expected)
+            assert torch.equal(decoder.classify(spikes[i : i + 1], top_n)[0], expected.argsort(descending=True))
+
+    def test_voting(self):
+        votes, spikes = self.data()
+        decoder = VoteDecoder(votes, self.n_filters, self.n_patches, patch_voting=False, abstain=True)
+        classes = decoder.classify(spikes, 3)
+        for i in range(spikes.size(0)):
+            expected = reference_top_n_votes(votes, 3) @ spikes[i].float()
+            if expected.sum() == 0:
+                expected = torch.full((10,), -1, dtype=torch.long)
+            else:
+                expected = expected.argsort(descending=True)
+            assert torch.equal(classes[i], expected)
+
+    def test_top_n_list(self):
+        votes, spikes = self.data()
+        decoder = VoteDecoder(votes, self.n_filters, self.n_patches)
+        classes = decoder.classify(spikes, range(1, 11))
+        assert classes.shape == (10, 30, 10)
+        for top_n in range(1, 11):
+            assert torch.equal(classes[top_n - 1], decoder.classify(spikes, top_n))
+
+
+class StoredActivity(AbstractSNN):
+    """
+    Network whose test activity is given instead of simulated.
+    """
+
+    def __init__(self, targets, n_filters=5, conv_size=3):
+        generator = torch.Generator().manual_seed(0)
+        self.network = Network()
+        self.n_filters, self.conv_size = n_filters, conv_size
+        self.votes = torch.rand(10, n_filters * conv_size ** 2, generator=generator)
+        self._decoder = None
+        self.calibrated = True
+        self.targets = targets
+        self.outputs = torch.randint(0, 5, (len(targets), n_filters * conv_size ** 2), generator=generator)
+        self.simulated = 0
+
+    def mnist_dataset(self, split="train"):
+        return types.SimpleNamespace(targets=self.targets)
+
+    def test_activity(self, n_iter=10000, batch_size=1):
+        self.simulated = max(self.simulated, n_iter)
+        order = sample_order(len(self.targets))[:n_iter]
+        return {"outputs": self.outputs[order], "labels": self.targets[order], "indices": order}
+
+
+class TestAccuracyOnTopN:
+    """
+    Tests the accuracy of every top_n per class.
+    """
+
+    def test_unequal_classes(self):
+        # Classes with 3 to 30 samples
+        targets = torch.arange(10).repeat_interleave(torch.arange(3, 31, 3))
+        net = StoredActivity(targets[torch.randperm(len(targets), generator=torch.Generator().manual_seed(1))])
+
+        scores, errors, _ = net.accuracy_on_top_n(20, labels=True)
+        assert scores.shape == (10, 10, 3)
+        assert errors.shape == (10, 10)
+        assert net.simulated <= len(targets)
+
+        # With at most as many samples per class as the rarest class has, only a prefix is simulated.
+        net = StoredActivity(targets)
+        scores, _, _ = net.accuracy_on_top_n(2, labels=True)
+        assert scores.shape == (10, 10, 2)
+        assert net.simulated == stratified_prefix(targets[sample_order(len(targets))], 2)
+        assert net.simulated < len(targets)
@@ -1 +1 @@
-from . import (nets, utils)
\ No newline at end of file
+from . import (activity, jobs, nets, search, utils)
\ No newline at end of file
@@ -0,0 +1,63 @@
+import json
+import os
+
+import numpy as np
+import torch
+
+
+class ActivityStore:
+    # Append-only columnar store of per-sample network activity in a directory: a raw matrix of spike counts
+    # [n_samples, n_output], next to the labels and dataset indices of its samples, each in its own raw file that is
+    # only ever appended to and read through a memory map.
+    # The header gives the number of complete samples. It is replaced atomically after every append, so readers never
+    # see a partially written sample, and bytes past it, left by an interrupted append, are overwritten by the next one.
+    columns = {'outputs': None, 'labels': 'int64', 'indices': 'int64'}
+
+    def __init__(self, path, n_output, dtype='int16'):
+        self.path = path
+        header_path = os.path.join(path, 'header.json')
+        if os.path.exists(header_path):
+            with open(header_path, 'r') as f:
+                self.header = json.load(f)
+        else:
+            self.header = {'n': 0, 'n_output': n_output, 'dtype': dtype}
+
+    def __len__(self):
+        return self.header['n']
+
+    def _dtype(self, column):
+        return np.dtype(self.columns[column] or self.header['dtype'])
+
+    def _shape(self, column, n):
+        return (n, self.header['n_output']) if column == 'outputs' else (n,)
+
+    def read(self, n=None):
+        # Copies only the first n samples out of the memory maps
+        n = len(self) if n is None else min(n, len(self))
+        data = {}
+        for column in self.columns:
+            if n == 0:
+                values = np.zeros(self._shape(column, 0), dtype=self._dtype(column))
+            else:
+                values = np.array(np.memmap(os.path.join(self.path, f'{column}.bin'), dtype=self._dtype(column),
+                                            mode='r', shape=self._shape(column, n)))
+            data[column] = torch.from_numpy(values).long()
+        return data
+
+    def append(self, outputs, labels, indices):
+        os.makedirs(self.path, exist_ok=True)
+        n = len(self)
+        data = {'outputs': outputs, 'labels': labels, 'indices': indices}
+        for column, values in data.items():
+            values = torch.as_tensor(values).numpy().astype(self._dtype(column))
+            with open(os.path.join(self.path, f'{column}.bin'), 'r+b' if n else 'wb') as f:
+                f.seek(n * self._dtype(column).itemsize * int(np.prod(self._shape(column, 1))))
+                f.write(values.tobytes())
+                f.truncate()
+
+        # Published by renaming a complete header over the old one
+        self.header['n'] = n + len(data['labels'])
+        tmp_path = os.path.join(self.path, 'header.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.header, f)
+        os.replace(tmp_path, os.path.join(self.path, 'header.json'))
@@ -0,0 +1,211 @@
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import traceback
+
+import torch
+
+from bindsnet.datasets import PrefetchLoader
+
+
+def job_id(job):
+    return hashlib.sha224(json.dumps(job, sort_keys=True).encode('utf8')).hexdigest()
+
+
+def run_job(job):
+    # Trains, calibrates, tests and saves a network given as
+    # {'type': 'C_SNN', 'parameters': {...}, 'n_train': ..., 'n_calibrate': ..., 'n_test': ...}
+    from . import nets
+
+    net = getattr(nets, job['type'])(**job['parameters'])
+    # Networks saved with an accuracy, e.g. by an earlier grid search, are not trained again
+    path = f'networks//{net.name}//accuracy'
+    if os.path.exists(path):
+        return {'name': net.name, 'accuracy': float(torch.load(path))}
+
+    net.train(job['n_train'])
+    net.calibrate(job['n_calibrate'])
+    net.calculate_accuracy(job['n_test'])
+    net.save()
+    return {'name': net.name, 'accuracy': float(net.accuracy)}
+
+
+def work(path, torch_threads, log, lease):
+    # Worker process: runs jobs until the queue has no pending ones left, nor running ones whose lease could expire
+    torch.set_num_threads(torch_threads)
+    # Workers of a pool already use all CPUs between them
+    PrefetchLoader.default_num_workers = 0
+    queue = JobQueue(path, lease)
+    with open(log, 'a') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+        while True:
+            job = queue.claim()
+            if job is None:
+                if not queue.jobs('running'):
+                    break
+                time.sleep(queue.lease / 4)
+                continue
+            print(f'Running job {job["id"]}: {job["job"]}', flush=True)
+            with queue.heartbeat(job['id']):
+                try:
+                    queue.finish(job['id'], run_job(job['job']))
+                except Exception:
+                    traceback.print_exc()
+                    queue.fail(job['id'], traceback.format_exc())
+
+
+class JobQueue:
+    # Experiments in a SQLite table, identified by the hash of their parameters, so that enqueueing a job twice runs it
+    # once. Jobs go from pending to running to done or failed. A running job is leased to its worker, which renews the
+    # lease with a heartbeat every lease / 4 seconds; once the heartbeat is older than lease seconds, e.g. because the
+    # worker died, the job can be claimed again.
+    def __init__(self, path='networks//jobs.db', lease=60):
+        self.path = path
+        self.lease = lease
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Readers do not wait for writers in WAL mode
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.close()
+        with self._connect() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS jobs(
+                 id TEXT PRIMARY KEY,
+                 job TEXT,
+                 status TEXT,
+                 pid INT,
+                 result TEXT,
+                 error TEXT,
+                 started REAL,
+                 finished REAL,
+                 heartbeat REAL
+                 )''')
+            # Queues created before leases
+            if 'heartbeat' not in [column[1] for column in conn.execute('PRAGMA table_info(jobs)')]:
+                conn.execute('ALTER TABLE jobs ADD COLUMN heartbeat REAL')
+
+    @contextlib.contextmanager
+    def _connect(self, write=True):
+        # Writes lock the database until they commit, so that two workers never claim the same job
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def enqueue(self, job):
+        id_ = job_id(job)
+        with self._connect() as conn:
+            conn.execute('INSERT OR IGNORE INTO jobs (id, job, status) VALUES (?, ?, ?)',
+                         (id_, json.dumps(job, sort_keys=True), 'pending'))
+        return id_
+
+    def requeue(self, failed=False, pids=None):
+        # Puts back running jobs whose lease expired or, given pids, that were claimed by these processes, and failed
+        # jobs if asked to
+        with self._connect() as conn:
+            if pids is None:
+                conn.execute("UPDATE jobs SET status = 'pending', pid = NULL "
+                             "WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)",
+                             (time.time() - self.lease,))
+            else:
+                conn.executemany("UPDATE jobs SET status = 'pending', pid = NULL WHERE status = 'running' AND pid = ?",
+                                 [(pid,) for pid in pids])
+            if failed:
+                conn.execute("UPDATE jobs SET status = 'pending', error = NULL WHERE status = 'failed'")
+
+    def claim(self):
+        # Takes the first pending job, or a running one whose lease expired
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT id, job FROM jobs WHERE status = 'pending' OR (status = 'running' "
+                               "AND (heartbeat IS NULL OR heartbeat < ?)) ORDER BY rowid LIMIT 1",
+                               (now - self.lease,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', pid = ?, started = ?, heartbeat = ? WHERE id = ?",
+                         (os.getpid(), now, now, row[0]))
+        return {'id': row[0], 'job': json.loads(row[1])}
+
+    @contextlib.contextmanager
+    def heartbeat(self, id_):
+        # Renews the lease of a claimed job from a background thread while the job runs
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease / 4):
+                with self._connect() as conn:
+                    conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = 'running'",
+                                 (time.time(), id_))
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def finish(self, id_, result):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'done', result = ?, finished = ? WHERE id = ?",
+                         (json.dumps(result), time.time(), id_))
+
+    def fail(self, id_, error):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished = ? WHERE id = ?",
+                         (error, time.time(), id_))
+
+    def jobs(self, status=None):
+        with self._connect(write=False) as conn:
+            if status is None:
+                rows = conn.execute('SELECT id, job, status, result, error FROM jobs ORDER BY rowid').fetchall()
+            else:
+                rows = conn.execute('SELECT id, job, status, result, error FROM jobs WHERE status = ? ORDER BY rowid',
+                                    (status,)).fetchall()
+        return [{'id': id_, 'job': json.loads(job), 'status': status, 'result': result and json.loads(result),
+                 'error': error} for id_, job, status, result, error in rows]
+
+    def run(self, n_workers=None, torch_threads=1, retry_failed=False, poll_interval=5):
+        # Runs the pending jobs in n_workers processes, yielding every finished job as soon as its result is stored,
+        # including the ones finished before. Worker output goes to networks//jobs//worker-{i}.log.
+        # Closing the generator early terminates the workers and puts their jobs back.
+        if n_workers is None:
+            n_workers = max((os.cpu_count() or 1) // torch_threads, 1)
+        self.requeue(failed=retry_failed)
+        os.makedirs('networks//jobs', exist_ok=True)
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target=work,
+                                   args=(self.path, torch_threads, f'networks//jobs//worker-{i}.log', self.lease))
+                   for i in range(n_workers)]
+        for worker in workers:
+            worker.start()
+
+        seen = set()
+        try:
+            while True:
+                alive = any(worker.is_alive() for worker in workers)
+                for job in self.jobs():
+                    if job['status'] in ('done', 'failed') and job['id'] not in seen:
+                        seen.add(job['id'])
+                        yield job
+                if not alive:
+                    break
+                time.sleep(poll_interval)
+        finally:
+            stopped = [worker for worker in workers if worker.is_alive()]
+            for worker in stopped:
+                worker.terminate()
+            for worker in workers:
+                worker.join()
+            if stopped:
+                self.requeue(pids=[worker.pid for worker in stopped])
@@ -5,7 +5,6 @@ import json
 import os
 import shutil
 import sqlite3
-from random import random
 from time import time as t
 
 import numpy as np
@@ -20,14 +19,16 @@ from sklearn.metrics import confusion_matrix
 from torchvision import transforms
 from tqdm import tqdm, tqdm_notebook
 
-from bindsnet.datasets import MNIST
+from bindsnet.datasets import MNIST, EncodedDataset, PrefetchLoader
 from bindsnet.encoding import PoissonEncoder
 from bindsnet.learning import PostPre
 from bindsnet.network import Network
-from bindsnet.network.monitors import Monitor, NetworkMonitor
+from bindsnet.network.monitors import Monitor, NetworkMonitor, PackedSpikes
 from bindsnet.network.nodes import AdaptiveLIFNodes, Input
-from bindsnet.network.topology import Connection, Conv2dConnection, LocalConnection, SparseConnection
+from bindsnet.network.topology import Connection, Conv2dConnection, LocalConnection, CompetitionConnection, \
+    SparseConnection
 from bindsnet.utils import reshape_locally_connected_weights
+from .activity import ActivityStore
 
 tqdm_train = tqdm
 
@@ -54,6 +55,120 @@ else:
     ncols = 100
 
 
+class PreprocessedMNIST(torch.utils.data.Dataset):
+    # Cropped and intensity-scaled MNIST images, kept in memory and indexed without PIL.
+    # The images are preprocessed once per process for each (train, crop, intensity).
+    # Networks train on 'train' and calibrate on 'validation', which together make up 'full_train'.
+    splits = {
+        'train': (True, slice(0, 50000)),
+        'validation': (True, slice(50000, 60000)),
+        'full_train': (True, slice(0, 60000)),
+        'test': (False, slice(0, 10000)),
+        }
+    _cache = {}
+
+    def __init__(self, image_encoder, split='train', crop=20, intensity=127.5):
+        train, rows = self.splits[split]
+        key = (train, crop, intensity)
+        if key not in self._cache:
+            mnist = MNIST(None, None, './/MNIST', download=False, train=train)
+            # Same crop offsets and scaling as CenterCrop, ToTensor and the intensity Lambda
+            top = int(round((mnist.data.size(1) - crop) / 2.))
+            left = int(round((mnist.data.size(2) - crop) / 2.))
+            data = mnist.data[:, top:top + crop, left:left + crop].unsqueeze(1)
+            self._cache[key] = (data.float().div(255) * intensity, mnist.targets)
+
+        data, targets = self._cache[key]
+        self.data = data[rows]
+        self.targets = targets[rows]
+        self.image_encoder = image_encoder
+
+    def __getitem__(self, ind):
+        image = self.data[ind]
+        return {
+            'image': image,
+            'label': int(self.targets[ind]),
+            'encoded_image': self.image_encoder(image),
+            }
+
+    def __len__(self):
+        return len(self.targets)
+
+
+class VoteDecoder:
+    # Classifies batches of Y spike counts [batch, n_output] with calibrated votes [10, n_output].
+    # With patch voting, every patch votes with its most active filter only, weighted by that filter's spike count.
+    # Otherwise all neurons vote, and samples without any votes are left unclassified (-1).
+    def __init__(self, votes, n_filters, n_patches, patch_voting=True, abstain=False):
+        self.votes = votes
+        self.n_filters = n_filters
+        self.n_patches = n_patches
+        self.patch_voting = patch_voting
+        self.abstain = abstain
+        self.patches = torch.arange(n_patches)
+        self._top_n_votes = {}
+
+    def top_n_votes(self, top_n=None):
+        # Keeps the top_n largest votes of every neuron and zeroes the rest
+        if top_n == 0:
+            raise ValueError('top_n can\'t be zero')
+        if top_n is None:
+            top_n = 10
+        if top_n not in self._top_n_votes:
+            args = self.votes.argsort(axis=0, descending=True)[0:top_n, :]
+            self._top_n_votes[top_n] = torch.zeros(self.votes.shape).scatter_(
+                0, args, self.votes.gather(0, args).float())
+        return self._top_n_votes[top_n]
+
+    def best_patches(self, spikes):
+        # Spike counts and indices of the most active filter of every patch, [batch, n_patches] each
+        return spikes.view(-1, self.n_filters, self.n_patches).float().max(1)
+
+    def scores(self, spikes, top_n=None):
+        # Class scores [batch, 10], or [len(top_n), batch, 10] for a list of top_n values
+        if isinstance(top_n, (list, tuple, range)):
+            top_n_votes = torch.stack([self.top_n_votes(n) for n in top_n])
+        else:
+            top_n_votes = self.top_n_votes(top_n)
+        if not self.patch_voting:
+            return spikes.view(spikes.size(0), -1).float() @ top_n_votes.transpose(-1, -2)
+        best_spikes, best_filters = self.best_patches(spikes)
+        neurons = best_filters * self.n_patches + self.patches
+        return (top_n_votes[..., neurons] * best_spikes).sum(-1).transpose(-1, -2)
+
+    def classify(self, spikes, top_n=None):
+        # Classes of every sample in decreasing order of score, [batch, 10] (or [len(top_n), batch, 10])
+        scores = self.scores(spikes, top_n)
+        res = scores.argsort(dim=-1, descending=True)
+        if self.abstain:
+            res[scores.sum(-1) == 0] = -1
+        return res
+
+
+def sample_order(n):
+    # Fixed random permutation of the n samples of a split, in which their activity is collected
+    return torch.randperm(n, generator=torch.Generator().manual_seed(0))
+
+
+def stratified_choice(targets, n, n_classes=10):
+    # n distinct random indices of every class in targets (all of them for rarer classes), grouped by class
+    indices = []
+    for label in range(n_classes):
+        label_indices = (targets == label).nonzero().flatten()
+        indices.append(label_indices[torch.randperm(label_indices.size(0))[:n]])
+    return torch.cat(indices)
+
+
+def stratified_prefix(targets, n, n_classes=10):
+    # Length of the shortest prefix of targets with n samples of every class, or all of a class if it has fewer
+    length = 0
+    for label in range(n_classes):
+        label_indices = (targets == label).nonzero().flatten()[:n]
+        if label_indices.size(0):
+            length = max(length, int(label_indices[-1]) + 1)
+    return length
+
+
 class AbstractSNN:
     def __init__(self, mean_weight=0.26, c_w=-100., time_max=250, crop=20,
                  kernel_size=12, n_filters=25, stride=4, intensity=127.5, dt=1,
@@ -70,6 +185,10 @@ class AbstractSNN:
         if c_w_min is None:
             self.c_w_min = self.c_w * 10
         self.calibrated = False
+        self.vote_sums = None
+        self.label_counts = None
+        self._decoder = None
+        self._weights_hash = None
         self.accuracy = None
         self.conf_matrix = None
         self.time_max = time_max
@@ -89,7 +208,6 @@ class AbstractSNN:
         self.t_post = t_post
         self.immutable_name = immutable_name
         self.foldername = foldername
-        self.mask_YY = None
         self.error = None
         self.create_network()
         for c in self.network.connections:
@@ -128,8 +246,29 @@ class AbstractSNN:
 
     @property
     def network_state(self):
-        state = (self.name + str(self.get_weights_XY()) + str(self.get_weights_YY())).encode('utf8')
-        return hashlib.sha224(state).hexdigest()
+        # Hash of the raw weight buffers, recomputed only when the version of a connection changed since the last call
+        connections = [self.network.connections[c] for c in sorted(self.network.connections)]
+        versions = [connection.version for connection in connections]
+        memo = self._weights_hash
+        if memo is None or len(memo[0]) != len(connections) or \
+                any(a is not b for a, b in zip(memo[0], connections)) or memo[1] != versions:
+            weights_hash = hashlib.blake2b(digest_size=28)
+            for connection in connections:
+                w = connection.w.detach().cpu()
+                buffers = [w.coalesce().indices(), w.coalesce().values()] if w.is_sparse else [w]
+                for buffer in buffers:
+                    weights_hash.update(f'{buffer.dtype}{tuple(buffer.shape)}'.encode('utf8'))
+                    weights_hash.update(np.ascontiguousarray(buffer.numpy()))
+            memo = self._weights_hash = (connections, versions, weights_hash)
+
+        # Adaptive thresholds are small and change outside of the connections, so they are hashed on every call
+        state = memo[2].copy()
+        state.update(self.name.encode('utf8'))
+        for layer in sorted(self.network.layers):
+            theta = getattr(self.network.layers[layer], 'theta', None)
+            if theta is not None:
+                state.update(np.ascontiguousarray(theta.detach().cpu().numpy()))
+        return state.hexdigest()
 
     def learning(self, learning_XY, learning_YY=None):
         if learning_YY is None:
@@ -137,29 +276,33 @@ class AbstractSNN:
         self.network.connections[('X', 'Y')].learning = learning_XY
         self.network.connections[('Y', 'Y')].learning = learning_YY
 
+    def mnist_dataset(self, split='train'):
+        return PreprocessedMNIST(PoissonEncoder(time=self.time_max, dt=self.dt), split, self.crop, self.intensity)
+
+    def encoded_dataset(self, split='train', seed=0):
+        # Encoded spike trains are cached on disk per (time_max, dt, crop, intensity, seed, split),
+        # so that all networks with the same encoding share them
+        key = {
+            'time_max': self.time_max,
+            'dt': self.dt,
+            'crop': self.crop,
+            'intensity': self.intensity,
+            'seed': seed,
+            'split': split,
+            }
+        path = f'.//MNIST//encoded//{hashlib.sha224(str(key).encode("utf8")).hexdigest()}'
+        return EncodedDataset(self.mnist_dataset(split), path, seed=seed)
+
     def train(self, n_iter=None, plot=False, vis_interval=30):
         if n_iter is None:
             n_iter = 5000
-        encoded_dataset = MNIST(
-            PoissonEncoder(time=self.time_max, dt=self.dt),
-            None,
-            './/MNIST',
-            download=False,
-            train=True,
-            transform=transforms.Compose([
-                transforms.CenterCrop(self.crop),
-                transforms.ToTensor(),
-                transforms.Lambda(lambda x: x * self.intensity)
-                ])
-            )
-        train_dataset = encoded_dataset
-        train_dataset.data = encoded_dataset.data[:50000, :, :]
-        random_choice = torch.randint(0, train_dataset.data.size(0), (n_iter,))
-        train_dataset.data = train_dataset.data[random_choice]
+        encoded_dataset = self.encoded_dataset('train')
+        random_choice = torch.randint(0, len(encoded_dataset), (n_iter,))
+        train_dataset = torch.utils.data.Subset(encoded_dataset, random_choice)
 
         self.network.train(True)
         print('Training network...')
-        train_dataloader = torch.utils.data.DataLoader(
+        train_dataloader = PrefetchLoader(
             train_dataset, batch_size=1, shuffle=True)
         cnt = 0
         if plot:
@@ -171,20 +314,16 @@ class AbstractSNN:
             fig_competition_distribtion.show()
 
         t_start = t()
-        for speed_counter, batch in tqdm_train(enumerate(train_dataloader), total=n_iter, ncols=ncols):
+        for speed_counter, (inpts, _) in tqdm_train(enumerate(train_dataloader), total=n_iter, ncols=ncols):
             t_now = t()
             time_from_start = str(datetime.timedelta(seconds=(int(t_now - t_start))))
             speed = (speed_counter + 1) / (t_now - t_start)
             time_left = str(datetime.timedelta(seconds=int((n_iter - speed_counter) / speed)))
-            inpts = {'X': batch['encoded_image'].transpose(0, 1)}
             self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
 
             if plot:
                 if (t_now - t_start) / vis_interval > cnt:
-                    self._spikes = {
-                        'X': self.spikes['X'].get('s').view(self.time_max, -1),
-                        'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-                        }
+                    self._record_spikes()
                     display.clear_output(wait=True)
                     fig_weights_XY = self.plot_weights_XY()
                     fig_spikes = self.plot_spikes_Y()
@@ -201,26 +340,13 @@ class AbstractSNN:
     def train_two_steps(self, n_iter=None, plot=False, vis_interval=30):
         if n_iter is None:
             n_iter = 5000
-        encoded_dataset = MNIST(
-            PoissonEncoder(time=self.time_max, dt=self.dt),
-            None,
-            './/MNIST',
-            download=False,
-            train=True,
-            transform=transforms.Compose([
-                transforms.CenterCrop(self.crop),
-                transforms.ToTensor(),
-                transforms.Lambda(lambda x: x * self.intensity)
-                ])
-            )
-        train_dataset = encoded_dataset
-        train_dataset.data = encoded_dataset.data[:50000, :, :]
-        random_choice = torch.randint(0, train_dataset.data.size(0), (n_iter,))
-        train_dataset.data = train_dataset.data[random_choice]
+        encoded_dataset = self.encoded_dataset('train')
+        random_choice = torch.randint(0, len(encoded_dataset), (n_iter,))
+        train_dataset = torch.utils.data.Subset(encoded_dataset, random_choice)
 
         self.network.train(True)
         print('Training network...')
-        train_dataloader = torch.utils.data.DataLoader(
+        train_dataloader = PrefetchLoader(
             train_dataset, batch_size=1, shuffle=True)
         cnt = 0
         if plot:
@@ -232,20 +358,16 @@ class AbstractSNN:
         self.network.connections[('X', 'Y')].learning = True
         print('Training XY connection...')
         t_start = t()
-        for speed_counter, batch in tqdm_train(enumerate(train_dataloader), total=n_iter, ncols=ncols):
+        for speed_counter, (inpts, _) in tqdm_train(enumerate(train_dataloader), total=n_iter, ncols=ncols):
             t_now = t()
             time_from_start = str(datetime.timedelta(seconds=(int(t_now - t_start))))
             speed = (speed_counter + 1) / (t_now - t_start)
             time_left = str(datetime.timedelta(seconds=int((n_iter - speed_counter) / speed)))
-            inpts = {'X': batch['encoded_image'].transpose(0, 1)}
             self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
 
             if plot:
                 if (t_now - t_start) / vis_interval > cnt:
-                    self._spikes = {
-                        'X': self.spikes['X'].get('s').view(self.time_max, -1),
-                        'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-                        }
+                    self._record_spikes()
                     display.clear_output(wait=True)
                     fig_weights_XY = self.plot_weights_XY()
                     fig_spikes = self.plot_spikes_Y()
@@ -267,24 +389,18 @@ class AbstractSNN:
                 fig_spikes.show()
             t_start = t()
             cnt = 0
-            for speed_counter, batch in tqdm_train(enumerate(train_dataloader), total=n_iter, ncols=ncols):
+            for speed_counter, (inpts, _) in tqdm_train(enumerate(train_dataloader), total=n_iter, ncols=ncols):
                 t_now = t()
                 time_from_start = str(datetime.timedelta(seconds=(int(t_now - t_start))))
                 speed = (speed_counter + 1) / (t_now - t_start)
                 time_left = str(datetime.timedelta(seconds=int((n_iter - speed_counter) / speed)))
-                inpts = {'X': batch['encoded_image'].transpose(0, 1)}
                 self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
-                if self.mask_YY is not None:
-                    self.network.connections[('Y', 'Y')].w *= self.mask_YY
                 self.n_iter += 1
                 self.parameters['n_iter'] += 1
 
                 if plot:
                     if (t_now - t_start) / vis_interval > cnt:
-                        self._spikes = {
-                            'X': self.spikes['X'].get('s').view(self.time_max, -1),
-                            'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-                            }
+                        self._record_spikes()
                         display.clear_output(wait=True)
                         fig_weights_XY = self.plot_weights_XY()
                         fig_spikes = self.plot_spikes_Y()
@@ -305,160 +421,138 @@ class AbstractSNN:
 
         self.network.train(False)
 
-    def class_from_spikes(self):
-        pass
+    def make_decoder(self, method='patch_voting'):
+        return VoteDecoder(self.votes, self.n_filters, self.conv_size ** 2, patch_voting=method == 'patch_voting')
 
-    def collect_activity(self, n_iter=None):
-        self.network.train(False)
-        if n_iter is None:
-            n_iter = 5000
-        encoded_dataset = MNIST(
-            PoissonEncoder(time=self.time_max, dt=self.dt),
-            None,
-            './/MNIST',
-            download=False,
-            train=True,
-            transform=transforms.Compose([
-                transforms.CenterCrop(self.crop),
-                transforms.ToTensor(),
-                transforms.Lambda(lambda x: x * self.intensity)
-                ])
-            )
-
-
-        calibratation_dataset = encoded_dataset
-        calibratation_dataset.data = encoded_dataset.data[50000:, :, :]
-        calibratation_dataset.targets = encoded_dataset.targets[50000:]
-        random_choice = torch.randint(0, calibratation_dataset.data.size(0), (n_iter,))
-        calibratation_dataset.data = calibratation_dataset.data[random_choice]
-        calibratation_dataset.targets = calibratation_dataset.targets[random_choice]
-
-        calibration_dataloader = torch.utils.data.DataLoader(
-            calibratation_dataset, batch_size=1, shuffle=True)
-
-        print('Collecting activity data...')
-
-        labels = []
-        outputs = []
-
-        for batch in tqdm(calibration_dataloader, ncols=ncols):
-            inpts = {'X': batch['encoded_image'].transpose(0, 1)}
-            self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
-            self._spikes = {
-                'X': self.spikes['X'].get('s').view(self.time_max, -1),
-                'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-                }
-            outputs.append(self._spikes['Y'].sum(0))
-            labels.append(batch['label'].item())
+    @property
+    def decoder(self):
+        # Rebuilt whenever the votes are replaced, e.g. by calibration or loading
+        if self._decoder is None or self._decoder.votes is not self.votes:
+            self._decoder = self.make_decoder()
+        return self._decoder
+
+    def class_scores(self, top_n=None, spikes=None):
+        if spikes is None:
+            spikes = self._spikes['Y'].sum(0)
+        return self.decoder.scores(spikes.view(1, -1), top_n)[0]
+
+    def class_from_spikes(self, top_n=None, spikes=None):
+        if spikes is None:
+            spikes = self._spikes['Y'].sum(0)
+        spikes = spikes.view(1, -1)
+        if self.decoder.patch_voting:
+            best_spikes, best_voters = self.decoder.best_patches(spikes)
+            self.best_spikes, self.best_voters = best_spikes[0], best_voters[0]
+        res = self.decoder.classify(spikes, top_n)[0]
+        self.label = res[0]
+        return res
 
+    def top_n_votes(self, top_n):
+        return self.decoder.top_n_votes(top_n)
+
+    def vote_margin_criterion(self, margin, top_n=None):
+        # Stopping criterion for Network.run: the decision is settled once, for every sample,
+        # the best class score leads the runner-up by at least margin
+        def criterion(counts):
+            scores = self.decoder.scores(counts['Y'], top_n).sort(dim=1, descending=True).values
+            return scores[:, 0] - scores[:, 1] >= margin
+
+        return criterion
+
+    def _record_spikes(self, steps=None):
+        # Keeps the spikes of the last sample of the last run, packed, for plots and predictions: its last steps time
+        # steps, all of them unless a stop criterion ended the run early
+        steps = self.time_max if steps is None else steps
+        self._spikes = {}
+        for layer in ('X', 'Y'):
+            s = self.spikes[layer].get('s')
+            self._spikes[layer] = PackedSpikes.pack(s.view(self.time_max, s.size(1), -1)[self.time_max - steps:, -1])
+
+    def run_batch(self, inpts, stop_criterion=None, stop_interval=10):
+        # Simulates a whole batch of encoded images at once and returns per-sample Y spike counts [batch, n_output].
+        # Learning must be off: the samples share weights and thresholds, all other state is per-sample.
+        self.network.reset_()
+        batch_size = inpts['X'].size(1)
+        self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1,
+                         stop_criterion=stop_criterion, stop_interval=stop_interval)
+        steps = self.network.last_timesteps
+        spikes_Y = self.spikes['Y'].get('s').view(self.time_max, batch_size, -1)[self.time_max - steps:]
+        self._record_spikes(steps)
+        return spikes_Y.sum(0)
+
+    def activity(self, split, n_iter, batch_size=1):
+        # Y spike counts of samples of a split, simulated only once per network state and kept in an activity store.
+        # Samples follow a fixed random permutation of the split, so the first n_iter of them are a uniform sample,
+        # and asking for more only simulates the missing ones.
+        self.network.normalize_connections()
+        store = ActivityStore(f'networks//{self.name}//activity//{split}//{self.network_state}', self.n_output,
+                              dtype='int16' if self.time_max / self.dt < 2 ** 15 else 'int32')
+        encoded_dataset = self.encoded_dataset(split)
+        n_iter = min(n_iter, len(encoded_dataset))
+        if len(store) < n_iter:
+            order = sample_order(len(encoded_dataset))[:n_iter]
+            dataloader = PrefetchLoader(
+                torch.utils.data.Subset(encoded_dataset, order[len(store):]), batch_size=batch_size)
+            self.network.train(False)
+            print(f'Collecting {split} activity...')
+            for inpts, batch in tqdm(dataloader, ncols=ncols):
+                indices = order[len(store):len(store) + batch['label'].size(0)]
+                store.append(self.run_batch(inpts), batch['label'], indices)
             self.network.reset_()
 
-        data = {'outputs': outputs, 'labels': labels}
-        if not os.path.exists(f'networks//{self.name}//activity'):
-            os.makedirs(f'networks//{self.name}//activity')
-        # for file in os.listdir(f'networks//{self.name}//activity'):
-        #     if self.network_state not in file:
-        #         os.remove(f'networks//{self.name}//activity//{file}')
-        torch.save(data, f'networks//{self.name}//activity//{self.network_state}-{n_iter}')
+        return store.read(n_iter)
 
-    def calibrate(self, n_iter=None):
-        print('Calibrating network...')
+    def collect_activity(self, n_iter=None, batch_size=1):
         if n_iter is None:
             n_iter = 5000
-        found_activity = False
-        if os.path.exists(f'networks//{self.name}//activity/'):
-            for name in os.listdir(f'networks//{self.name}//activity/'):
-                if self.network_state in name:
-                    n_iter_saved = int(name.split('-')[-1])
-                    if n_iter <= n_iter_saved:
-                        data = torch.load(f'networks//{self.name}//activity//{name}')
-                        data_outputs = data['outputs']
-                        data_labels = data['labels']
-                        data_outputs = data_outputs[:n_iter]
-                        data_labels = data_labels[:n_iter]
-                        data = {'outputs': data_outputs, 'labels': data_labels}
-                        found_activity = True
-                        print('Found previously recorded activity')
-                        break
-
-
-        if not found_activity:
-            self.collect_activity(n_iter=n_iter)
-            data = torch.load(f'networks//{self.name}//activity//{self.network_state}-{n_iter}')
+        return self.activity('validation', n_iter, batch_size)
 
+    def calibrate(self, n_iter=None):
+        print('Calibrating network...')
+        data = self.collect_activity(n_iter)
         print('Calculating votes...')
+        self.reset_votes()
+        self.update_votes(data['outputs'], data['labels'])
 
-        outputs = data['outputs']
-        labels = data['labels']
-        votes = torch.zeros(10, self.n_output)
-        for (label, output) in tqdm(zip(labels, outputs), total=len(labels), ncols=ncols):
-            for i, spikes_sum in enumerate(output):
-                votes[label, i] += spikes_sum
-        for i in range(10):
-            votes[i, :] = votes[i, :] / len((np.array(labels) == i).nonzero()[0])
-        self.votes = votes
+    def reset_votes(self):
+        self.vote_sums = torch.zeros(10, self.n_output)
+        self.label_counts = torch.zeros(10)
+        self.votes = torch.zeros(10, self.n_output)
+        self.calibrated = False
+
+    def update_votes(self, outputs, labels):
+        # Adds a chunk of activity [n_samples, n_output] to the calibration, so that it can grow as activity arrives.
+        # Votes are the mean spike counts of every neuron per label.
+        if self.vote_sums is None:
+            self.reset_votes()
+        labels = torch.as_tensor(labels)
+        self.vote_sums.index_add_(0, labels, torch.as_tensor(outputs).float())
+        self.label_counts += torch.bincount(labels, minlength=10).float()
+        self.votes = self.vote_sums / self.label_counts.clamp(min=1).unsqueeze(1)
         self.calibrated = True
 
     def calibrate_lc(self, n_iter=None):
-        if n_iter is None:
-            n_iter = 5000
-
-        if not os.path.exists(f'networks//{self.name}//activity_data-count={n_iter}-n_iter={self.n_iter}'):
-            self.collect_activity(n_iter=n_iter)
-
-        data = torch.load(f'networks//{self.name}//activity_data-count={n_iter}-n_iter={self.n_iter}')
-        outputs = [output.sum(0).numpy() for output in data['outputs']]
-        labels = data['labels']
+        data = self.collect_activity(n_iter)
 
         print('Calibrating classifier...')
 
         self.classifier = SGDClassifier(n_jobs=-1)
-        self.classifier.fit(outputs, labels)
-
-    def calculate_accuracy_lc(self, n_iter=10000):
-        test_dataset = MNIST(
-            PoissonEncoder(time=self.time_max, dt=self.dt),
-            None,
-            './/MNIST',
-            download=False,
-            train=False,
-            transform=transforms.Compose([
-                transforms.CenterCrop(self.crop),
-                transforms.ToTensor(),
-                transforms.Lambda(lambda x: x * self.intensity)
-                ])
-            )
-        random_choice = torch.randint(0, test_dataset.data.size(0), (n_iter,))
-        test_dataset.data = test_dataset.data[random_choice]
-        test_dataset.targets = test_dataset.targets[random_choice]
-        print('Calculating accuracy...')
-        self.network.reset_()
+        self.classifier.fit(data['outputs'].float().numpy(), data['labels'].numpy())
 
-        # if not self.calibrated:
-        #     print('The network is not calibrated!')
-        #     return None
-        self.network.train(False)
-        test_dataloader = torch.utils.data.DataLoader(
-            test_dataset, batch_size=1, shuffle=True)
-        x = []
-        y = []
-        print('Collecting activity data...')
-        for batch in tqdm(test_dataloader, ncols=ncols):
-            inpts = {'X': batch['encoded_image'].transpose(0, 1)}
-            self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
-            self._spikes = {
-                'X': self.spikes['X'].get('s').view(self.time_max, -1),
-                'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-                }
-            label = batch['label'].item()
-            x.append(self._spikes['Y'].sum(0).numpy())
-            y.append(label)
+    def calculate_accuracy_lc(self, n_iter=10000, batch_size=1):
+        self.calculate_accuracy(n_iter=n_iter, method='lc', batch_size=batch_size)
 
-            score = self.classifier.score(x, y)
-            y_predict = self.classifier.predict(x)
+    def test_activity(self, n_iter=10000, batch_size=1):
+        # Stored so that decoders can be evaluated without simulating again
+        return self.activity('test', n_iter, batch_size)
 
-        self.conf_matrix = confusion_matrix(y, y_predict)
-        self.accuracy = score
+    def predict(self, outputs, top_n=None, method=None):
+        # Top class of every row of Y spike counts [n_samples, n_output] with the decoding method:
+        # 'patch_voting', 'voting' or 'lc' (the linear classifier of calibrate_lc); None for the network's default
+        if method == 'lc':
+            return torch.as_tensor(self.classifier.predict(outputs.float().numpy()))
+        decoder = self.decoder if method is None else self.make_decoder(method)
+        return decoder.classify(outputs, top_n)[:, 0]
 
     def votes_distribution(self):
         votes_distibution_fig = go.Figure(go.Scatter(y=self.votes.sort(0, descending=True)[0].mean(1).numpy(),
@@ -488,60 +582,46 @@ class AbstractSNN:
                                             )
         return votes_distibution_fig
 
-    def calculate_accuracy(self, n_iter=1000, top_n=None, method=None):
-        if method is None:
-            method == 'patch_voting'
-        test_dataset = MNIST(
-            PoissonEncoder(time=self.time_max, dt=self.dt),
-            None,
-            './/MNIST',
-            download=False,
-            train=False,
-            transform=transforms.Compose([
-                transforms.CenterCrop(self.crop),
-                transforms.ToTensor(),
-                transforms.Lambda(lambda x: x * self.intensity)
-                ])
-            )
-        random_choice = torch.randint(0, test_dataset.data.size(0), (n_iter,))
-        test_dataset.data = test_dataset.data[random_choice]
-        test_dataset.targets = test_dataset.targets[random_choice]
-        self.network.reset_()
+    def calculate_accuracy(self, n_iter=1000, top_n=None, method=None, batch_size=1, stop_margin=None,
+                           stop_interval=10):
         if top_n is None:
             top_n = 10
-        if not self.calibrated:
+        if not self.calibrated and method != 'lc':
             print('The network is not calibrated!')
             return None
-        self.network.train(False)
-        test_dataloader = torch.utils.data.DataLoader(
-            test_dataset, batch_size=1, shuffle=True)
-        x = []
-        y = []
-        for batch in tqdm(test_dataloader, ncols=ncols):
-            inpts = {'X': batch['encoded_image'].transpose(0, 1)}
-            self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
-            self._spikes = {
-                'X': self.spikes['X'].get('s').view(self.time_max, -1),
-                'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-                }
-            label = batch['label'].item()
-            prediction = self.class_from_spikes(top_n=top_n)
-            x.append(prediction[0].item())
-            y.append(label)
+        if stop_margin is None:
+            # Decoded from the stored test activity, which is only simulated once per network state
+            data = self.test_activity(n_iter, batch_size)
+            x = self.predict(data['outputs'], top_n, method)
+            y = data['labels']
+        else:
+            encoded_dataset = self.encoded_dataset('test')
+            random_choice = torch.randint(0, len(encoded_dataset), (n_iter,))
+            test_dataset = torch.utils.data.Subset(encoded_dataset, random_choice)
             self.network.reset_()
+            self.network.train(False)
+            test_dataloader = PrefetchLoader(
+                test_dataset, batch_size=batch_size, shuffle=True)
+            # Ends each batch early once the vote margin is reached
+            stop_criterion = self.vote_margin_criterion(stop_margin, top_n)
+            x = []
+            y = []
+            steps = []
+            for inpts, batch in tqdm(test_dataloader, ncols=ncols):
+                outputs = self.run_batch(inpts, stop_criterion=stop_criterion, stop_interval=stop_interval)
+                x.append(self.predict(outputs, top_n, method))
+                y.append(batch['label'])
+                steps.append(self.network.last_timesteps)
+            self.network.reset_()
+            print(f'Mean simulation time: {np.mean(steps) * self.dt} of {self.time_max}')
+            x = torch.cat(x)
+            y = torch.cat(y)
 
-        scores = []
-        for i in range(len(x)):
-            if y[i] == x[i]:
-                scores.append(1)
-            else:
-                scores.append(0)
-
-        scores = np.array(scores)
-        error = np.sqrt(scores.mean() * (1 - scores.mean()) / n_iter)
+        scores = (x == y).numpy().astype(float)
+        error = np.sqrt(scores.mean() * (1 - scores.mean()) / len(scores))
         print(f'Accuracy: {scores.mean()} with std {round(error, 3)}')
 
-        self.conf_matrix = confusion_matrix(y, x)
+        self.conf_matrix = confusion_matrix(y.numpy(), x.numpy())
         self.accuracy = scores.mean()
         self.error = error
 
@@ -598,14 +678,8 @@ class AbstractSNN:
 
     def competition_distribution(self):
         w = self.network.connections[('Y', 'Y')].w
-        w_comp = []
-        for fltr1 in range(w.size(0)):
-            for fltr2 in range(w.size(3)):
-                if fltr1 != fltr2:
-                    for i in range(w.size(1)):
-                        for j in range(w.size(2)):
-                            w_comp.append(w[fltr1, i, j, fltr2, i, j])
-        w_comp = torch.tensor(w_comp)
+        off_diagonal = ~torch.eye(self.n_filters, dtype=torch.bool)
+        w_comp = w.permute(1, 2, 0)[off_diagonal].flatten()
         fig = go.Figure(go.Histogram(x=w_comp))
         fig.update_layout(width=800, height=500,
                           title=go.layout.Title(
@@ -622,55 +696,31 @@ class AbstractSNN:
 
         return w_comp, fig
 
-    def accuracy_on_top_n(self, n_iter=1000, labels=False):
+    def accuracy_on_top_n(self, n_iter=1000, labels=False, batch_size=1):
         self.network.reset_()
         if not self.calibrated:
             print('The network is not calibrated!')
             return None
         self.network.train(False)
 
+        # All top_n values are decoded at once from the stored test activity
         if labels:
-            scores = torch.zeros(10, 10, n_iter)
-            for label in range(10):
-                label_dataset = MNIST(
-                    PoissonEncoder(time=self.time_max, dt=self.dt),
-                    None,
-                    './/MNIST',
-                    download=False,
-                    train=False,
-                    transform=transforms.Compose([
-                        transforms.CenterCrop(self.crop),
-                        transforms.ToTensor(),
-                        transforms.Lambda(lambda x: x * self.intensity)
-                        ])
-                    )
-                label_indices = (label_dataset.targets == label).nonzero().flatten()
-                label_dataset.data = torch.index_select(label_dataset.data, 0, label_indices)
-                label_dataset.targets = label_dataset.targets[label_dataset.targets == label]
-                random_choice = torch.randint(0, label_dataset.data.size(0), (n_iter,))
-                label_dataset.data = label_dataset.data[random_choice]
-                label_dataset.targets = label_dataset.targets[random_choice]
-
-                test_dataloader = torch.utils.data.DataLoader(
-                    label_dataset, batch_size=1, shuffle=True)
-
-                display.clear_output(wait=True)
-                print(f'Calculating accuracy for label {label}...')
-                for i in tqdm(range(n_iter), ncols=ncols):
-                    batch = next(iter(test_dataloader))
-
-                    inpts = {'X': batch['encoded_image'].transpose(0, 1)}
-                    self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
-                    self._spikes = {
-                        'X': self.spikes['X'].get('s').view(self.time_max, -1),
-                        'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-                        }
-                    self.network.reset_()
-
-                    for top_n in range(1, 11):
-                        prediction = self.class_from_spikes(top_n=top_n)[0]
-                        if prediction == label:
-                            scores[label, top_n - 1, i] = 1
+            # The same number of samples of every class, at most as many as the rarest class has, and only the test
+            # samples up to the last one needed for them are simulated
+            targets = self.mnist_dataset('test').targets
+            n_iter = min(n_iter, int(torch.bincount(targets, minlength=10).min()))
+            data = self.test_activity(stratified_prefix(targets[sample_order(len(targets))], n_iter), batch_size)
+            random_choice = stratified_choice(data['labels'], n_iter)
+        else:
+            data = self.test_activity(n_iter, batch_size)
+            random_choice = torch.arange(data['labels'].size(0))
+        outputs = data['outputs'][random_choice]
+        y = data['labels'][random_choice]
+        predictions = self.decoder.classify(outputs, range(1, 11))[..., 0].t()
+        correct = (predictions == y.unsqueeze(1)).float()
+
+        if labels:
+            scores = torch.stack([correct[y == label].t() for label in range(10)])
 
             # errors = (proportion_confint(scores.sum(axis=-1), scores.shape[-1], 0.05)[1] -
             #           proportion_confint(scores.sum(axis=-1), scores.shape[-1], 0.05)[0]) / 2
@@ -703,39 +753,9 @@ class AbstractSNN:
             return scores, errors, fig
 
         else:
-            test_dataset = MNIST(
-                PoissonEncoder(time=self.time_max, dt=self.dt),
-                None,
-                './/MNIST',
-                download=False,
-                train=False,
-                transform=transforms.Compose([
-                    transforms.CenterCrop(self.crop),
-                    transforms.ToTensor(),
-                    transforms.Lambda(lambda x: x * self.intensity)
-                    ])
-                )
-            random_choice = torch.randint(0, test_dataset.data.size(0), (n_iter,))
-            test_dataset.data = test_dataset.data[random_choice]
-            test_dataset.targets = test_dataset.targets[random_choice]
-            test_dataloader = torch.utils.data.DataLoader(
-                test_dataset, batch_size=1, shuffle=True)
-            scores = torch.zeros(n_iter, 10)
-            for batch in tqdm(test_dataloader, ncols=ncols):
-                inpts = {'X': batch['encoded_image'].transpose(0, 1)}
-                self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
-                self._spikes = {
-                    'X': self.spikes['X'].get('s').view(self.time_max, -1),
-                    'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-                    }
-                label = batch['label'].item()
-                for top_n in range(1, 11):
-                    prediction = self.class_from_spikes(top_n=top_n)[0].item()
-                    if prediction == label:
-                        scores[i, top_n-1] = 1
-
+            scores = correct
             res = scores.mean(dim=0)
-            errors = ((1 - res) * res / n_iter) ** 0.5
+            errors = ((1 - res) * res / scores.size(0)) ** 0.5
             fig = go.Figure(go.Scatter(x=list(range(1, 11)), y=res.numpy(),
                                        error_y=dict(array=errors, visible=True, width=5)))
             fig.update_layout(
@@ -855,7 +875,8 @@ class AbstractSNN:
     def plot_spikes_Y(self):
         width = 1000
         height = 800
-        active_neuron_spikes = self._spikes['Y'][:, self._spikes['Y'].sum(0).nonzero().squeeze(1)].t()
+        spikes_Y = self._spikes['Y'].unpack()
+        active_neuron_spikes = spikes_Y[:, spikes_Y.sum(0).nonzero().squeeze(1)].t()
         fig_spikes = go.Figure(data=go.Heatmap(z=active_neuron_spikes.numpy().astype(int), colorscale='YlOrBr'))
         fig_spikes.update_layout(width=width, height=height,
                                  title=go.layout.Title(
@@ -868,16 +889,16 @@ class AbstractSNN:
                                  yaxis=go.layout.YAxis(
                                      title_text='Neuron Index',
                                      tickmode='array',
-                                     tickvals=list(range(self._spikes['Y'].sum(0).nonzero().squeeze(1).shape[0])),
-                                     ticktext=self._spikes['Y'].sum(0).nonzero().squeeze(1).numpy(),
+                                     tickvals=list(range(spikes_Y.sum(0).nonzero().squeeze(1).shape[0])),
+                                     ticktext=spikes_Y.sum(0).nonzero().squeeze(1).numpy(),
                                      zeroline=False
                                      )
                                  )
         return fig_spikes
 
     def plot_spikes(self):
-        spikes_X = self._spikes['X'].transpose(0, 1)
-        spikes_Y = self._spikes['Y'].transpose(0, 1)
+        spikes_X = self._spikes['X'].unpack().transpose(0, 1)
+        spikes_Y = self._spikes['Y'].unpack().transpose(0, 1)
         width_X = spikes_X.shape[0] / (spikes_X.shape[0] + spikes_Y.shape[0])
         width_Y = 1 - width_X
         fig_spikes = make_subplots(rows=2, cols=1, subplot_titles=['X spikes', 'Y spikes'],
@@ -897,23 +918,10 @@ class AbstractSNN:
         return fig_spikes
 
     def feed_class(self, label, top_n=None, k=1, to_print=True, plot=False):
-        dataset = MNIST(
-            PoissonEncoder(time=self.time_max, dt=self.dt),
-            None,
-            './/MNIST',
-            download=False,
-            train=True,
-            transform=transforms.Compose([
-                transforms.CenterCrop(self.crop),
-                transforms.ToTensor(),
-                transforms.Lambda(lambda x: x * self.intensity)
-                ])
-            )
+        dataset = self.mnist_dataset('full_train')
         self.network.reset_()
         self.network.train(False)
-        label_mask = dataset.targets == label
-        dataset.data = dataset.data[label_mask]
-        dataset.targets = dataset.targets[label_mask]
+        dataset = torch.utils.data.Subset(dataset, (dataset.targets == label).nonzero().flatten())
         dataloader = torch.utils.data.DataLoader(
             dataset, batch_size=1, shuffle=True)
 
@@ -921,10 +929,7 @@ class AbstractSNN:
 
         inpts = {'X': batch['encoded_image'].transpose(0, 1)}
         self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
-        self._spikes = {
-            'X': self.spikes['X'].get('s').view(self.time_max, -1),
-            'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-            }
+        self._record_spikes()
 
         prediction = self.class_from_spikes(top_n=top_n)
         if to_print:
@@ -936,33 +941,17 @@ class AbstractSNN:
         return prediction[0:k]
 
     def feed_class_lc(self, label, to_print=True, plot=False):
-        train_dataset = MNIST(
-            PoissonEncoder(time=self.time_max, dt=self.dt),
-            None,
-            './/MNIST',
-            download=False,
-            train=True,
-            transform=transforms.Compose([
-                transforms.CenterCrop(self.crop),
-                transforms.ToTensor(),
-                transforms.Lambda(lambda x: x * self.intensity)
-                ])
-            )
+        train_dataset = self.mnist_dataset('full_train')
         self.network.reset_()
         self.network.train(False)
+        train_dataset = torch.utils.data.Subset(train_dataset, (train_dataset.targets == label).nonzero().flatten())
         train_dataloader = torch.utils.data.DataLoader(
             train_dataset, batch_size=1, shuffle=True)
 
         batch = next(iter(train_dataloader))
-        while batch['label'] != label:
-            batch = next(iter(train_dataloader))
-        else:
-            inpts = {'X': batch['encoded_image'].transpose(0, 1)}
-            self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
-            self._spikes = {
-                'X': self.spikes['X'].get('s').view(self.time_max, -1),
-                'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-                }
+        inpts = {'X': batch['encoded_image'].transpose(0, 1)}
+        self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
+        self._record_spikes()
 
         prediction = self.classifier.predict([self._spikes['Y'].sum(0).numpy()])
         if to_print:
@@ -976,7 +965,7 @@ class AbstractSNN:
     def top_voters(self):
         pass
 
-    def feed_image(self, path, top_n=None, k=1, to_print=True, plot=False):
+    def feed_image(self, path, top_n=None, k=1, to_print=True, plot=False, stop_margin=None, stop_interval=10):
         self.network.reset_()
         self.network.train(False)
         img = Image.open(fp=path).convert('1')
@@ -990,11 +979,11 @@ class AbstractSNN:
         encoded_image = pe.enc(torch.tensor(np.array(image)).type(torch.FloatTensor),
                                time=self.time_max, transform=True).unsqueeze(0)
         inpts = {'X': encoded_image.transpose(0, 1)}
-        self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1)
-        self._spikes = {
-            'X': self.spikes['X'].get('s').view(self.time_max, -1),
-            'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-            }
+        stop_criterion = None if stop_margin is None else self.vote_margin_criterion(stop_margin, top_n)
+        self.network.run(inpts=inpts, time=self.time_max, input_time_dim=1,
+                         stop_criterion=stop_criterion, stop_interval=stop_interval)
+        steps = self.network.last_timesteps
+        self._record_spikes(steps)
 
         prediction = self.class_from_spikes(top_n=top_n)
         if to_print:
@@ -1075,7 +1064,7 @@ class LC_SNN(AbstractSNN):
 
         # Network
         self.network = Network(learning=True)
-        self.GlobalMonitor = NetworkMonitor(self.network, state_vars=('v', 's', 'w'))
+        self.GlobalMonitor = NetworkMonitor(self.network, state_vars=('v', 's', 'w'), schedule={'w': 'run'})
         self.n_input = self.crop ** 2
         self.input_layer = Input(n=self.n_input, shape=(1, self.crop, self.crop), traces=True,
                                  refrac=refrac)
@@ -1108,45 +1097,30 @@ class LC_SNN(AbstractSNN):
             wmin=self.wmin,
             wmax=self.wmax)
 
-        # competitive connections
-        w = torch.zeros(self.n_filters, conv_size, conv_size, self.n_filters, conv_size, conv_size)
-        mask = torch.ones(w.shape)
-        for fltr1 in range(self.n_filters):
-            for fltr2 in range(self.n_filters):
-                if fltr1 != fltr2:
-                    for i in range(conv_size):
-                        for j in range(conv_size):
-                            w[fltr1, i, j, fltr2, i, j] = self.c_w
-        mask[w == 0] = 0
-        self.mask_YY = mask
-
-        # size = self.n_filters * conv_size ** 2
-        # sparse_w = torch.sparse.FloatTensor(w.view(size, size).nonzero().t(), w[w != 0].flatten(),
-        #                                     (size, size))
+        # competitive connections between the filters at each location
+        w = torch.full((conv_size ** 2, self.n_filters, self.n_filters), self.c_w)
 
         if not self.c_l:
-            self.connection_YY = Connection(self.output_layer, self.output_layer, w=w)
+            self.connection_YY = CompetitionConnection(self.output_layer, self.output_layer,
+                                                       n_filters=self.n_filters, w=w)
         else:
             if self.c_w == 1:
                 if self.c_w_min is None:
                     self.c_w_min = -np.inf
-                for fltr1 in range(self.n_filters):
-                    for fltr2 in range(self.n_filters):
-                        if fltr1 != fltr2:
-                            for i in range(conv_size):
-                                for j in range(conv_size):
-                                    w[fltr1, i, j, fltr2, i, j] = random() * -100
-                self.connection_YY = Connection(self.output_layer, self.output_layer, w=w,
-                                        update_rule=PostPre,
-                                        nu=self.nu,
-                                        wmin=self.c_w_min,
-                                        wmax=0)
+                w = torch.rand(w.shape) * -100
+                self.connection_YY = CompetitionConnection(self.output_layer, self.output_layer,
+                                                           n_filters=self.n_filters, w=w,
+                                                           update_rule=PostPre,
+                                                           nu=self.nu,
+                                                           wmin=self.c_w_min,
+                                                           wmax=0)
             else:
-                self.connection_YY = Connection(self.output_layer, self.output_layer, w=w,
-                                                update_rule=PostPre,
-                                                nu=self.nu,
-                                                wmin=self.c_w_min,
-                                                wmax=0)
+                self.connection_YY = CompetitionConnection(self.output_layer, self.output_layer,
+                                                           n_filters=self.n_filters, w=w,
+                                                           update_rule=PostPre,
+                                                           nu=self.nu,
+                                                           wmin=self.c_w_min,
+                                                           wmax=0)
 
         self.network.add_layer(self.input_layer, name='X')
         self.network.add_layer(self.output_layer, name='Y')
@@ -1159,10 +1133,7 @@ class LC_SNN(AbstractSNN):
             self.spikes[layer] = Monitor(self.network.layers[layer], state_vars=['s'], time=self.time_max)
             self.network.add_monitor(self.spikes[layer], name='%s_spikes' % layer)
 
-        self._spikes = {
-            'X': self.spikes['X'].get('s').view(self.time_max, -1),
-            'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-            }
+        self._record_spikes()
 
         self.voltages = {}
         for layer in set(self.network.layers) - {'X'}:
@@ -1175,47 +1146,6 @@ class LC_SNN(AbstractSNN):
 
         self.weights_XY = self.get_weights_XY()
 
-    def class_from_spikes(self, top_n=None):
-        if top_n == 0:
-            raise ValueError('top_n can\'t be zero')
-        if top_n is None:
-            top_n = 10
-        args = self.votes.argsort(axis=0, descending=True)[0:top_n, :]
-        top_n_votes = torch.zeros(self.votes.shape)
-        for i, top_i in enumerate(args):
-            for j, label in enumerate(top_i):
-                top_n_votes[label, j] = self.votes[label, j]
-        w = self.network.connections[('X', 'Y')].w
-        k1, k2 = self.kernel_size, self.kernel_size
-        c1, c2 = self.conv_size, self.conv_size
-        c1sqrt, c2sqrt = int(math.ceil(math.sqrt(c1))), int(math.ceil(math.sqrt(c2)))
-        locations = self.network.connections[('X', 'Y')].locations
-        best_patches_max = self.spikes['Y'].get('s').sum(0).squeeze(0).view(self.n_filters,
-                                                                            self.conv_size**2).max(0)
-        best_patches = best_patches_max.indices
-        self.best_voters = best_patches
-        best_patches_values = best_patches_max.values
-        self.best_spikes = best_patches_values
-        best_neurons = []
-        votes = torch.zeros(10, self.conv_size**2)
-        sum_spikes = torch.zeros(self.conv_size**2)
-        for patch_number, filter_number in zip(list(range(self.conv_size**2)), best_patches):
-            neuron_num = filter_number * self.conv_size**2 + (patch_number // c2sqrt) * c2sqrt + (patch_number % c2sqrt)
-            filter_ = w[
-                locations[:, patch_number], neuron_num
-            ].view(k1, k2)
-            vote = top_n_votes[
-                   :, neuron_num
-                   ]
-            votes[:, patch_number] = vote
-            sum_spikes[patch_number] = self.spikes['Y'].get('s').sum(0).squeeze(0).view(self.n_filters,
-                                                                                        self.conv_size**2)[filter_number, patch_number]
-            best_neurons.append(filter_)
-        res = votes @ sum_spikes
-        res = res.argsort(descending=True)
-        self.label = res[0]
-        return res
-
     def plot_best_voters(self):
         w = self.network.connections[('X', 'Y')].w
         k1, k2 = self.kernel_size, self.kernel_size
@@ -1224,17 +1154,13 @@ class LC_SNN(AbstractSNN):
         c1sqrt, c2sqrt = int(math.ceil(math.sqrt(c1))), int(math.ceil(math.sqrt(c2)))
         fs = int(math.ceil(math.sqrt(self.n_filters)))
         w_ = torch.zeros((self.n_filters * k1, k2 * c1 * c2))
-        locations = self.network.connections[('X', 'Y')].locations
         best_patches = self.spikes['Y'].get('s').sum(0).squeeze(0).view(self.n_filters,
                                                                         self.conv_size**2).max(0).indices
         best_neurons = []
         fig = make_subplots(
             rows=self.conv_size, cols=self.conv_size)
         for patch_number, filter_number in zip(list(range(self.conv_size**2)), best_patches):
-            filter_ = w[
-                locations[:, patch_number],
-                filter_number * self.conv_size**2 + (patch_number // c2sqrt) * c2sqrt + (patch_number % c2sqrt),
-            ].view(k1, k2)
+            filter_ = w[filter_number, patch_number].view(k1, k2)
             best_neurons.append(filter_)
             fig.add_trace(go.Heatmap(z=filter_.flip(0), zmin=0, zmax=1, colorscale='YlOrBr'),
                           row=patch_number // self.conv_size + 1, col=patch_number % self.conv_size + 1)
@@ -1266,9 +1192,7 @@ class LC_SNN(AbstractSNN):
         return weights_XY
 
     def get_weights_YY(self):
-        shape_YY = self.network.connections[('Y', 'Y')].w.shape
-        weights_YY = self.network.connections[('Y', 'Y')].w.view(int(np.sqrt(np.prod(shape_YY))),
-                                                                 int(np.sqrt(np.prod(shape_YY))))
+        weights_YY = self.network.connections[('Y', 'Y')].to_dense()
         return weights_YY
 
 
@@ -1296,7 +1220,7 @@ class C_SNN(AbstractSNN):
 
         # Network
         self.network = Network(learning=True)
-        self.GlobalMonitor = NetworkMonitor(self.network, state_vars=('v', 's', 'w'))
+        self.GlobalMonitor = NetworkMonitor(self.network, state_vars=('v', 's', 'w'), schedule={'w': 'run'})
         self.n_input = self.crop ** 2
         self.input_layer = Input(n=self.n_input, shape=(1, self.crop, self.crop), traces=True,
                                  refrac=refrac)
@@ -1325,27 +1249,19 @@ class C_SNN(AbstractSNN):
             wmin=self.wmin,
             wmax=self.wmax)
 
-        # competitive connections
-        w = torch.zeros(self.n_filters, conv_size, conv_size, self.n_filters, conv_size, conv_size)
-        for fltr1 in range(self.n_filters):
-            for fltr2 in range(self.n_filters):
-                if fltr1 != fltr2:
-                    # change
-                    for i in range(conv_size):
-                        for j in range(conv_size):
-                            w[fltr1, i, j, fltr2, i, j] = self.c_w
-        size = self.n_filters * conv_size ** 2
-        sparse_w = torch.sparse.FloatTensor(w.view(size, size).nonzero().t(), w[w != 0].flatten(),
-                                            (size, size))
+        # competitive connections between the filters at each location
+        w = torch.full((conv_size ** 2, self.n_filters, self.n_filters), self.c_w)
 
         if not self.c_l:
-            self.connection_YY = Connection(self.output_layer, self.output_layer, w=w)
+            self.connection_YY = CompetitionConnection(self.output_layer, self.output_layer,
+                                                       n_filters=self.n_filters, w=w)
         else:
-            self.connection_YY = Connection(self.output_layer, self.output_layer, w=w,
-                                            update_rule=PostPre,
-                                            nu=self.nu,
-                                            wmin=self.c_w_min,
-                                            wmax=0)
+            self.connection_YY = CompetitionConnection(self.output_layer, self.output_layer,
+                                                       n_filters=self.n_filters, w=w,
+                                                       update_rule=PostPre,
+                                                       nu=self.nu,
+                                                       wmin=self.c_w_min,
+                                                       wmax=0)
 
         self.network.add_layer(self.input_layer, name='X')
         self.network.add_layer(self.output_layer, name='Y')
@@ -1358,10 +1274,7 @@ class C_SNN(AbstractSNN):
             self.spikes[layer] = Monitor(self.network.layers[layer], state_vars=['s'], time=self.time_max)
             self.network.add_monitor(self.spikes[layer], name='%s_spikes' % layer)
 
-        self._spikes = {
-            'X': self.spikes['X'].get('s').view(self.time_max, -1),
-            'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-            }
+        self._record_spikes()
 
         self.voltages = {}
         for layer in set(self.network.layers) - {'X'}:
@@ -1376,24 +1289,9 @@ class C_SNN(AbstractSNN):
 
         self.weights_XY = self.get_weights_XY()
 
-    def class_from_spikes(self, top_n=None):
-        if top_n == 0:
-            raise ValueError('top_n can\'t be zero')
-        if top_n is None:
-            top_n = 10
-        sum_output = self._spikes['Y'].sum(0)
-
-        args = self.votes.argsort(axis=0, descending=True)[0:top_n, :]
-        top_n_votes = torch.zeros(self.votes.shape)
-        for i, top_i in enumerate(args):
-            for j, label in enumerate(top_i):
-                top_n_votes[label, j] = self.votes[label, j]
-        res = torch.matmul(top_n_votes.type(torch.FloatTensor), sum_output.type(torch.FloatTensor))
-        if res.sum(0).item() == 0:
-            return torch.zeros(10).fill_(-1).type(torch.LongTensor)
-        res = res.argsort(descending=True)
-        self.label = res[0]
-        return res
+    def make_decoder(self, method='voting'):
+        return VoteDecoder(self.votes, self.n_filters, self.conv_size ** 2, patch_voting=method == 'patch_voting',
+                           abstain=True)
 
     def get_weights_XY(self):
         weights = self.network.connections[('X', 'Y')].w
@@ -1412,9 +1310,7 @@ class C_SNN(AbstractSNN):
         return reshaped
 
     def get_weights_YY(self):
-        shape_YY = self.network.connections[('Y', 'Y')].w.shape
-        weights_YY = self.network.connections[('Y', 'Y')].w.view(int(np.sqrt(np.prod(shape_YY))),
-                                                                 int(np.sqrt(np.prod(shape_YY))))
+        weights_YY = self.network.connections[('Y', 'Y')].to_dense()
         return weights_YY
 
 
@@ -1443,7 +1339,7 @@ class FC_SNN(AbstractSNN):
 
         # Network
         self.network = Network(learning=True)
-        self.GlobalMonitor = NetworkMonitor(self.network, state_vars=('v', 's', 'w'))
+        self.GlobalMonitor = NetworkMonitor(self.network, state_vars=('v', 's', 'w'), schedule={'w': 'run'})
         self.n_input = self.crop ** 2
         self.input_layer = Input(n=self.n_input, shape=(1, self.crop, self.crop), traces=True,
                                  refrac=refrac)
@@ -1477,11 +1373,8 @@ class FC_SNN(AbstractSNN):
             wmax=self.wmax)
 
         # competitive connections
-        w = torch.zeros(self.n_filters, self.n_filters)
-        for fltr1 in range(self.n_filters):
-            for fltr2 in range(self.n_filters):
-                if fltr1 != fltr2:
-                    w[fltr1, fltr2] = self.c_w
+        w = torch.full((self.n_filters, self.n_filters), self.c_w)
+        w.fill_diagonal_(0)
 
         # size = self.n_filters * conv_size ** 2
         # sparse_w = torch.sparse.FloatTensor(w.view(size, size).nonzero().t(), w[w != 0].flatten(),
@@ -1507,10 +1400,7 @@ class FC_SNN(AbstractSNN):
             self.spikes[layer] = Monitor(self.network.layers[layer], state_vars=['s'], time=self.time_max)
             self.network.add_monitor(self.spikes[layer], name='%s_spikes' % layer)
 
-        self._spikes = {
-            'X': self.spikes['X'].get('s').view(self.time_max, -1),
-            'Y': self.spikes['Y'].get('s').view(self.time_max, -1),
-            }
+        self._record_spikes()
 
         self.voltages = {}
         for layer in set(self.network.layers) - {'X'}:
@@ -1523,47 +1413,6 @@ class FC_SNN(AbstractSNN):
 
         self.weights_XY = self.get_weights_XY()
 
-    def class_from_spikes(self, top_n=None):
-        if top_n == 0:
-            raise ValueError('top_n can\'t be zero')
-        if top_n is None:
-            top_n = 10
-        args = self.votes.argsort(axis=0, descending=True)[0:top_n, :]
-        top_n_votes = torch.zeros(self.votes.shape)
-        for i, top_i in enumerate(args):
-            for j, label in enumerate(top_i):
-                top_n_votes[label, j] = self.votes[label, j]
-        w = self.network.connections[('X', 'Y')].w
-        k1, k2 = self.kernel_size, self.kernel_size
-        c1, c2 = self.conv_size, self.conv_size
-        c1sqrt, c2sqrt = int(math.ceil(math.sqrt(c1))), int(math.ceil(math.sqrt(c2)))
-        locations = self.network.connections[('X', 'Y')].locations
-        best_patches_max = self.spikes['Y'].get('s').sum(0).squeeze(0).view(self.n_filters,
-                                                                            self.conv_size**2).max(0)
-        best_patches = best_patches_max.indices
-        self.best_voters = best_patches
-        best_patches_values = best_patches_max.values
-        self.best_spikes = best_patches_values
-        best_neurons = []
-        votes = torch.zeros(10, self.conv_size**2)
-        sum_spikes = torch.zeros(self.conv_size**2)
-        for patch_number, filter_number in zip(list(range(self.conv_size**2)), best_patches):
-            neuron_num = filter_number * self.conv_size**2 + (patch_number // c2sqrt) * c2sqrt + (patch_number % c2sqrt)
-            filter_ = w[
-                locations[:, patch_number], neuron_num
-            ].view(k1, k2)
-            vote = top_n_votes[
-                   :, neuron_num
-                   ]
-            votes[:, patch_number] = vote
-            sum_spikes[patch_number] = self.spikes['Y'].get('s').sum(0).squeeze(0).view(self.n_filters,
-                                                                                        self.conv_size**2)[filter_number, patch_number]
-            best_neurons.append(filter_)
-        res = votes @ sum_spikes
-        res = res.argsort(descending=True)
-        self.label = res[0]
-        return res
-
     def plot_best_voters(self):
         w = self.network.connections[('X', 'Y')].w
         k1, k2 = self.kernel_size, self.kernel_size
@@ -1572,17 +1421,13 @@ class FC_SNN(AbstractSNN):
         c1sqrt, c2sqrt = int(math.ceil(math.sqrt(c1))), int(math.ceil(math.sqrt(c2)))
         fs = int(math.ceil(math.sqrt(self.n_filters)))
         w_ = torch.zeros((self.n_filters * k1, k2 * c1 * c2))
-        locations = self.network.connections[('X', 'Y')].locations
         best_patches = self.spikes['Y'].get('s').sum(0).squeeze(0).view(self.n_filters,
                                                                         self.conv_size**2).max(0).indices
         best_neurons = []
         fig = make_subplots(
             rows=self.conv_size, cols=self.conv_size)
         for patch_number, filter_number in zip(list(range(self.conv_size**2)), best_patches):
-            filter_ = w[
-                locations[:, patch_number],
-                filter_number * self.conv_size**2 + (patch_number // c2sqrt) * c2sqrt + (patch_number % c2sqrt),
-            ].view(k1, k2)
+            filter_ = w[filter_number, patch_number].view(k1, k2)
             best_neurons.append(filter_)
             fig.add_trace(go.Heatmap(z=filter_.flip(0), zmin=0, zmax=1, colorscale='YlOrBr'),
                           row=patch_number // self.conv_size + 1, col=patch_number % self.conv_size + 1)
@@ -1605,7 +1450,7 @@ class FC_SNN(AbstractSNN):
 
 
     def get_weights_XY(self):
-        weights = self.network.connections[('X', 'Y')].w.view(self.crop, self.crop, self.n_filters)
+        weights = self.network.connections[('X', 'Y')].w.view(self.n_filters, self.crop, self.crop).permute(1, 2, 0)
         height = int(weights.size(0))
         width = int(weights.size(1))
         reshaped = torch.zeros(0, width * self.output_shape)
@@ -0,0 +1,67 @@
+import itertools
+import math
+
+import pandas as pd
+import torch
+
+from .utils import load_weights
+
+
+def configurations(space, n=None, seed=0):
+    # Parameter combinations of a search space {parameter: [values]}: the whole grid, or n of its points at random
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    if n is None or n >= len(grid):
+        return grid
+    choice = torch.randperm(len(grid), generator=torch.Generator().manual_seed(seed))[:n]
+    return [grid[i] for i in choice]
+
+
+def with_time_max(net, parameters, time_max):
+    # The same network simulated for time_max, with the weights and adaptive thresholds learned so far
+    if time_max is None or time_max == net.time_max:
+        return net
+    new_net = type(net)(**{**parameters, 'time_max': time_max, 'n_iter': net.n_iter})
+    load_weights(new_net, net.network)
+    for layer in new_net.network.layers:
+        theta = getattr(new_net.network.layers[layer], 'theta', None)
+        if theta is not None:
+            theta.copy_(net.network.layers[layer].theta)
+    return new_net
+
+
+def successive_halving(network_type, parameters, budgets, eta=3, save=True):
+    # Evaluates every configuration on the first budget, then keeps the best 1 / eta of them for the next one.
+    # A budget is {'n_train': ..., 'n_calibrate': ..., 'n_test': ..., 'time_max': ...} with n_train the total number
+    # of training iterations so far, so promoted networks only train the missing ones; time_max is optional.
+    # Returns the evaluations of all rungs, best first, and the networks that went through the last budget.
+    results = []
+    candidates = [{'parameters': {**p, 'n_iter': 0}, 'net': None} for p in parameters]
+    for rung, budget in enumerate(budgets):
+        print(f'Rung {rung}: {len(candidates)} configurations with budget {budget}')
+        for candidate in candidates:
+            net = candidate['net']
+            if net is None:
+                kwargs = dict(candidate['parameters'])
+                if budget.get('time_max') is not None:
+                    kwargs['time_max'] = budget['time_max']
+                net = network_type(**kwargs)
+            net = candidate['net'] = with_time_max(net, candidate['parameters'], budget.get('time_max'))
+            if budget['n_train'] > net.n_iter:
+                net.train(budget['n_train'] - net.n_iter)
+                net.n_iter = budget['n_train']
+            net.calibrate(budget['n_calibrate'])
+            net.calculate_accuracy(budget['n_test'])
+            candidate['accuracy'] = float(net.accuracy)
+            results.append({**candidate['parameters'], 'n_iter': net.n_iter, 'time_max': net.time_max, 'rung': rung,
+                            'accuracy': candidate['accuracy'], 'name': net.name})
+
+        candidates.sort(key=lambda candidate: candidate['accuracy'], reverse=True)
+        if rung < len(budgets) - 1:
+            candidates = candidates[:max(math.ceil(len(candidates) / eta), 1)]
+
+    networks = [candidate['net'] for candidate in candidates]
+    if save:
+        for net in networks:
+            net.save()
+    results = pd.DataFrame(results).sort_values(['rung', 'accuracy'], ascending=False, ignore_index=True)
+    return results, networks
@@ -4,6 +4,7 @@ import torch
 import json
 import pandas as pd
 import plotly.graph_objs as go
+from torch.nn import Parameter
 from bindsnet.network.monitors import Monitor
 from shutil import rmtree
 from sqlite3 import connect
@@ -99,6 +100,16 @@ def plot_database(n_filters=100, network_type='LC_SNN', kernel_size=12, stride=4
     return fig
 
 
+def load_weights(net, network):
+    # Networks saved before the compact XY / YY layouts store dense weights
+    for c in [('X', 'Y'), ('Y', 'Y')]:
+        connection = net.network.connections[c]
+        w = network.connections[c].w
+        if w.shape != connection.w.shape:
+            w = Parameter(connection.from_dense(w), False)
+        connection.w = w
+
+
 def load_network(name):
     path = f'networks//{name}'
     try:
@@ -145,8 +156,7 @@ def load_network(name):
         if os.path.exists(path + '//confusion_matrix'):
             conf_matrix = torch.load(path + '//confusion_matrix')
         network = torch.load(path + '//network')
-        net.network.connections[('X', 'Y')].w = network.connections[('X', 'Y')].w
-        net.network.connections[('Y', 'Y')].w = network.connections[('Y', 'Y')].w
+        load_weights(net, network)
 
         net.votes = votes
         net.accuracy = accuracy
@@ -155,10 +165,7 @@ def load_network(name):
         for layer in set(net.network.layers):
             net.spikes[layer] = Monitor(net.network.layers[layer], state_vars=["s"], time=net.time_max)
             net.network.add_monitor(net.spikes[layer], name="%s_spikes" % layer)
-        net._spikes = {
-            "X": net.spikes["X"].get("s").view(net.time_max, -1),
-            "Y": net.spikes["Y"].get("s").view(net.time_max, -1),
-            }
+        net._record_spikes()
 
         net.network.train(False)
         for c in net.network.connections:
@@ -181,8 +188,7 @@ def load_network(name):
             conf_matrix = torch.load(path + '//confusion_matrix')
 
         network = torch.load(path + '//network')
-        net.network.connections[('X', 'Y')].w = network.connections[('X', 'Y')].w
-        net.network.connections[('Y', 'Y')].w = network.connections[('Y', 'Y')].w
+        load_weights(net, network)
         net.votes = votes
         net.accuracy = accuracy
         net.conf_matrix = conf_matrix
@@ -192,10 +198,7 @@ def load_network(name):
             net.spikes[layer] = Monitor(net.network.layers[layer], state_vars=["s"], time=net.time_max)
             net.network.add_monitor(net.spikes[layer], name="%s_spikes" % layer)
 
-        net._spikes = {
-            "X": net.spikes["X"].get("s").view(net.time_max, -1),
-            "Y": net.spikes["Y"].get("s").view(net.time_max, -1),
-            }
+        net._record_spikes()
 
         net.network.train(False)
 
@@ -216,8 +219,7 @@ def load_network(name):
             conf_matrix = torch.load(path + '//confusion_matrix')
 
         network = torch.load(path + '//network')
-        net.network.connections[('X', 'Y')].w = network.connections[('X', 'Y')].w
-        net.network.connections[('Y', 'Y')].w = network.connections[('Y', 'Y')].w
+        load_weights(net, network)
         net.votes = votes
         net.accuracy = accuracy
         net.conf_matrix = conf_matrix
@@ -227,10 +229,7 @@ def load_network(name):
             net.spikes[layer] = Monitor(net.network.layers[layer], state_vars=["s"], time=net.time_max)
             net.network.add_monitor(net.spikes[layer], name="%s_spikes" % layer)
 
-        net._spikes = {
-            "X": net.spikes["X"].get("s").view(net.time_max, -1),
-            "Y": net.spikes["Y"].get("s").view(net.time_max, -1),
-            }
+        net._record_spikes()
 
         net.network.train(False)
 